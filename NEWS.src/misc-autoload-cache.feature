@@ -0,0 +1 @@
+The autoLoadRecipes resolved from the platform search path are now cached in `.rbuild/cache` for each product definition version, so repeated builds skip those repository lookups.
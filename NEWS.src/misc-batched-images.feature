@@ -0,0 +1 @@
+`rbuild show images`, `rbuild cancel images` and `rbuild delete images` now look up all of the given ids with a single query, run the cancellations or deletions concurrently, and report the outcome for each id in a table.
@@ -0,0 +1 @@
+The conary facade now reuses one conary client, and its repository caches, until the conary configuration changes.
@@ -0,0 +1 @@
+Inside a product checkout, slow-changing rBuilder data (the index of platform labels, the image type and target type catalogs, image type definitions and their descriptors) is now cached under .rbuild/cache and refreshed once it expires; pass --no-cache to any command to fetch it from the rBuilder instead.
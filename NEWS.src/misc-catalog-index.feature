@@ -0,0 +1 @@
+Repeated platform and image type definition lookups now reuse an index built from a single fetch per rBuilder session.
@@ -0,0 +1 @@
+The new `rbuild daemon` command keeps plugins, checkout configuration and network sessions loaded in a background process; while it runs, commands that never prompt, such as list, show and status, are forwarded to it and start without reloading them.
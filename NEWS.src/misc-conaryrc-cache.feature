@@ -0,0 +1 @@
+The conaryrc provided by the rBuilder is now fetched once per command and cached in `~/.rbuild/cache` for an hour, after which it is revalidated with the server; a stale copy is used if the server cannot be reached.
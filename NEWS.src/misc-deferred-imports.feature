@@ -0,0 +1 @@
+Facades are now created, and rMake client and Conary command modules imported, only when a command first uses them. The new `--profile-startup` option prints how long each module took to import before the command runs.
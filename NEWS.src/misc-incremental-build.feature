@@ -0,0 +1 @@
+`rbuild build packages` now only builds the checked-out packages whose sources changed since they were last built and committed; use `--all` to build every checked-out package.
@@ -0,0 +1 @@
+Configuring targets and target credentials no longer busy-polls the rBuilder job; target and launch jobs are now waited on with a shared poller that backs off while the job is idle.
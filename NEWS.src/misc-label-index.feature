@@ -0,0 +1 @@
+Builds of named packages now keep an incremental index of the latest troves on the stage label in ~/.rbuild/cache, per repository server and user, asking the repository only for troves committed since the last build.
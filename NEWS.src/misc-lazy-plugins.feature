@@ -0,0 +1 @@
+rbuild now keeps an index of which plugins provide each command, refreshed whenever the plugin directories change, and imports only the plugins needed for the command being run; other plugins are loaded when first used.
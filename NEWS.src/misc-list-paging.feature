@@ -0,0 +1 @@
+rbuild list subcommands now write rows as they are fetched and accept --limit and --page-size to page through large rBuilder collections.
@@ -0,0 +1 @@
+Listing and showing resources now fetches linked resources such as owners and projects concurrently, once per distinct link, instead of one request at a time per row.
@@ -0,0 +1 @@
+Recipes of checked-out packages are now loaded concurrently by a pool of worker processes, and cached per stage until their sources change, before rbuild creates an rMake job or needs their build requirements.
@@ -0,0 +1 @@
+The product definition is now parsed once per command, and again only if the checkout changes.
@@ -0,0 +1 @@
+Group flavors, full build flavors and source group matches are now computed once per product definition instead of on every lookup.
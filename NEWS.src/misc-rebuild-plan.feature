@@ -0,0 +1 @@
+`rbuild build packages --recurse` now rebuilds only the named packages and the packages that require them to build, found from the buildRequires of the checked-out recipes and the build requirements of the other packages in the image groups; `--plan` shows what would be built without starting a job.
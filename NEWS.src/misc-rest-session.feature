@@ -0,0 +1 @@
+rbuild now reuses a single rBuilder REST session for all facade calls in a command and closes it when the command finishes.
@@ -0,0 +1 @@
+rMake build jobs now look up the product's group search path once per install label path, flavor and resolveTroves, running the lookups for different contexts concurrently on the shared repository client and reusing the results across contexts and later jobs for the same stage.
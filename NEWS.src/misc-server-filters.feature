@@ -0,0 +1 @@
+Image definition and target lookups by id or name now ask the rBuilder for the matching entries instead of downloading and filtering the full list.
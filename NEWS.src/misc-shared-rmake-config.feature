@@ -0,0 +1 @@
+Build jobs no longer rebuild the rMake configuration for each context variant; it is built once per product definition and stage and copied.
@@ -0,0 +1 @@
+rbuild status accepts --jobs to check many checkouts at once, querying the repository once for all of them.
@@ -0,0 +1 @@
+rbuild update all, packages and stage accept --jobs to update many package checkouts concurrently.
@@ -0,0 +1 @@
+rbuild watch images and rbuild build images now poll all builds with one REST request per cycle, honor the requested poll interval and timeout, and back off while nothing changes.
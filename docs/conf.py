@@ -259,6 +259,7 @@ man_pages = [
     ('man/rbuild-config', 'rbuild-config', u'Print the rbuild configuration', [author], 1),
     ('man/rbuild-create', 'rbuild-create', u'Create new resources', [author], 1),
     ('man/rbuild-delete', 'rbuild-delete', u'Delete various rbuild resources', [author], 1),
+    ('man/rbuild-daemon', 'rbuild-daemon', u'Run rbuild commands in a persistent background process', [author], 1),
     ('man/rbuild-deploy', 'rbuild-deploy', u'Deploy an imge to a target', [author], 1),
     ('man/rbuild-disable', 'rbuild-disable', u'Disable a platform', [author], 1),
     ('man/rbuild-edit', 'rbuild-edit', u'Edit various rbuild resources', [author], 1),
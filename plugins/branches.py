@@ -28,6 +28,7 @@ class ListBranchesCommand(command.ListCommand):
     listFields = ('name', 'label')
 
     def runCommand(self, handle, argSet, args):
+        self._processListOptions(argSet)
         _, project = self.requireParameters(args, expected="PROJECT")
         self._list(handle, project)
 
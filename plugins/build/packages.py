@@ -14,10 +14,16 @@
 # limitations under the License.
 #
 
+import hashlib
+import os
 
 from rbuild import errors
+from rbuild.lib import diskcache
 from rbuild_plugins.build import groups
 
+#: recipe class attributes kept for each checked-out recipe
+RECIPE_ATTRIBUTES = ['name', 'buildRequires']
+
 def createRmakeJobForPackages(handle, packageList, recurse=True):
     return _createRmakeJobForPackages(handle, packageList, recurse)
 
@@ -32,6 +38,208 @@ def createRmakeJobForAllPackages(handle):
     """
     return _createRmakeJobForPackages(handle)
 
+def getChangedPackages(handle):
+    """
+    Find the edited packages whose sources have changed since they were
+    last built and committed, according to the manifest kept for the
+    active stage.  Every package counts as changed if the product
+    definition or its group flavors changed since then.
+    @param handle: rbuild handle
+    @return: sorted names of the changed packages, and a C{dict} of the
+    source fingerprints of all edited packages
+    """
+    packageRecipes = handle.productStore.getEditedRecipeDicts()[0]
+    fingerprints = dict((name, getSourceFingerprint(os.path.dirname(path)))
+                        for name, path in packageRecipes.items())
+    manifest = handle.productStore.getPackageManifest()
+    if manifest.get('context') == _getManifestContext(handle):
+        builtPackages = manifest.get('packages', {})
+    else:
+        builtPackages = {}
+    changed = sorted(name for name, fingerprint in fingerprints.items()
+                     if builtPackages.get(name) != fingerprint)
+    return changed, fingerprints
+
+def recordBuiltPackages(handle, fingerprints, jobId):
+    """
+    Record in the manifest of the active stage that the packages with
+    the given source fingerprints were built and committed by C{jobId},
+    along with the versions they were committed as.
+    """
+    context = _getManifestContext(handle)
+    manifest = handle.productStore.getPackageManifest()
+    if manifest.get('context') != context:
+        manifest = dict(context=context, packages={}, versions={})
+    manifest['packages'].update(fingerprints)
+    manifest.setdefault('versions', {}).update(
+        getCommittedVersions(handle, fingerprints))
+    manifest['jobId'] = jobId
+    handle.productStore.setPackageManifest(manifest)
+
+def getCommittedVersions(handle, names):
+    """
+    @return: the latest version of each of the packages C{names} on the
+    active stage label, which is the one a job that just committed them
+    created; packages not found on the label are left out
+    @rtype: dict
+    """
+    conary = handle.facade.conary
+    label = handle.productStore.getActiveStageLabel()
+    results = conary._findTroves([(x, None, None) for x in sorted(names)],
+                                 label, allowMissing=True)
+    versions = {}
+    for (name, _, _), troveTups in results.items():
+        if troveTups:
+            versions[name] = conary._troveTupToStrings(*max(troveTups))[1]
+    return versions
+
+def getSourceFingerprint(packageDir):
+    """
+    @return: digest of the names and contents of all files in the
+    package checkout C{packageDir}, including its CONARY state
+    @rtype: str
+    """
+    digest = hashlib.sha1()
+    for dirPath, dirNames, fileNames in os.walk(packageDir):
+        dirNames.sort()
+        for fileName in sorted(fileNames):
+            path = os.path.join(dirPath, fileName)
+            if not os.path.isfile(path):
+                continue
+            digest.update(path[len(packageDir):] + '\0')
+            fileObj = open(path, 'rb')
+            try:
+                for data in iter(lambda: fileObj.read(65536), ''):
+                    digest.update(data)
+            finally:
+                fileObj.close()
+            digest.update('\0')
+    return digest.hexdigest()
+
+def loadEditedRecipes(handle, packageRecipes):
+    """
+    Load the checked-out recipes of some edited packages, all at once,
+    and return the recipe class attributes rbuild uses.  The attributes
+    of each recipe are cached for the active stage by source fingerprint,
+    so only recipes that changed are loaded again.
+    @param handle: rbuild handle
+    @param packageRecipes: recipe path of each package to load
+    @type packageRecipes: dict of str to str
+    @return: values of C{RECIPE_ATTRIBUTES} for each recipe path
+    @rtype: dict of str to dict
+    """
+    stageName = handle.productStore.getActiveStageName()
+    cache = handle.productStore.getCache()
+    recipeAttributes = {}
+    toLoad = {}
+    for name, recipePath in packageRecipes.items():
+        key = ('recipe', stageName, name,
+               getSourceFingerprint(os.path.dirname(recipePath)))
+        entry = None
+        if cache is not None:
+            entry = cache.get(key)
+        if entry is not None:
+            recipeAttributes[recipePath] = entry.data
+        else:
+            toLoad[recipePath] = key
+
+    if toLoad:
+        loaded = handle.facade.conary.loadRecipeAttributesFromCheckouts(
+            sorted(toLoad), RECIPE_ATTRIBUTES)
+        for recipePath, key in toLoad.items():
+            if cache is not None:
+                cache.set(key, diskcache.CacheEntry(loaded[recipePath]))
+            recipeAttributes[recipePath] = loaded[recipePath]
+    return recipeAttributes
+
+def getBuildRequirementGraph(handle):
+    """
+    Find the packages each package requires to build.  Edited packages
+    use the C{buildRequires} of their checked-out recipe, loaded by
+    C{loadEditedRecipes}; the other packages in the image groups use the
+    requirements recorded when they were built.
+    @param handle: rbuild handle
+    @return: names of the packages each package build-requires
+    @rtype: dict of str to set
+    """
+    packageRecipes = handle.productStore.getEditedRecipeDicts()[0]
+    # checked-out recipes replace what is in the image groups
+    graph = getGroupBuildRequirementGraph(handle)
+    recipeAttributes = loadEditedRecipes(handle, packageRecipes)
+    for name, recipePath in packageRecipes.items():
+        requires = set(_getPackageName(x) for x in
+                       recipeAttributes[recipePath]['buildRequires'])
+        graph[name] = requires - set([name])
+    return graph
+
+def getGroupBuildRequirementGraph(handle):
+    """
+    Find the packages each package in the image groups of the active
+    stage required to build, from the requirements recorded when it was
+    built.  The result is cached for each set of image group versions.
+    @param handle: rbuild handle
+    @return: names of the packages each package in the image groups
+    build-requires; empty if no image group has been built
+    @rtype: dict of str to set
+    """
+    conary = handle.facade.conary
+    groupSpecs = sorted(set('%s[%s]' % x
+                            for x in handle.productStore.getGroupFlavors()))
+    if not groupSpecs:
+        return {}
+    groupTups = sorted(conary._findTrovesFlattened(groupSpecs,
+        handle.productStore.getActiveStageLabel(), allowMissing=True))
+    if not groupTups:
+        return {}
+
+    cache = handle.productStore.getCache()
+    key = ('groupBuildRequires',) + tuple('%s=%s[%s]'
+        % conary._troveTupToStrings(*x) for x in groupTups)
+    entry = None
+    if cache is not None:
+        entry = cache.get(key)
+    if entry is None:
+        requirements = conary.getGroupBuildRequirements(groupTups)
+        entry = diskcache.CacheEntry(dict((x[0], sorted(x[1]))
+                                          for x in requirements.items()))
+        if cache is not None:
+            cache.set(key, entry)
+    return dict((name, set(requires) - set([name]))
+                for name, requires in entry.data.items())
+
+def getRebuildSet(graph, packageList):
+    """
+    @param graph: build requirements, as returned by
+    C{getBuildRequirementGraph}
+    @param packageList: names of the packages to build
+    @return: sorted names of the packages in C{packageList} plus every
+    package in C{graph} that requires one of them to build, directly or
+    not
+    @rtype: list
+    """
+    dependents = {}
+    for name, requires in graph.items():
+        for required in requires:
+            dependents.setdefault(required, set()).add(name)
+    rebuildSet = set()
+    toVisit = list(packageList)
+    while toVisit:
+        name = toVisit.pop()
+        if name in rebuildSet:
+            continue
+        rebuildSet.add(name)
+        toVisit.extend(dependents.get(name, ()))
+    return sorted(rebuildSet)
+
+def _getPackageName(troveSpec):
+    # foo:devel=1.0[is: x86] -> foo
+    return troveSpec.split('=', 1)[0].split('[', 1)[0].split(':', 1)[0]
+
+def _getManifestContext(handle):
+    # packages must be rebuilt when what they are built against changes
+    return [getattr(handle.product, '_sourceTrove', None),
+            sorted(x[1] for x in handle.productStore.getGroupFlavors())]
+
 def _createRmakeJobForPackages(handle, packageList=None, recurse=True):
     if packageList and not recurse:
         return _getJobFromNames(handle, packageList)
@@ -72,8 +280,10 @@ def _getJobFromNames(handle, packageList):
             "don't know what to build")
 
     toBuild = []
+    editedRecipes = {}
     for name in packageList:
         if name in packageRecipes:
+            editedRecipes[name] = packageRecipes[name]
             name = packageRecipes[name]
         elif name in groupRecipes:
             name = groupRecipes[name]
@@ -82,8 +292,10 @@ def _getJobFromNames(handle, packageList):
             context = contexts[flavor]
             toBuild.append('%s{%s}' % (name, context))
 
+    recipeAttributes = loadEditedRecipes(handle, editedRecipes)
     return handle.facade.rmake.createBuildJobForStage(toBuild,
-        recurse=False, rebuild=False, useLocal=True)
+        recurse=False, rebuild=False, useLocal=True,
+        recipeAttributes=recipeAttributes)
 
 
 def _addInEditedPackages(handle, mainJob, packageRecipes):
@@ -103,7 +315,9 @@ def _addInEditedPackages(handle, mainJob, packageRecipes):
         for recipePath in newRecipeDict.values():
             for context in contextDict.values():
                 replacementRecipes.append('%s{%s}' % (recipePath, context))
-    recipeJob = handle.facade.rmake.createBuildJobForStage(replacementRecipes)
+    recipeAttributes = loadEditedRecipes(handle, packageRecipes)
+    recipeJob = handle.facade.rmake.createBuildJobForStage(replacementRecipes,
+        recipeAttributes=recipeAttributes)
     return handle.facade.rmake.overlayJob(mainJob, recipeJob)
 
 def _removePackagesWithEditedReplacements(mainJob, packageRecipes):
@@ -41,7 +41,12 @@ class BuildPackagesCommand(command.BaseCommand):
             'no-commit' : 'do not automatically commit successful builds',
             'no-recurse' : 'default behavior left for backwards compatibility',
             'recurse' : 'build every package listed on the '
-                'command line plus all of its dependencies',
+                'command line plus all packages in the checkouts or the '
+                'image groups that require it to build',
+            'plan' : 'show the packages that would be built and the size of '
+                'the job without building them',
+            'all' : 'build all checked-out packages, including those that '
+                'have not changed since they were last built',
       }
 
 
@@ -52,6 +57,8 @@ class BuildPackagesCommand(command.BaseCommand):
         argDef['no-recurse'] = command.NO_PARAM
         argDef['recurse'] = command.NO_PARAM
         argDef['refresh'] = command.NO_PARAM
+        argDef['all'] = command.NO_PARAM
+        argDef['plan'] = command.NO_PARAM
         argDef['message'] = '-m', command.ONE_PARAM
 
     #pylint: disable-msg=R0201,R0903
@@ -63,19 +70,38 @@ class BuildPackagesCommand(command.BaseCommand):
         recurse = argSet.pop('recurse', False)
         argSet.pop('no-recurse', False)  # ignored, now the default
         refreshArg = argSet.pop('refresh', False)
+        buildAll = argSet.pop('all', False)
+        plan = argSet.pop('plan', False)
         message = argSet.pop('message', None)
         success = True
         _, packageList, = self.requireParameters(args, allowExtra=True)
+        if plan:
+            names, jobSize = handle.BuildPackages.getBuildPlan(packageList,
+                recurse=recurse, changedOnly=not buildAll)
+            for name in names:
+                handle.ui.write(name)
+            handle.ui.write('%d packages, about %d troves to build'
+                            % (len(names), jobSize))
+            return
         if not packageList:
             if refreshArg:
                 handle.BuildPackages.refreshAllPackages()
-            jobId = handle.BuildPackages.buildAllPackages()
+            jobId = handle.BuildPackages.buildAllPackages(
+                changedOnly=not buildAll)
+            if jobId is None:
+                handle.ui.info('No packages have changed since they were'
+                               ' last built; use --all to build them anyway')
+                return
         else:
             if refreshArg:
                 handle.BuildPackages.refreshPackages(packageList)
-            jobId = handle.BuildPackages.buildPackages(packageList, recurse)
+            if recurse:
+                packageList = handle.BuildPackages.getRebuildSet(packageList)
+            jobId = handle.BuildPackages.buildPackages(packageList, False)
         if watch and commit:
             success = handle.Build.watchAndCommitJob(jobId, message)
+            if success:
+                handle.BuildPackages.recordBuiltPackages(jobId)
         elif watch:
             success = handle.Build.watchJob(jobId)
 
@@ -84,18 +110,54 @@ class BuildPackagesCommand(command.BaseCommand):
 
 class BuildPackages(pluginapi.Plugin):
 
+    # job started by buildAllPackages, and the source fingerprints of the
+    # packages it builds
+    _pendingJob = None
+
     def initialize(self):
         self.handle.Commands.getCommandClass('build').registerSubCommand(
                                     'packages', BuildPackagesCommand,
                                     aliases=['package', ])
 
-    def buildAllPackages(self):
+    def buildAllPackages(self, changedOnly=False):
+        """
+        Build all checked-out packages.
+        @param changedOnly: only build the packages whose sources changed
+        since they were last built and committed
+        @return: id of the rMake job, or C{None} if C{changedOnly} is set
+        and nothing changed
+        """
         self.handle.Build.warnIfOldProductDefinition('building all packages')
-        job = self.createJobForAllPackages()
+        # fingerprinting is cheap next to the build, so it is done even
+        # for --all, to record what was built
+        changed, fingerprints = packages.getChangedPackages(self.handle)
+        if changedOnly and fingerprints:
+            if not changed:
+                return None
+            # only the changed checkouts, not the rest of the image group;
+            # the others are recorded in the manifest as they are
+            built = dict((x, fingerprints[x]) for x in changed)
+            job = self.createJobForPackages(changed, recurse=False)
+        else:
+            built = fingerprints
+            job = self.createJobForAllPackages()
         jobId = self.handle.facade.rmake.buildJob(job)
         self.handle.productStore.setPackageJobId(jobId)
+        if built:
+            self._pendingJob = (jobId, built)
         return jobId
 
+    def recordBuiltPackages(self, jobId):
+        """
+        Record that job C{jobId}, started by C{buildAllPackages}, was
+        committed, so that its packages are not built again until their
+        sources change.
+        """
+        if self._pendingJob is None or self._pendingJob[0] != jobId:
+            return
+        packages.recordBuiltPackages(self.handle, self._pendingJob[1], jobId)
+        self._pendingJob = None
+
     def buildPackages(self, packageList, recurse=True):
         self.handle.Build.warnIfOldProductDefinition('building packages')
         job = self.createJobForPackages(packageList, recurse)
@@ -103,6 +165,44 @@ class BuildPackages(pluginapi.Plugin):
         self.handle.productStore.setPackageJobId(jobId)
         return jobId
 
+    def getRebuildSet(self, packageList):
+        """
+        Find the packages to build so that everything depending on
+        C{packageList} is rebuilt against it.
+        @param packageList: names of the packages to build
+        @return: sorted names of the packages in C{packageList} plus every
+        package in the checkouts or the image groups that requires one of
+        them to build
+        """
+        graph = packages.getBuildRequirementGraph(self.handle)
+        return packages.getRebuildSet(graph, packageList)
+
+    def getBuildPlan(self, packageList=None, recurse=False,
+                     changedOnly=True):
+        """
+        Find what building packages would do, without building anything.
+        Takes the same options as C{BuildPackagesCommand}.
+        @return: sorted names of the packages that would be built, and
+        the estimated number of troves in the job, one per package and
+        image flavor
+        """
+        if not packageList:
+            fingerprints = None
+            if changedOnly:
+                changed, fingerprints = packages.getChangedPackages(
+                    self.handle)
+            if fingerprints:
+                names = changed
+            else:
+                names = sorted(
+                    self.handle.productStore.getEditedRecipeDicts()[0])
+        elif recurse:
+            names = self.getRebuildSet(packageList)
+        else:
+            names = sorted(set(packageList))
+        flavors = set(x[1] for x in self.handle.productStore.getGroupFlavors())
+        return names, len(names) * len(flavors)
+
     def createJobForAllPackages(self):
         return packages.createRmakeJobForAllPackages(self.handle)
 
@@ -264,6 +264,7 @@ class Edit(pluginapi.Plugin):
             stream.seek(0)
             handle.product.__init__(fromStream=stream,
                     schemaDir=handle.product.schemaDir, validate=True)
+            handle.productStore.invalidateProductIndex()
             handle.product.serialize(StringIO.StringIO(), validate=True)
             return 0
         except etree.Error, e:
@@ -66,11 +66,10 @@ class CreateImageDefCommand(command.BaseCommand):
         _, type, arch = self.requireParameters(
             args, expected=['TYPE', 'ARCH'])
 
-        imageType = [i for i in rb.getImageTypes() if i.name == type]
-        if not imageType:
+        imageType = rb.getImageType(type)
+        if imageType is None:
             raise errors.PluginError("No such image type '%s'."
                 " Run `rbuild list imagetypes` to see valid image types" % type)
-        imageType = imageType[0]
 
         if arch not in ['x86', 'x86_64']:
             raise errors.PluginError(
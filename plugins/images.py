@@ -20,8 +20,8 @@ images
 '''
 from datetime import datetime
 import os
-import time
 
+import robj
 from xobj import xobj
 
 from rbuild import errors
@@ -31,6 +31,26 @@ from rbuild.productstore.decorators import requiresStage
 from rbuild.pluginapi import command
 
 
+def _parseImageId(imageId):
+    try:
+        return int(imageId)
+    except (TypeError, ValueError):
+        return None
+
+
+def _uniqueImageIds(imageIds):
+    # '7' and '007' name the same image; keep the first spelling given
+    seen = set()
+    results = []
+    for imageId in imageIds:
+        number = _parseImageId(imageId)
+        key = imageId if number is None else number
+        if key not in seen:
+            seen.add(key)
+            results.append(imageId)
+    return results
+
+
 class CancelImageError(errors.RbuildError):
     """Raised when there is an error canceling an image build"""
 
@@ -57,16 +77,8 @@ class CancelImagesCommand(command.BaseCommand):
                 raise errors.BadParameterError(
                     "Cannot parse image id '%s'" % imageId)
 
-            try:
-                image = handle.Images.getImage(imageId)
-            except MissingImageError as err:
-                handle.ui.warning(str(err))
-                continue
-
-            try:
-                handle.Images.cancel(image)
-            except CancelImageError as err:
-                handle.ui.warning(str(err))
+        handle.ui.writeTable(handle.Images.cancelImages(imageIds),
+                             headers=('ID', 'RESULT'))
 
 
 class DeleteImagesCommand(command.BaseCommand):
@@ -82,13 +94,19 @@ class DeleteImagesCommand(command.BaseCommand):
         force = argSet.pop("force", False)
         _, imageIds = self.requireParameters(
             args, expected=['IMAGEID'], appendExtra=True)
+
+        validIds = []
         for imageId in imageIds:
             try:
                 int(imageId)
-                handle.Images.delete(imageId, force)
+                validIds.append(imageId)
             except ValueError:
                 handle.ui.warning("Cannot parse image id '%s'" % imageId)
 
+        if validIds:
+            handle.ui.writeTable(handle.Images.deleteImages(validIds, force),
+                                 headers=('ID', 'RESULT'))
+
 
 class LaunchCommand(command.BaseCommand):
     help = 'Launch/Deploy an image onto a target'
@@ -147,7 +165,8 @@ class ListImagesCommand(command.ListCommand):
     listFields = ('image_id', 'name', 'image_type', 'architecture',
         'trailing_version', 'time_created', 'status', 'status_message',)
     listFieldMap = dict(
-        image_type=dict(accessor=lambda i: i.image_type.name),
+        image_type=dict(accessor=lambda i: i.image_type.name,
+                        link='image_type'),
         trailing_version=dict(display_name='Version'),
         time_created=dict(display_name="Created",
                           accessor=lambda i: util.convertTime(i.time_created))
@@ -155,18 +174,25 @@ class ListImagesCommand(command.ListCommand):
     showFieldMap = dict(
         actions=dict(hidden=True),
         build_log=dict(accessor=lambda i: i._root.build_log.id),
-        created_by=dict(accessor=lambda i: i.created_by.full_name),
+        created_by=dict(accessor=lambda i: i.created_by.full_name,
+                        link='created_by'),
         files=dict(
             accessor=lambda i: ', '.join('%s: %s' % (f.title, f.url)
                                          for f in i.files),
+            link='files',
             ),
         jobs=dict(accessor=lambda i: i._root.jobs.id),
-        project=dict(accessor=lambda i: i.project.name),
-        project_branch=dict(accessor=lambda i: i.project_branch.name[0]),
+        project=dict(accessor=lambda i: i.project.name, link='project'),
+        project_branch=dict(accessor=lambda i: i.project_branch.name[0],
+                            link='project_branch'),
         # add in fields definied in listFieldMap
         **listFieldMap
         )
 
+    def _getShowResources(self, handle, idList):
+        images = handle.Images.getImagesById(idList)
+        return [(imageId, images.get(imageId)) for imageId in idList]
+
     def _list(self, handle, *args, **kwargs):
         resources = super(ListImagesCommand, self)._list(
             handle, *args, **kwargs)
@@ -187,6 +213,9 @@ class Images(pluginapi.Plugin):
     LAUNCH = 'launch_system_on_target'
     CANCEL = 'image_build_cancellation'
 
+    #: number of image jobs to run concurrently when acting on several images
+    JOBS = 8
+
     def _createJob(self, action_type, image_name, target_name, doLaunch):
         rb = self.handle.facade.rbuilder
 
@@ -246,6 +275,9 @@ class Images(pluginapi.Plugin):
         :param image: image obj
         :type image: rObj(image)
         '''
+        return image.jobs.append(self._createCancelJob(image))
+
+    def _createCancelJob(self, image):
         if image.status != '100':
             raise CancelImageError(msg="Image '%s' is not currently building" %
                 image.image_id)
@@ -263,7 +295,50 @@ class Images(pluginapi.Plugin):
         job.job_type = cancelAction._root.job_type
         job.descriptor = cancelAction._root.descriptor
         job.descriptor_data = xobj.parse(ddata.toxml()).descriptor_data
-        return image.jobs.append(doc)
+        return doc
+
+    def cancelImages(self, imageIds):
+        '''
+        Cancel several image builds, fetching the images with one query and
+        cancelling them concurrently
+
+        :param imageIds: ids of images to cancel
+        :type imageIds: list of str
+        :return: id and outcome of each cancellation, in the order given
+        :rtype: list of tuples
+        '''
+        imageIds = _uniqueImageIds(imageIds)
+        images = self.getImagesById(imageIds)
+
+        # filling in descriptor data may prompt, so do it here rather than
+        # in the worker threads
+        cancelJobs = {}
+        for imageId, image in images.items():
+            try:
+                cancelJobs[imageId] = self._createCancelJob(image)
+            except errors.RbuildError, err:
+                cancelJobs[imageId] = err
+
+        def _cancel(image, imageId):
+            job = cancelJobs[imageId]
+            if isinstance(job, errors.RbuildError):
+                raise job
+            image.jobs.append(job)
+            return 'Cancelled'
+        return self._runImageJobs(imageIds, images, _cancel)
+
+    def _runImageJobs(self, imageIds, images, func):
+        # func returns the outcome for an image; images that are missing or
+        # fail are reported rather than stopping the others
+        def _run(imageId):
+            image = images.get(imageId)
+            if image is None:
+                return (imageId, 'Not found')
+            try:
+                return (imageId, func(image, imageId))
+            except (errors.RbuildError, robj.errors.HTTPError), err:
+                return (imageId, str(err))
+        return util.threadedMap(_run, imageIds, self.JOBS)
 
     def deployImage(self, *args, **kwargs):
         '''
@@ -290,6 +365,36 @@ class Images(pluginapi.Plugin):
                 ):
             image.delete()
 
+    def deleteImages(self, imageIds, force=False):
+        '''
+        Delete several images, fetching them with one query and deleting
+        them concurrently once every deletion has been confirmed
+
+        :param imageIds: ids of images to delete
+        :type imageIds: list of str
+        :param force: delete without prompting
+        :type force: bool
+        :return: id and outcome of each deletion, in the order given
+        :rtype: list of tuples
+        '''
+        imageIds = _uniqueImageIds(imageIds)
+        images = self.getImagesById(imageIds)
+        confirmed = set(images)
+        if not force:
+            # prompts cannot be interleaved, so ask before starting any work
+            confirmed = set(imageId for imageId in imageIds
+                            if imageId in images and self.handle.ui.getYn(
+                                "Delete {0}?".format(images[imageId].name),
+                                default=False,
+                                ))
+
+        def _delete(image, imageId):
+            if imageId not in confirmed:
+                return 'Skipped'
+            image.delete()
+            return 'Deleted'
+        return self._runImageJobs(imageIds, images, _delete)
+
     def getImage(self, image_name):
         images = self.getImages(image_name)
         if len(images) > 1:
@@ -297,6 +402,45 @@ class Images(pluginapi.Plugin):
                                      image_name)
         return images[0]
 
+    def getImagesById(self, imageIds):
+        '''
+        Fetch several images of the active stage with a single query
+
+        :param imageIds: ids of images to fetch
+        :type imageIds: list of str
+        :return: images keyed by the ids as given, which are compared as
+            numbers; ids that were not found are left out
+        :rtype: dict
+        '''
+        wanted = {}
+        for imageId in imageIds:
+            number = _parseImageId(imageId)
+            if number is not None:
+                wanted.setdefault(number, []).append(imageId)
+        if not wanted:
+            return {}
+
+        rb = self.handle.facade.rbuilder
+        project, branch, stage = self._getProductStage()
+        try:
+            images = rb.getImages(
+                image_id=[str(x) for x in sorted(wanted)],
+                project=project,
+                branch=branch,
+                stage=stage,
+                )
+        except robj.errors.HTTPBadRequestError:
+            # older rBuilders do not understand IN() filters
+            images = []
+            for number in sorted(wanted):
+                images.extend(rb.getImages(image_id=str(number),
+                    project=project, branch=branch, stage=stage) or [])
+        results = {}
+        for image in images or []:
+            for imageId in wanted.get(_parseImageId(image.image_id), []):
+                results[imageId] = image
+        return results
+
     def getImages(self, image_name):
         rb = self.handle.facade.rbuilder
 
@@ -370,14 +514,15 @@ class Images(pluginapi.Plugin):
             return image[0]
 
     def watchJob(self, job):
-        last_status = None
-        while job.job_state.name in ['Queued', 'Running']:
+        last_status = [None]
+
+        def _progress(job):
             status = job.status_text
-            if status != last_status:
+            if status != last_status[0]:
                 self.handle.ui.lineOutProgress(status.replace('%', '%%'))
-            last_status = status
-            time.sleep(1)
-            job.refresh()
+            last_status[0] = status
+
+        util.waitForJob(job, callback=_progress)
 
         if job.job_state.name == 'Failed':
             raise errors.PluginError(job.status_text)
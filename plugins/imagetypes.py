@@ -53,7 +53,7 @@ class ImageTypes(pluginapi.Plugin):
                 self.handle.product.getPlatformBuildTemplates())
         else:
             availableTypes = None
-        types = (type for type in rb.getImageTypes() if type.name)
+        types = (type for type in rb.listImageTypes() if type.name)
         if availableTypes:
             types = (type for type in types if type.name in availableTypes)
         return sorted(types, key=lambda t: (t.name, t.description))
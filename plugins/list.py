@@ -9,6 +9,7 @@ from rbuild.pluginapi import command
 class ListCommand(command.CommandWithSubCommands):
     help = 'List objects associated with the rbuilder'
     commands = ['list', 'query']
+    promptsUser = False
 
 
 class List(pluginapi.Plugin):
@@ -72,17 +72,21 @@ class ListProjectsCommand(command.ListCommand):
         password=dict(hidden=True),
         created_by=dict(
             accessor=lambda p: p.created_by.full_name if p.created_by else '',
+            link='created_by',
             ),
         modified_by=dict(
             accessor=lambda p: p.modified_by.full_name if p.modified_by else '',
+            link='modified_by',
             ),
         project_branches=dict(
             accessor=lambda p: ', '.join(b.name for b in p.project_branches)
                 if p.project_branches else '',
+            link='project_branches',
             ),
         project_branch_stages=dict(
             accessor=lambda p: ', '.join(s.name for s in p.project_branch_stages)
                 if p.project_branch_stages else '',
+            link='project_branch_stages',
             ),
         )
 
@@ -25,6 +25,7 @@ class ShowCommand(command.CommandWithSubCommands):
     help = 'Shows details about the result of rbuild operations'
 
     commands = ['show']
+    promptsUser = False
 
 class Show(pluginapi.Plugin):
     name = 'show'
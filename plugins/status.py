@@ -20,7 +20,9 @@ status command and related utilities.
 """
 import os
 
+from rbuild import errors
 from rbuild import pluginapi
+from rbuild.lib import util
 from rbuild.pluginapi import command
 
 from rbuild.productstore import dirstore
@@ -47,6 +49,7 @@ class StatusCommand(command.BaseCommand):
     """
 
     commands = ['status']
+    promptsUser = False
     help = 'Print summary of differences between filesystem and repository'
     docs = {
         'all' : 'Print status for entire product checkout',
@@ -56,6 +59,8 @@ class StatusCommand(command.BaseCommand):
         'local' : 'Print out only local changes not committed',
         'repository' :
             'Print out only changes in repository not applied locally',
+        'jobs' : 'Examine up to this many checkouts concurrently, querying'
+            ' the repository once for all of them',
     }
 
     def addLocalParameters(self, argDef):
@@ -65,6 +70,7 @@ class StatusCommand(command.BaseCommand):
         argDef['concise'] = command.NO_PARAM
         argDef['local'] = command.NO_PARAM
         argDef['repository'] = command.NO_PARAM
+        argDef['jobs'] = '-j', command.ONE_PARAM
 
     def runCommand(self, handle, argSet, args):
         args = args[2:]
@@ -86,6 +92,13 @@ class StatusCommand(command.BaseCommand):
             # neither == both
             localArg = repositoryArg = True
 
+        jobs = argSet.pop('jobs', 1)
+        try:
+            jobs = int(jobs)
+        except ValueError:
+            raise errors.BadParameterError(
+                "Cannot parse number of jobs '%s'" % jobs)
+
         cwd = os.getcwd()
         dirList = args
         if allArg:
@@ -101,9 +114,13 @@ class StatusCommand(command.BaseCommand):
         productArg = not argSet.pop('no-product', not productArg)
         productArg = argSet.pop('product', productArg)
 
+        kwargs = {}
+        if jobs > 1:
+            kwargs['jobs'] = jobs
         for thisDir in dirList:
             handle.Status.printDirectoryStatus(thisDir, verbosity=verbosity,
-                product=productArg, local=localArg, repository=repositoryArg)
+                product=productArg, local=localArg, repository=repositoryArg,
+                **kwargs)
 
 
 
@@ -114,7 +131,7 @@ class Status(pluginapi.Plugin):
         self.handle.Commands.registerCommand(StatusCommand)
 
     def printDirectoryStatus(self, directory, verbosity=DEFAULT, product=False,
-            local=True, repository=True):
+            local=True, repository=True, jobs=1):
         #pylint: disable-msg=R0913,R0914
         # conflating arguments would just make this harder to understand
         # not amenable to refactoring to split up local variables
@@ -129,6 +146,9 @@ class Status(pluginapi.Plugin):
         @param local: Display local filesystem changes not yet committed
         @param repository: Display changes committed to the repository
         but not yet applied locally
+        @param jobs: If greater than 1, look up repository changes for all
+        checkouts in one query and compute local changes for up to C{jobs}
+        checkouts concurrently before printing anything
 
         At least one of C{local} and C{repository} must be set.
         '''
@@ -158,10 +178,7 @@ class Status(pluginapi.Plugin):
                 return dirName[baseDirLen+1:]
             return dirName
 
-        pendingAnnounce = self._printOneDirectoryStatus(
-            directory, stripPrefix(directory), verbosity, '',
-            local=local, repository=repository)
-
+        dirList = [directory]
         for dirpath, dirnames, _ in os.walk(directory):
             for oneDir in sorted(dirnames):
                 if oneDir == '.rbuild':
@@ -169,15 +186,60 @@ class Status(pluginapi.Plugin):
                     # appropriate, stop from recursing
                     dirnames.remove('.rbuild')
                     continue
-                dirName = os.path.join(dirpath, oneDir)
-                pendingAnnounce = self._printOneDirectoryStatus(
-                    dirName, stripPrefix(dirName), verbosity, pendingAnnounce,
-                    local=local, repository=repository)
+                dirList.append(os.path.join(dirpath, oneDir))
+
+        prefetched = {}
+        if jobs > 1:
+            prefetched = self._prefetchDirectoryStatus(dirList, jobs,
+                local=local, repository=repository)
+
+        pendingAnnounce = ''
+        for dirName in dirList:
+            kwargs = {}
+            if dirName in prefetched:
+                kwargs['prefetched'] = prefetched[dirName]
+            pendingAnnounce = self._printOneDirectoryStatus(
+                dirName, stripPrefix(dirName), verbosity, pendingAnnounce,
+                local=local, repository=repository, **kwargs)
+
+    def _prefetchDirectoryStatus(self, dirList, jobs, local=True,
+            repository=True):
+        '''
+        Collects status for all checkouts in C{dirList} up front: newer
+        repository versions with a single repository query, and local
+        changes using up to C{jobs} worker processes.
+        @param dirList: Paths to directories, not all of which need be
+        checkouts
+        @param jobs: Maximum number of concurrent local status checks
+        @param local: Collect local filesystem changes
+        @param repository: Collect changes committed to the repository
+        @return: dict mapping each checkout directory to a
+        C{(newerVersions, status)} tuple
+        '''
+        conaryfacade = self.handle.facade.conary
+        checkoutDirs = [x for x in dirList
+                        if conaryfacade.isConaryCheckoutDirectory(x)]
+
+        newerVersions = {}
+        if repository:
+            newerVersions = \
+                conaryfacade.getNewerRepositoryVersionsForDirectories(
+                    checkoutDirs)
+
+        statusList = [None] * len(checkoutDirs)
+        if local:
+            # conary's checkin code is not thread-safe, so each worker is
+            # a process with its own conary client
+            statusList = util.forkedMap(conaryfacade.getCheckoutStatus,
+                checkoutDirs, jobs, initializer=conaryfacade.clearCachedClient)
+
+        return dict((dirName, (newerVersions.get(dirName, []), status))
+                    for dirName, status in zip(checkoutDirs, statusList))
 
 
     def _printOneDirectoryStatus(self, dirName, displayName,
             verbosity, pendingAnnounce=None, proddef=False,
-            local=True, repository=True):
+            local=True, repository=True, prefetched=None):
         #pylint: disable-msg=R0912,R0913,R0914
         # branches are required by spec
         # conflating arguments would just make this harder to understand
@@ -194,6 +256,8 @@ class Status(pluginapi.Plugin):
         @param local: Display local filesystem changes not yet committed
         @param repository: Display changes committed to the repository
         but not yet applied locally
+        @param prefetched: C{(newerVersions, status)} already collected
+        for this checkout, or C{None} to look them up now
         @return: current stage name pendingAnnounce for next iteration
         '''
 
@@ -201,15 +265,24 @@ class Status(pluginapi.Plugin):
         if conaryfacade.isConaryCheckoutDirectory(dirName):
             ui = self.handle.ui
 
+            if prefetched is not None:
+                prefetchedVersions, prefetchedStatus = prefetched
+
             repositoryChanges = False
             if repository:
-                newerVersions = [x for x in
-                    conaryfacade._getNewerRepositoryVersions(dirName)]
+                if prefetched is not None:
+                    newerVersions = prefetchedVersions
+                else:
+                    newerVersions = [x for x in
+                        conaryfacade._getNewerRepositoryVersions(dirName)]
                 repositoryChanges = newerVersions and True or False
 
             localChanges = False
             if local:
-                status = conaryfacade.getCheckoutStatus(dirName)
+                if prefetched is not None:
+                    status = prefetchedStatus
+                else:
+                    status = conaryfacade.getCheckoutStatus(dirName)
                 if status:
                     localChanges = True
 
@@ -120,8 +120,9 @@ class ListTargetsCommand(command.ListCommand):
         jobs=dict(hidden=True),
         target_configuration=dict(hidden=True),
         target_user_credentials=dict(hidden=True),
-        target_type=dict(accessor=lambda t: t.target_type.description),
-        zone=dict(accessor=lambda t: t.zone.name),
+        target_type=dict(accessor=lambda t: t.target_type.description,
+                         link='target_type'),
+        zone=dict(accessor=lambda t: t.zone.name, link='zone'),
         **listFieldMap
         )
 
@@ -146,12 +147,11 @@ class Targets(pluginapi.Plugin):
         dc = self.handle.DescriptorConfig
         rb = self.handle.facade.rbuilder
 
-        targetTypes = [t for t in rb.getTargetTypes() if t.name == targetType]
-        if not targetTypes:
+        ttype = rb.getTargetType(targetType)
+        if ttype is None:
             raise errors.PluginError(
                 "No such target type '%s'. Run `rbuild list targettypes` to"
                 " see valid target types" % targetType)
-        ttype = targetTypes[0]
 
         descriptor_xml = ttype.descriptor_create_target.read()
         currentValues = {}
@@ -206,8 +206,11 @@ class Targets(pluginapi.Plugin):
         if target:
             self._deleteTarget(target[0], force)
         else:
-            # no target found with that ID, check if the ID is really a name
-            targets = [ t for t in self.handle.facade.rbuilder.getTargets() if t.name == targetId ]
+            # no target found with that ID, check if the ID is really a name;
+            # the server may have ignored the filter, so check it here too
+            targets = [t for t in
+                       self.handle.facade.rbuilder.getTargets(name=targetId)
+                       if t.name == targetId]
             if targets:
                 for target in targets:
                     self._deleteTarget(target, force)
@@ -248,8 +251,7 @@ class Targets(pluginapi.Plugin):
         if rb.isAdmin(self.handle.getConfig().user[0]):
             currentValues = dict((e, getattr(target.target_configuration, e))
                                  for e in target.target_configuration.elements)
-            ttype = [t for t in rb.getTargetTypes()
-                     if t.name == target.target_type.name][0]
+            ttype = rb.getTargetType(str(target.target_type.name))
             ddata = dc.createDescriptorData(
                 fromStream=ttype.descriptor_create_target.read(),
                 defaults=currentValues,
@@ -39,4 +39,4 @@ class TargetTypes(pluginapi.Plugin):
             cmd.registerSubCommand(subcommand, commandClass)
 
     def list(self):
-        return self.handle.facade.rbuilder.getTargetTypes()
+        return self.handle.facade.rbuilder.listTargetTypes()
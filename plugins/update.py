@@ -22,15 +22,51 @@ import os
 
 from rbuild import errors
 from rbuild import pluginapi
+from rbuild.lib import util
 from rbuild.productstore.decorators import requiresStage
 from rbuild.productstore.decorators import requiresProduct
 
 
+class UpdateFailedError(errors.PluginError):
+    """Raised when one or more package checkouts could not be updated"""
+    template = "%(count)d package checkout(s) failed to update"
+    params = ['count']
+
+
+class _UpdateCheckoutsCommand(pluginapi.command.BaseCommand):
+    """
+    Base class for update subcommands that update many package checkouts,
+    providing the C{--jobs} option.
+    """
+    docs = {'jobs': 'Update up to this many package checkouts concurrently'}
+
+    def addLocalParameters(self, argDef):
+        argDef['jobs'] = '-j', pluginapi.command.ONE_PARAM
+
+    @staticmethod
+    def _getUpdateOptions(argSet):
+        """
+        @return: keyword arguments for the C{Update} plugin methods
+        @rtype: dict
+        """
+        kwargs = {}
+        jobs = argSet.pop('jobs', 1)
+        try:
+            jobs = int(jobs)
+        except ValueError:
+            raise errors.BadParameterError(
+                "Cannot parse number of jobs '%s'" % jobs)
+        if jobs > 1:
+            kwargs['jobs'] = jobs
+        return kwargs
+
+
 class UpdateCommand(pluginapi.command.CommandWithSubCommands):
     """
     Updates source directories based on working directory
     """
     commands = ['update']
+    promptsUser = False
     help = 'Update working directories from repository'
     def runCommand(self, handle, argSet, args):
         """
@@ -66,64 +102,70 @@ class UpdateProductCommand(pluginapi.command.BaseCommand):
         return None
 
 
-class UpdatePackagesCommand(pluginapi.command.BaseCommand):
+class UpdatePackagesCommand(_UpdateCheckoutsCommand):
     """
     Updates all packages in all stages
     """
     help = 'Updates all packages in all stages'
-    def runCommand(self, handle, _, args):
+    def runCommand(self, handle, argSet, args):
         #pylint: disable-msg=C0999,W0613
-        #can't have two args both called _ to make them be ignored
+        # args is unused
         """
         Process the command line provided for this plugin
         @param handle: context handle
         @type handle: rbuild.handle.RbuildHandle
+        @param argSet: dictionary of flags passed to the command
         """
-        handle.Update.updateAllStages()
+        kwargs = self._getUpdateOptions(argSet)
+        handle.Update.updateAllStages(**kwargs)
         return None
 
 
-class UpdateStageCommand(pluginapi.command.BaseCommand):
+class UpdateStageCommand(_UpdateCheckoutsCommand):
     """
     Updates all packages in stage
     """
     help = 'Updates all packages in current or named stage(s)'
     paramHelp = '[stagename]*'
-    def runCommand(self, handle, _, args):
-        #pylint: disable-msg=C0999,W0613
-        #can't have two args both called _ to make them be ignored
+    def runCommand(self, handle, argSet, args):
         """
         Process the command line provided for this plugin
         @param handle: context handle
         @type handle: rbuild.handle.RbuildHandle
+        @param argSet: dictionary of flags passed to the command
         @param args: command-line arguments
         @type args: iterable
         """
+        kwargs = self._getUpdateOptions(argSet)
         args = args[2:]
         if args:
-            handle.Update.updateStages(args)
+            handle.Update.updateStages(args, **kwargs)
         else:
-            handle.Update.updateCurrentStage()
+            handle.Update.updateCurrentStage(**kwargs)
         return None
 
 
-class UpdateAllCommand(pluginapi.command.BaseCommand):
+class UpdateAllCommand(_UpdateCheckoutsCommand):
     """
     Updates all contents of checkout, regardless of current directory
     """
     help = 'Updates all checkout contents, from any directory'
 
     @requiresProduct
-    def runCommand(self, handle, _, args):
+    def runCommand(self, handle, argSet, args):
         #pylint: disable-msg=C0999,W0613
-        #can't have two args both called _ to make them be ignored
+        # args is unused
         """
         Process the command line provided for this plugin
         @param handle: context handle
         @type handle: rbuild.handle.RbuildHandle
+        @param argSet: dictionary of flags passed to the command
         """
+        kwargs = self._getUpdateOptions(argSet)
+        # the product definition determines the stages, so it is always
+        # updated first and on its own
         handle.productStore.update()
-        handle.Update.updateAllStages()
+        handle.Update.updateAllStages(**kwargs)
         return None
 
 
@@ -160,34 +202,73 @@ class Update(pluginapi.Plugin):
             self.updateCurrentStage()
 
     @requiresProduct
-    def updateAllStages(self):
+    def updateAllStages(self, jobs=1):
         """
         Update all source packages in all stages in the current product.
+        @param jobs: maximum number of checkouts to update concurrently
+        @type jobs: int
         """
-        self.updateStages(self.handle.productStore.iterStageNames())
+        self.updateStages(self.handle.productStore.iterStageNames(),
+                          jobs=jobs)
 
     @requiresStage
-    def updateCurrentStage(self):
+    def updateCurrentStage(self, jobs=1):
         """
         Update all source packages in the current stage in the current product.
+        @param jobs: maximum number of checkouts to update concurrently
+        @type jobs: int
         """
         stageName = self.handle.productStore.getActiveStageName()
-        self.updateStages([stageName])
+        self.updateStages([stageName], jobs=jobs)
 
     @requiresProduct
-    def updateStages(self, stageNames):
+    def updateStages(self, stageNames, jobs=1):
         """
         Update all source packages in all listed stages in the current product.
+        With C{jobs} greater than 1, package checkouts are updated
+        concurrently by worker processes, and failures are reported
+        together once all updates have finished.
         @param stageNames: names of stages to update
         @type stageNames: list of strings
+        @param jobs: maximum number of checkouts to update concurrently
+        @type jobs: int
+        @raise UpdateFailedError: if any checkout failed to update while
+        updating concurrently
         """
         productStore = self.handle.productStore
+        packageDirs = []
         for stageName in stageNames:
             for checkoutDict in productStore.getEditedRecipeDicts(stageName):
                 for packageDir in sorted(checkoutDict.values()):
                     if not os.path.isdir(packageDir):
                         packageDir = os.path.dirname(packageDir)
-                    self.handle.facade.conary.updateCheckout(packageDir)
+                    packageDirs.append(packageDir)
+
+        conaryFacade = self.handle.facade.conary
+        if jobs <= 1:
+            for packageDir in packageDirs:
+                conaryFacade.updateCheckout(packageDir)
+            return
+
+        def updateOne(packageDir):
+            #pylint: disable-msg=W0703
+            # * catch Exception is safe: failures are reported per checkout
+            try:
+                conaryFacade.updateCheckout(packageDir)
+            except Exception, err:
+                return util.formatException(err)
+            return None
+
+        # conary's checkin code changes the working directory and is not
+        # thread-safe, so each worker is a process with its own client
+        results = util.forkedMap(updateOne, packageDirs, jobs,
+                                 initializer=conaryFacade.clearCachedClient)
+        failures = [(x, y) for x, y in zip(packageDirs, results)
+                    if y is not None]
+        if failures:
+            for packageDir, err in failures:
+                self.handle.ui.writeError('%s: %s', packageDir, err)
+            raise UpdateFailedError(len(failures))
 
     def updateCurrentDirectory(self):
         """
@@ -220,10 +220,13 @@ class ListUsersCommand(command.ListCommand):
     listFields = ('user_id', 'user_name', 'full_name', 'email', 'is_admin',
         'external_auth', 'can_create')
     showFieldMap = dict(
-        created_by=dict(accessor=lambda u: u.created_by.full_name),
+        created_by=dict(accessor=lambda u: u.created_by.full_name,
+                        link='created_by'),
         roles=dict(
-            accessor=lambda u: ', '.join(sorted(r.name for r in u.roles))),
-        modified_by=dict(accessor=lambda u: u.modified_by.full_name),
+            accessor=lambda u: ', '.join(sorted(r.name for r in u.roles)),
+            link='roles'),
+        modified_by=dict(accessor=lambda u: u.modified_by.full_name,
+                         link='modified_by'),
         )
 
 
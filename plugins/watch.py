@@ -35,6 +35,7 @@ class WatchCommand(command.CommandWithSubCommands):
     help = 'Watches details about the result of rbuild operations'
 
     commands = ['watch']
+    promptsUser = False
 
 class WatchJobCommand(command.BaseCommand):
     def runCommand(self, handle, _, args):
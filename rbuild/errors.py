@@ -231,6 +231,10 @@ class RbuilderError(RbuildError):
 class RbuilderUserError(RbuilderError):
     template = 'Error retrieving user details: %(error)s: %(frozen)r'
 
+class JobTimeoutError(RbuildError):
+    template = "Timed out after %(timeout)s seconds waiting for job"
+    params = ['timeout']
+
 
 ## END rBuild Errors
 
@@ -28,8 +28,10 @@ import copy
 import itertools
 import os
 import stat
+import time
 import types
 import urlparse
+from StringIO import StringIO
 
 from conary import conarycfg
 from conary import conaryclient
@@ -39,18 +41,19 @@ from conary import state
 from conary import trove
 from conary import versions
 
-from conary.build import loadrecipe
 from conary.build import use
 from conary.build import errors as builderrors
-from conary.build import derive
 
-from conary.cmds import clone
-from conary.cmds import updatecmd
 from conary.conaryclient import cmdline
 from conary.deps import deps
 from conary.lib import util
+from conary.repository import transport
 
 from rbuild import errors
+from rbuild.lib import diskcache
+
+#: directory holding configuration and indexes fetched from servers
+CONFIG_CACHE_DIR = '~/.rbuild/cache'
 
 
 class ConaryFacade(object):
@@ -61,13 +64,28 @@ class ConaryFacade(object):
     according to the version of Conary in use, and the contents
     of such objects are not included in the stable rBuild API.
     """
+
+    #: seconds a cached rBuilder conaryrc is used without revalidating it
+    rbuilderConfigTTL = 60 * 60
+    #: seconds subtracted from the local clock when recording how recent
+    #: a label index is, in case the repository's clock is behind
+    labelIndexClockSkew = 60 * 60
+    #: seconds before trying again to keep an index of a label whose
+    #: repository would not list its new troves
+    labelIndexRetry = 24 * 60 * 60
+
     def __init__(self, handle):
         """
         @param handle: The handle with which this instance is associated.
         """
         self._handle = handle
         self._conaryCfg = None
+        self._conaryClient = None
+        self._conaryClientCfg = None
         self._initializedFlavors = False
+        # rBuilder conaryrc contents by URL, shared by every conary and
+        # rmake configuration built in this process
+        self._rbuilderConfigs = {}
 
 #{ Private Methods
     def _parseRBuilderConfigFile(self, cfg):
@@ -80,7 +98,71 @@ class ConaryFacade(object):
         if serverUrl:
             hostname = urlparse.urlparse(serverUrl)[1]
             if hostname not in ['www.rpath.com', 'www.rpath.org']:
-                cfg.includeConfigFile(serverUrl + '/conaryrc')
+                url = serverUrl + '/conaryrc'
+                contents = self._getRBuilderConfig(url, cfg)
+                if contents is None:
+                    # let conary fetch it and report any error
+                    cfg.includeConfigFile(url)
+                else:
+                    cfg.readObject(url, StringIO(contents))
+
+    def _getRBuilderConfig(self, url, cfg):
+        """
+        Fetch the conaryrc at C{url}, reusing the copy cached in
+        C{~/.rbuild/cache} while it is younger than C{rbuilderConfigTTL}
+        and revalidating it with the server afterwards.  A stale copy is
+        used if the server cannot be reached.
+        @param url: URL of the conaryrc
+        @param cfg: configuration whose proxy settings are used to reach
+        the server
+        @return: contents of the conaryrc, or C{None} if it could not be
+        fetched
+        @rtype: str
+        """
+        if url in self._rbuilderConfigs:
+            return self._rbuilderConfigs[url]
+
+        cache = diskcache.DiskCache(os.path.expanduser(CONFIG_CACHE_DIR))
+        key = ('conaryrc', url)
+        entry = cache.get(key)
+        if entry is None or not entry.isFresh(self.rbuilderConfigTTL):
+            headers = entry and entry.getValidationHeaders() or {}
+            try:
+                response = self._openRBuilderConfig(url, cfg, headers)
+                try:
+                    entry = diskcache.CacheEntry(response.read(),
+                        etag=response.headers.get('ETag'),
+                        lastModified=response.headers.get('Last-Modified'))
+                finally:
+                    response.close()
+                cache.set(key, entry)
+            #pylint: disable-msg=W0703
+            # * catch Exception is safe: falls back to the stale copy, or
+            # to conary reporting the error
+            except Exception, err:
+                status = getattr(err, 'errcode', None)
+                if status == 304 and entry is not None:
+                    cache.touch(key, entry)
+                elif status is not None:
+                    # the server answered; let conary report the error
+                    entry = None
+
+        contents = entry and entry.data
+        self._rbuilderConfigs[url] = contents
+        return contents
+
+    @staticmethod
+    def _openRBuilderConfig(url, cfg, headers):
+        """
+        Open C{url} the way conary includes configuration files from
+        URLs, so that the proxies configured in C{cfg} are used.
+        @param url: URL to open
+        @param cfg: conary configuration providing the proxy map
+        @param headers: extra request headers
+        @return: response object
+        """
+        opener = transport.URLOpener(proxyMap=cfg.getProxyMap())
+        return opener.open(url, headers=headers.items())
 
     def _initializeFlavors(self):
         if not self._initializedFlavors:
@@ -89,9 +171,15 @@ class ConaryFacade(object):
 
     def _getConaryClient(self):
         """
-        Get a conaryclient object
+        Get a conaryclient object.  The client, along with its repository
+        proxies and their caches, is reused for as long as the conary
+        configuration it was built from remains cached.
         """
-        return conaryclient.ConaryClient(self.getConaryConfig())
+        cfg = self.getConaryConfig()
+        if self._conaryClient is None or self._conaryClientCfg is not cfg:
+            self._conaryClient = conaryclient.ConaryClient(cfg)
+            self._conaryClientCfg = cfg
+        return self._conaryClient
 
     def _getRepositoryClient(self):
         """
@@ -349,11 +437,24 @@ class ConaryFacade(object):
                                              ignoreErrors = True,
                                              readProxyValuesFirst = True)
 
+    def clearCachedClient(self):
+        """
+        Drop the cached conary client and its repository connections, so
+        that a new one is created when next needed.  Worker processes
+        forked from rbuild call this so that they do not share
+        connections with their parent.
+        """
+        self._conaryClient = None
+        self._conaryClientCfg = None
+
     def clearCachedConfig(self):
         """
-        Purges the cached Conary config object, if any.
+        Purges the cached Conary config object, if any, along with the
+        conary client built from it.
         """
         self._conaryCfg = None
+        self._conaryClient = None
+        self._conaryClientCfg = None
 
     @staticmethod
     def setFactoryFlag(factoryName, targetDir=None):
@@ -457,6 +558,42 @@ class ConaryFacade(object):
         return checkin.generateStatus(self._getRepositoryClient(),
                                       dirName=targetDir)
 
+    def getNewerRepositoryVersionsForDirectories(self, dirList):
+        '''
+        Returns lists of versions from the repository that are newer
+        than each of several checkouts, using a single repository query
+        @param dirList: directories containing Conary checkouts
+        @return: dict mapping each directory to a list of
+        C{conary.versions.Version}, newest first
+        '''
+        repos = self._getRepositoryClient()
+        sourceStates = {}
+        query = {}
+        for targetDir in dirList:
+            conaryState = state.ConaryStateFromFile(targetDir + '/CONARY',
+                                                    repos)
+            sourceState = conaryState.getSourceState()
+            sourceStates[targetDir] = sourceState
+            query.setdefault(sourceState.getName(), {})[
+                sourceState.getBranch()] = None
+
+        verDict = {}
+        if query:
+            verDict = repos.getTroveVersionsByBranch(query) or {}
+
+        newerVersions = {}
+        for targetDir, sourceState in sourceStates.iteritems():
+            branch = sourceState.getBranch()
+            troveVersion = sourceState.getVersion()
+            #pylint: disable-msg=E1103
+            # we know that ver does have an isAfter method
+            verList = [ver for ver in verDict.get(sourceState.getName(), {})
+                       if ver.branch() == branch and ver.isAfter(troveVersion)]
+            verList.sort()
+            verList.reverse()
+            newerVersions[targetDir] = verList
+        return newerVersions
+
     def getCheckoutLog(self, targetDir, newerOnly=False, versionList=None):
         """
         Returns list of lines of log messages relative to the specified
@@ -659,6 +796,7 @@ class ConaryFacade(object):
         return self._commitShadowChangeSet(results[0], results[1])[0]
 
     def derive(self, troveToDerive, targetLabel, targetDir):
+        from conary.build import derive
         repos = self._getRepositoryClient()
         cfg = self.getConaryConfig()
         derive.derive(repos,cfg, targetLabel, troveToDerive, targetDir,
@@ -711,6 +849,7 @@ class ConaryFacade(object):
             callback = None
         cfg = copy.deepcopy(cfg)
         cfg.root = targetDir
+        from conary.cmds import updatecmd
         updatecmd.doUpdate(cfg, '%s=%s[%s]' % (name, version, flavor),
                 callback=callback, depCheck=False, tagScript=tagScript)
 
@@ -810,12 +949,56 @@ class ConaryFacade(object):
 
         cfg = self.getConaryConfig()
         self._initializeFlavors()
+        from conary.build import loadrecipe
         loader = loadrecipe.RecipeLoader(recipePath, cfg=cfg,
                                      repos=repos,
                                      branch=sourceState.getBranch(),
                                      buildFlavor=cfg.buildFlavor)
         return loader.getRecipe()
 
+    def loadRecipeAttributesFromCheckouts(self, recipePaths, attributes):
+        """
+        Load the recipes in several checkouts and return some of the
+        attributes of each recipe class.  When there is more than one
+        recipe, they are loaded concurrently by a pool of worker
+        processes, forked once the configuration and flavors are set up.
+        Each worker opens its own repository connections.
+        @param recipePaths: paths to recipe files in conary checkouts
+        @type recipePaths: list of str
+        @param attributes: names of the recipe class attributes to return;
+        their values must be picklable
+        @type attributes: list of str
+        @return: values of C{attributes} for each recipe path
+        @rtype: dict of str to dict
+        """
+        recipePaths = sorted(set(recipePaths))
+        workers = min(len(recipePaths), _getRecipeLoaderCount())
+        if workers <= 1:
+            return dict((x, self._getRecipeAttributes(x, attributes))
+                        for x in recipePaths)
+
+        import multiprocessing
+        self._initializeFlavors()
+        pool = multiprocessing.Pool(workers, _initRecipeLoader,
+                                    (self, attributes))
+        try:
+            results = pool.map(_loadRecipeAttributes, recipePaths)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        recipeAttributes = {}
+        for recipePath, result in itertools.izip(recipePaths, results):
+            if result is None:
+                # load it again here so that the error is raised as is
+                result = self._getRecipeAttributes(recipePath, attributes)
+            recipeAttributes[recipePath] = result
+        return recipeAttributes
+
+    def _getRecipeAttributes(self, recipePath, attributes):
+        recipeClass = self._loadRecipeClassFromCheckout(recipePath)
+        return dict((x, getattr(recipeClass, x)) for x in attributes)
+
     def _removeNonRecipeFilesFromCheckout(self, recipePath):
         recipeDir = os.path.dirname(recipePath)
         recipeName = os.path.basename(recipePath)
@@ -869,6 +1052,34 @@ class ConaryFacade(object):
 
         return set(x.asString() for x in labels)
 
+    def getGroupBuildRequirements(self, groupTups):
+        """
+        Find what the packages included in some groups required to
+        build, from the build requirements recorded on each package when
+        it was built.
+
+        @param groupTups: groups to inspect
+        @type  groupTups: C{[troveTuple]}
+        @return: names of the packages each source package included in
+        the groups build-requires, by source package name
+        @rtype: C{dict} of C{str} to C{set}
+        """
+        repos = self._getRepositoryClient()
+        packageTups = set()
+        for group in repos.getTroves(groupTups, withFiles=False):
+            for troveTup in group.iterTroveList(strongRefs=True,
+                                                weakRefs=True):
+                if (':' not in troveTup[0]
+                        and not trove.troveIsGroup(troveTup[0])):
+                    packageTups.add(troveTup)
+
+        requirements = {}
+        for package in repos.getTroves(sorted(packageTups), withFiles=False):
+            sourceName = package.getSourceName().split(':', 1)[0]
+            requirements.setdefault(sourceName, set()).update(
+                x[0].split(':', 1)[0] for x in package.getBuildRequirements())
+        return requirements
+
     def promoteGroups(self, groupList, fromTo, infoOnly=False):
         """
         Promote the troves in C{groupList} using the promote map in
@@ -909,6 +1120,7 @@ class ConaryFacade(object):
             return packageList
 
     def detachPackage(self, troveSpec, targetLabel, message=None):
+        from conary.cmds import clone
         cfg = self.getConaryConfig()
         if not message:
             message = 'Automatic promote by rBuild.'
@@ -918,10 +1130,8 @@ class ConaryFacade(object):
 
     def getLatestPackagesOnLabel(self, label, keepComponents=False,
       keepGroups=False):
-        client = self._getConaryClient()
         label = self._getLabel(label)
-        results = client.getRepos().getTroveLatestByLabel(
-            {None: {label: [None]}})
+        results = self._getLatestTrovesOnLabel(label)
 
         packages = []
         for name, versiondict in results.iteritems():
@@ -935,6 +1145,96 @@ class ConaryFacade(object):
                     packages.append((name, version, flavor))
         return packages
 
+    def _getLatestTrovesOnLabel(self, label):
+        """
+        Find the latest version of every trove on C{label}.  The answer
+        is kept as an index in C{~/.rbuild/cache} for each repository
+        server and user, which is brought up to date by asking the
+        repository only for the troves committed since it was last
+        refreshed.  Repositories that will not list new troves are queried
+        in full every time.
+        @param label: label to search
+        @type label: conary.versions.Label
+        @return: flavors of the latest version of each trove, by name and
+        version, as returned by C{getTroveLatestByLabel}
+        @rtype: dict
+        """
+        repos = self._getConaryClient().getRepos()
+        query = {None: {label: [None]}}
+        cache = diskcache.DiskCache(os.path.expanduser(CONFIG_CACHE_DIR))
+        key = self._getLabelIndexKey(label)
+        # the index is only stored again when it changes; when it does
+        # not, the mark it is current as of is kept beside it
+        markKey = key + ('mark',)
+        entry = cache.get(key)
+        if entry is not None and entry.data['mark'] is not None:
+            index = _thawLabelIndex(entry.data['troves'])
+            mark = entry.data['mark']
+            markEntry = cache.get(markKey)
+            if markEntry is not None and markEntry.data[1] == mark:
+                mark = markEntry.data[0]
+            try:
+                newMark, changed = self._updateLabelIndex(repos, label,
+                                                          index, mark)
+            except conaryerrors.ConaryError:
+                # most likely not allowed to list new troves
+                cache.set(key, diskcache.CacheEntry(
+                    dict(mark=None, troves=None)))
+                return repos.getTroveLatestByLabel(query)
+            if newMark is not None:
+                if changed:
+                    cache.set(key, diskcache.CacheEntry(
+                        dict(mark=newMark, troves=_freezeLabelIndex(index))))
+                elif newMark != mark:
+                    cache.set(markKey, diskcache.CacheEntry(
+                        (newMark, entry.data['mark'])))
+                return index
+        elif entry is not None and entry.isFresh(self.labelIndexRetry):
+            return repos.getTroveLatestByLabel(query)
+
+        mark = long(time.time()) - self.labelIndexClockSkew
+        index = repos.getTroveLatestByLabel(query)
+        cache.set(key, diskcache.CacheEntry(
+            dict(mark=mark, troves=_freezeLabelIndex(index))))
+        return index
+
+    def _getLabelIndexKey(self, label):
+        # what is visible on a label depends on the server it maps to and
+        # on the user asking
+        cfg = self._getConaryClient().cfg
+        host = label.getHost()
+        userInfo = cfg.user.find(host)
+        return ('latestOnLabel', str(label),
+                str(cfg.repositoryMap.get(host)),
+                userInfo and str(userInfo[0]) or '')
+
+    @staticmethod
+    def _updateLabelIndex(repos, label, index, mark):
+        """
+        Add the troves committed to C{label} since C{mark} to C{index}.
+        @return: mark to start from next time, or C{None} if a trove was
+        removed from the label and the index must be rebuilt, and whether
+        C{index} changed
+        @rtype: tuple
+        """
+        host = label.getHost()
+        changed = False
+        while True:
+            newTroves = repos.getNewTroveList(host, mark)
+            if not newTroves:
+                return mark, changed
+            for _, (name, version, flavor), troveType in newTroves:
+                if version.trailingLabel() != label:
+                    continue
+                if troveType == trove.TROVE_TYPE_REMOVED:
+                    return None, True
+                if _addToLabelIndex(index, name, version, flavor):
+                    changed = True
+            newMark = max(x[0] for x in newTroves)
+            if newMark == mark:
+                return mark, changed
+            mark = newMark
+
     @staticmethod
     def parseTroveSpec(troveSpec):
         return cmdline.parseTroveSpec(troveSpec)
@@ -960,3 +1260,66 @@ class _QuietUpdateCallback(checkin.CheckinCallback):
         # arguments not documented: implements interface, ignores parameters
         'stifle update announcement for extract'
         return
+
+
+def _addToLabelIndex(index, name, version, flavor):
+    # like the repository, keep the latest version of each flavor of a
+    # trove; returns whether the index changed
+    versionDict = index.setdefault(name, {})
+    for oldVersion, flavors in versionDict.items():
+        if flavor not in flavors:
+            continue
+        if (oldVersion == version
+                or _getTimestamp(oldVersion) >= _getTimestamp(version)):
+            return False
+        flavors.remove(flavor)
+        if not flavors:
+            del versionDict[oldVersion]
+        break
+    versionDict.setdefault(version, []).append(flavor)
+    return True
+
+def _getTimestamp(version):
+    return version.trailingRevision().getTimestamp()
+
+def _freezeLabelIndex(index):
+    return [(name, version.freeze(), [x.freeze() for x in flavors])
+            for name, versionDict in index.iteritems()
+            for version, flavors in versionDict.iteritems()]
+
+def _thawLabelIndex(frozen):
+    index = {}
+    for name, version, flavors in frozen:
+        index.setdefault(name, {})[versions.ThawVersion(version)] = \
+            [deps.ThawFlavor(x) for x in flavors]
+    return index
+
+
+#: most worker processes used to load recipes
+MAX_RECIPE_LOADERS = 8
+
+_recipeLoader = None
+
+def _getRecipeLoaderCount():
+    import multiprocessing
+    try:
+        return min(multiprocessing.cpu_count(), MAX_RECIPE_LOADERS)
+    except NotImplementedError:
+        return 1
+
+def _initRecipeLoader(facade, attributes):
+    # runs in each worker process, which inherits the facade when forked;
+    # sockets to the repository must not be shared with the parent
+    global _recipeLoader
+    facade.clearCachedClient()
+    _recipeLoader = (facade, attributes)
+
+def _loadRecipeAttributes(recipePath):
+    facade, attributes = _recipeLoader
+    #pylint: disable-msg=W0703
+    # * catch Exception is safe: the caller loads the recipe again to
+    # report the error
+    try:
+        return facade._getRecipeAttributes(recipePath, attributes)
+    except Exception:
+        return None
@@ -42,6 +42,8 @@ from rpath_proddef import api1 as proddef
 from rbuild import constants
 from rbuild import errors
 from rbuild import facade
+from rbuild.lib import diskcache
+from rbuild.lib import util as rbuildutil
 
 
 class _rBuilderConfig(ConfigFile):
@@ -60,10 +62,145 @@ class _AbstractRbuilderClient(object):
     inherit from.
     """
 
+    #: upper bound, in seconds, on the poll interval used by watchImages
+    #: while no build changes status
+    maxWatchInterval = 60
+
+    #: status of a build the rBuilder no longer knows about
+    notFoundStatus = -2
+
+    statusNames = {
+            -2:  'Not found',
+            -1:  'Unknown',
+            0:   'Waiting',
+            100: 'Running',
+            200: 'Built',
+            300: 'Finished',
+            301: 'Failed',
+            302: 'Killed',
+            401: 'No job',
+        }
+
     def __init__(self, rbuilderUrl, user, pw, handle):
         self.rbuilderUrl = rbuilderUrl
         self._handle = handle
 
+    def _getBuildStatuses(self, buildIds):
+        """
+        Fetch the current status of several builds, one at a time.
+        Clients that can ask for several builds at once override this.
+
+        @param buildIds: builds to query
+        @return: dict mapping build id to a status dict with at least
+        C{status} and C{message} items
+        """
+        return dict((x, self._getBuildStatus(x)) for x in buildIds)
+
+    def _getBuildStatus(self, buildId):
+        """
+        Fetch the current status of one build.
+
+        @param buildId: build to query
+        @return: status dict with at least C{status} and C{message} items
+        """
+        raise errors.IncompleteInterfaceError(
+            'Build status is not supported by this rBuilder client')
+
+    def watchImages(self, buildIds, timeout=0, interval=5, quiet=False):
+        """
+        Poll the status of C{buildIds} until all of them have finished.
+        The poll interval starts at C{interval} and doubles, up to
+        C{maxWatchInterval}, for as long as no build changes status; any
+        change resets it to C{interval}.
+
+        @param buildIds: builds to watch
+        @param timeout: give up after this many seconds without a status
+        change; 0 waits forever
+        @param interval: initial number of seconds between polls
+        @param quiet: do not print status changes as they happen
+        @return: True if all builds finished successfully
+        """
+        st = time.time()
+        timedOut = False
+        dropped = 0
+        delay = interval
+        finalStatus = {}
+
+        activeBuilds = dict.fromkeys(buildIds)
+        while activeBuilds:
+            changed = False
+            try:
+                statuses = self._getBuildStatuses(
+                    [x for x in buildIds if x in activeBuilds])
+            except socket.timeout:
+                dropped += 1
+                if dropped >= 3:
+                    raise errors.RbuildError(
+                        'rBuilder connection timed out after 3 attempts')
+                self._handle.ui.info(
+                    'Status request timed out, trying again')
+                statuses = {}
+            else:
+                dropped = 0
+
+            for buildId in buildIds:
+                if buildId not in activeBuilds or buildId not in statuses:
+                    continue
+                buildStatus = statuses[buildId]
+                if activeBuilds[buildId] != buildStatus:
+                    changed = True
+                    st = time.time() # reset timeout counter if status changes
+                    activeBuilds[buildId] = buildStatus
+                    if not quiet:
+                        # try to get build name, fall back to just ID
+                        try:
+                            id = '%s %s' % (buildStatus['name'], buildId)
+                        except KeyError:
+                            id = buildId
+                        self._handle.ui.write('%s: %s "%s"',
+                            id, self.statusNames.get(buildStatus['status'],
+                            self.statusNames[-1]), buildStatus['message'])
+                    if self._isFinished(activeBuilds[buildId]['status']):
+                        finalStatus[buildId] = activeBuilds.pop(buildId)
+            if activeBuilds:
+                if changed:
+                    delay = interval
+                else:
+                    delay = min(delay * 2, max(interval, self.maxWatchInterval))
+                sleepTime = delay
+                if timeout:
+                    remaining = timeout - (time.time() - st)
+                    if remaining <= 0:
+                        timedOut = True
+                        break
+                    sleepTime = min(delay, remaining)
+                time.sleep(sleepTime)
+
+        if timedOut:
+            self._handle.ui.warning('Timed out while waiting for build status'
+                ' to change (%d seconds)', timeout)
+        else:
+            self._handle.ui.write('All jobs completed')
+        if activeBuilds:
+            self._handle.ui.warning('Unfinished builds:')
+            self._printStatus(activeBuilds, '    Last status: ')
+        self._handle.ui.write('Finished builds:')
+        self._printStatus(finalStatus, '    ')
+        if any(x['status'] != 300 for x in finalStatus.values()):
+            return False
+        else:
+            return True
+
+    def _isFinished(self, status):
+        return status > 200 or status == self.notFoundStatus
+
+    def _printStatus(self, statusDict, prefix = ''):
+        for buildId in statusDict.iterkeys():
+            self._handle.ui.write("%sBuild %d ended with '%s' status: %s",
+                prefix, int(buildId),
+                self.statusNames.get(statusDict[buildId]['status'],
+                self.statusNames[-1]), statusDict[buildId]['message'])
+
 
 class RbuilderRPCClient(_AbstractRbuilderClient):
     """
@@ -151,83 +288,11 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
             raise errors.RbuilderError(*buildIds)
         return buildIds
 
-    def watchImages(self, buildIds, timeout = 0, interval = 5, quiet=False):
-        interval = 10
-        st = time.time()
-        timedOut = False
-        dropped = 0
-        finalStatus = {}
-
-        activeBuilds = dict.fromkeys(buildIds)
-        while activeBuilds:
-            for buildId in list(activeBuilds):
-                try:
-                    error, buildStatus = self.server.getBuildStatus(buildId)
-                except socket.timeout:
-                    dropped += 1
-                    if dropped >= 3:
-                        raise errors.RbuildError(
-                            'rBuilder connection timed out after 3 attempts')
-                    self._handle.ui.info(
-                        'Status request timed out, trying again')
-                    time.sleep(interval)
-                    continue
-
-                if error:
-                    raise errors.RbuilderError(*buildStatus)
-                dropped = 0
-                if activeBuilds[buildId] != buildStatus:
-                    st = time.time() # reset timeout counter if status changes
-                    activeBuilds[buildId] = buildStatus
-                    if not quiet:
-                        # try to get build name, fall back to just ID
-                        try:
-                            id = '%s %s' % (buildStatus['name'], buildId)
-                        except KeyError:
-                            id = buildId
-                        self._handle.ui.write('%s: %s "%s"',
-                            id, self.statusNames.get(buildStatus['status'],
-                            self.statusNames[-1]), buildStatus['message'])
-                    if activeBuilds[buildId]['status'] > 200:
-                        finalStatus[buildId] = activeBuilds.pop(buildId)
-            if activeBuilds:
-                time.sleep(interval)
-                if timeout and time.time() - st > timeout:
-                    timedOut = True
-                    break
-
-        if timedOut:
-            self._handle.ui.error('Timed out while waiting for build status'
-                ' to change (%d seconds)', timeout)
-        else:
-            self._handle.ui.write('All jobs completed')
-        if activeBuilds:
-            self._handle.ui.warning('Unfinished builds:')
-            self._printStatus(activeBuilds, '    Last status: ')
-        self._handle.ui.write('Finished builds:')
-        self._printStatus(finalStatus, '    ')
-        if any(x['status'] != 300 for x in finalStatus.values()):
-            return False
-        else:
-            return True
-
-    statusNames = {
-            -1:  'Unknown',
-            0:   'Waiting',
-            100: 'Running',
-            200: 'Built',
-            300: 'Finished',
-            301: 'Failed',
-            302: 'Killed',
-            401: 'No job',
-        }
-
-    def _printStatus(self, statusDict, prefix = ''):
-        for buildId in statusDict.iterkeys():
-            self._handle.ui.write("%sBuild %d ended with '%s' status: %s",
-                prefix, buildId,
-                self.statusNames.get(statusDict[buildId]['status'],
-                self.statusNames[-1]), statusDict[buildId]['message'])
+    def _getBuildStatus(self, buildId):
+        error, buildStatus = self.server.getBuildStatus(buildId)
+        if error:
+            raise errors.RbuilderError(*buildStatus)
+        return buildStatus
 
     def _getBaseDownloadUrl(self):
         '''
@@ -323,6 +388,73 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
 RbuilderClient = RbuilderRPCClient
 
 
+class _PagedCollection(object):
+    """
+    REST collection fetched a page at a time.  Pages are requested with
+    C{start_index} and C{limit} as iteration reaches them; anything that
+    needs the whole collection, such as C{len()}, fetches the rest.  Other
+    attributes are looked up on the first page.
+    """
+
+    def __init__(self, client, uri, pageSize, firstPage):
+        self._client = client
+        self._uri = uri
+        self._pageSize = pageSize
+        self._firstPage = firstPage
+        self._items = []
+        self._complete = False
+        self._addPage(firstPage)
+
+    def _addPage(self, page):
+        page = list(page or [])
+        self._items.extend(page)
+        if len(page) < self._pageSize:
+            self._complete = True
+
+    def _fetchPage(self):
+        self._addPage(self._client.do_GET('%s;start_index=%d;limit=%d' % (
+            self._uri, len(self._items), self._pageSize)))
+
+    def _fetchAll(self):
+        while not self._complete:
+            self._fetchPage()
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            while idx >= len(self._items) and not self._complete:
+                self._fetchPage()
+            if idx >= len(self._items):
+                return
+            yield self._items[idx]
+            idx += 1
+
+    def __nonzero__(self):
+        return bool(self._items)
+
+    def __len__(self):
+        self._fetchAll()
+        return len(self._items)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice) or idx < 0 or idx >= len(self._items):
+            self._fetchAll()
+        return self._items[idx]
+
+    def __getattr__(self, name):
+        return getattr(self._firstPage, name)
+
+
+class _CatalogEntry(object):
+    '''
+    Plain-data summary of a catalog resource, such as an image type: its
+    C{id}, C{name} and C{description}
+    '''
+
+    def __init__(self, summary):
+        self.__dict__.update(summary)
+
+
 class RbuilderRESTClient(_AbstractRbuilderClient):
     """
     REST rBuilder Client. This will replace the RPC client as more
@@ -330,13 +462,115 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
     """
     _singleBackslashRe = re.compile(r'\\')
 
+    #: seconds that each kind of catalog data may be reused from
+    #: C{responseCache} before it is fetched or revalidated again
+    catalogTTLs = {
+            'platforms': 60 * 60,
+            'descriptors': 24 * 60 * 60,
+            'image_types': 24 * 60 * 60,
+            'target_types': 24 * 60 * 60,
+            'image_type_defs': 24 * 60 * 60,
+        }
+
+    #: L{diskcache.DiskCache} used for catalog data, or None to always
+    #: fetch it from the rBuilder
+    responseCache = None
+
+    #: if set, collections from C{_getResources} are fetched lazily in
+    #: pages of this many resources
+    pageSize = None
+
     def __init__(self, rbuilderUrl, user, pw, handle):
         _AbstractRbuilderClient.__init__(self, rbuilderUrl, user, pw, handle)
         scheme, _, _, host, port, path, _, _ = util.urlSplit(rbuilderUrl)
         path = util.joinPaths(path, 'api')
         self._url = util.urlUnsplit(
                 (scheme, user, pw, host, port, path, None, None))
+        self._user = user
         self._api = None
+        # per-session lookup tables, built from one fetch of each catalog
+        self._platformIndex = None
+        self._imageTypeDefIndex = {}
+        # cleared if the rBuilder rejects IN() filters
+        self._inFilterSupported = True
+
+    def _getRawUri(self, path):
+        # catalog paths are absolute URLs, paths on the old API (leading
+        # slash) or paths relative to the negotiated REST API
+        if path.startswith('/') or '://' in path:
+            return path
+        return self.api._uri + '/' + path
+
+    def _getRaw(self, path, headers=None):
+        client = self.api._client._client
+        request = client.do_GET(self._getRawUri(path), headers=headers)
+        request.wait()
+        response = request.response
+        content = response.content
+        if hasattr(content, 'read'):
+            content = content.read()
+        return response, content
+
+    @staticmethod
+    def _getResponseHeader(response, name):
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+        return headers.get(name) or headers.get(name.lower())
+
+    def _getCacheKey(self, kind, path):
+        return ('rbuilder', self.rbuilderUrl, self._user, kind, path)
+
+    def _getCachedDocument(self, kind, path):
+        '''
+        Fetch the raw XML document at C{path}, reusing C{responseCache}
+        while the entry is younger than the TTL for C{kind} and
+        revalidating it with the rBuilder afterwards.
+
+        @param kind: key of C{catalogTTLs} to use
+        @param path: resource path, see C{_getRawUri}
+        @return: XML document
+        '''
+        cache = self.responseCache
+        key = self._getCacheKey(kind, path)
+        entry = cache.get(key)
+        if entry is not None and entry.isFresh(self.catalogTTLs[kind]):
+            return entry.data
+
+        headers = entry and entry.getValidationHeaders() or None
+        response, content = self._getRaw(path, headers=headers)
+        if response.status == 304 and entry is not None:
+            cache.touch(key, entry)
+            return entry.data
+        if response.status >= 400:
+            raise errors.RbuildError(response.reason)
+        entry = diskcache.CacheEntry(content,
+            etag=self._getResponseHeader(response, 'ETag'),
+            lastModified=self._getResponseHeader(response, 'Last-Modified'))
+        cache.set(key, entry)
+        return entry.data
+
+    def _getCachedData(self, kind, path, fetch, refresh=False):
+        '''
+        Return plain data derived from the resource at C{path}, reusing
+        C{responseCache} while the entry is younger than the TTL for
+        C{kind}.  Only picklable data is cached, never rObj resources.
+
+        @param kind: key of C{catalogTTLs} to use
+        @param path: resource path the data is derived from
+        @param fetch: callable returning the data
+        @param refresh: ignore any cached entry
+        '''
+        cache = self.responseCache
+        if cache is None:
+            return fetch()
+        key = self._getCacheKey(kind, path)
+        entry = not refresh and cache.get(key) or None
+        if entry is not None and entry.isFresh(self.catalogTTLs[kind]):
+            return entry.data
+        data = fetch()
+        cache.set(key, diskcache.CacheEntry(data))
+        return data
 
     def _getResources(self, resource, **kwargs):
         '''
@@ -345,8 +579,11 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             @param resource: resource collection name
             @param order_by: field and direction to order results
             @param uri: alternative uri
-            @return: list of resources
+            @return: list of resources, paged if C{pageSize} is set
             @rtype: list
+
+            Remaining keyword arguments filter on fields of the resource.
+            A list, tuple or set value matches any of its members.
         '''
         uri = kwargs.pop('uri', None)
         order_by = kwargs.pop('order_by', None)
@@ -355,15 +592,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         if uri is not None:
             fullUri += uri.strip('/') + '/'
         fullUri += resource
-
-        filter_by = []
-        for field, param in kwargs.items():
-            param = self._singleBackslashRe.sub('r\\\\', param)
-            param = param.replace('"', r'\"')
-            filter_by.append('EQUAL(%s,"%s")' % (field, param))
-
-        if filter_by:
-            fullUri += ';filter_by=AND(%s)' % ','.join(filter_by)
+        fullUri += self._getFilterBy(kwargs)
 
         # always sort by most recently created first
         if order_by:
@@ -371,6 +600,10 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
 
         client = self.api._client
         try:
+            if self.pageSize:
+                return _PagedCollection(client, fullUri, self.pageSize,
+                    client.do_GET('%s;start_index=0;limit=%d' % (
+                        fullUri, self.pageSize)))
             results = client.do_GET(fullUri)
             if results:
                 return results
@@ -379,6 +612,69 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             raise errors.RbuildError("Unable to fetch resource '%s' at '%s'" %
                                      (resource, fullUri))
 
+    def _getFilterBy(self, filters):
+        '''
+            Build the C{filter_by} matrix parameter matching all of
+            C{filters}; a list, tuple or set value matches any of its
+            members.
+
+            @param filters: field name to value mapping
+            @type filters: dict
+            @return: parameter to append to a collection uri, or an empty
+            string if there are no filters
+            @rtype: str
+        '''
+        filter_by = []
+        for field, param in filters.items():
+            if isinstance(param, (list, tuple, set)):
+                filter_by.append('IN(%s,%s)' % (field, ','.join(
+                    '"%s"' % self._quoteFilterParam(x) for x in param)))
+            else:
+                filter_by.append('EQUAL(%s,"%s")' % (
+                    field, self._quoteFilterParam(param)))
+
+        if filter_by:
+            return ';filter_by=AND(%s)' % ','.join(filter_by)
+        return ''
+
+    def _quoteFilterParam(self, param):
+        param = self._singleBackslashRe.sub('r\\\\', param)
+        return param.replace('"', r'\"')
+
+    def _getBuildStatuses(self, buildIds):
+        if not self._inFilterSupported:
+            return _AbstractRbuilderClient._getBuildStatuses(self, buildIds)
+        try:
+            images = list(self._getResources('images',
+                image_id=sorted(str(x) for x in buildIds)))
+        except robj.errors.HTTPBadRequestError:
+            # older rBuilders do not understand IN() filters
+            self._inFilterSupported = False
+            return _AbstractRbuilderClient._getBuildStatuses(self, buildIds)
+        return self._getImageStatuses(buildIds, images)
+
+    def _getBuildStatus(self, buildId):
+        images = self._getResources('images', image_id=str(buildId))
+        return self._getImageStatuses([buildId], images)[buildId]
+
+    def _getImageStatuses(self, buildIds, images):
+        idMap = dict((str(x), x) for x in buildIds)
+        statuses = {}
+        for image in images:
+            buildId = idMap.get(str(image.image_id))
+            if buildId is None:
+                continue
+            statuses[buildId] = dict(
+                status=int(image.status),
+                message=str(image.status_message),
+                name=str(image.name),
+                )
+        for buildId in buildIds:
+            if buildId not in statuses:
+                statuses[buildId] = dict(status=self.notFoundStatus,
+                    message='Image not found')
+        return statuses
+
     @property
     def api(self):
         if self._api is None:
@@ -392,6 +688,22 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             self._api = ver
         return self._api
 
+    def close(self):
+        '''
+        Drop the negotiated API root and shut down its connection pool.
+        The next access to C{api} will reconnect.
+        '''
+        self._platformIndex = None
+        self._imageTypeDefIndex = {}
+        api, self._api = self._api, None
+        if api is None:
+            return
+        # robj keeps its pooled connections on the low-level http client
+        httpClient = getattr(getattr(api, '_client', None), '_client', None)
+        close = getattr(httpClient, 'close', None)
+        if close is not None:
+            close()
+
     def createTarget(self, ttype, ddata):
         '''
         Create a target using the descriptor data provided
@@ -439,9 +751,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         job.descriptor = target.actions[0]._root.descriptor
         job.descriptor_data = xobj.parse(ddata.toxml()).descriptor_data
 
-        jobObj = target.jobs.append(doc)
-        while jobObj.job_state.name in ['Queued', 'Running']:
-            jobObj.refresh()
+        jobObj = rbuildutil.waitForJob(target.jobs.append(doc))
 
         if jobObj.job_state.name == 'Failed':
             raise errors.RbuildError(jobObj.status_text)
@@ -467,9 +777,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         job.descriptor = target.actions[1]._root.descriptor
         job.descriptor_data = xobj.parse(ddata.toxml()).descriptor_data
 
-        jobObj = target.jobs.append(doc)
-        while jobObj.job_state.name in ['Queued', 'Running']:
-            jobObj.refresh()
+        jobObj = rbuildutil.waitForJob(target.jobs.append(doc))
 
         if jobObj.job_state.name == 'Failed':
             raise errors.RbuildError('Unable to set credentials')
@@ -489,6 +797,10 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
                 "Project '%s' and label '%s' not found" % (shortName, label))
 
     def getImageDefDescriptor(self, imageType):
+        if self.responseCache is not None:
+            return self._getCachedDocument('descriptors',
+                'platforms/image_type_definition_descriptors/' + imageType)
+
         # image_type_definition_descriptors are not in a collection, and they
         # have an xml header, which causes rObj to process them incorrectly
         # thus this mess
@@ -544,46 +856,159 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         return self._getResources('images', **kwargs)
 
     def getImageDefs(self, product, version, **kwargs):
+        '''
+            Get the image definitions of a product version, optionally
+            filtered by C{id} or by fields of the image definition.
+
+            Filters are passed to the rBuilder, which returns only the
+            matching definitions; if it does not support them the whole
+            list is fetched and filtered here instead.
+
+            @return: list of image definitions
+            @rtype: list of rObj(imageDefinition)
+        '''
         # image defs are on the old api, so we have to construct our own url
         client = self.api._client
 
         uri = ('/products/%s/versions/%s/imageDefinitions' %
                (product, version))
-        try:
-            availableImageDefs = client.do_GET(uri)
-        except robj.errors.HTTPNotFoundError:
-            raise errors.RbuildError(
-                "Project '%s' and version '%s' not found" % (product, version))
+        imageDefId = kwargs.pop('id', None)
 
+        availableImageDefs = None
+        if imageDefId is not None:
+            try:
+                availableImageDefs = [client.do_GET(uri + '/' + imageDefId)]
+            except (robj.errors.HTTPNotFoundError,
+                    robj.errors.HTTPBadRequestError):
+                pass
+        elif kwargs:
+            try:
+                availableImageDefs = client.do_GET(
+                    uri + self._getFilterBy(kwargs))
+            except (robj.errors.HTTPNotFoundError,
+                    robj.errors.HTTPBadRequestError):
+                pass
+
+        if availableImageDefs is None:
+            try:
+                availableImageDefs = client.do_GET(uri)
+            except robj.errors.HTTPNotFoundError:
+                raise errors.RbuildError(
+                    "Project '%s' and version '%s' not found" %
+                    (product, version))
+
+        # the server may have ignored some filters, so always check them
         imageDefs = []
-        if availableImageDefs:
-            for imageDef in availableImageDefs:
-                add = True
-                for key, value in kwargs.items():
-                    if key == 'id':
-                        add = (value == imageDef.id.rsplit('/')[-1])
-                    else:
-                        add = (getattr(imageDef, key) == value)
-                if add:
-                    imageDefs.append(imageDef)
+        for imageDef in availableImageDefs or []:
+            if (imageDefId is not None
+                    and imageDef.id.rsplit('/', 1)[-1] != imageDefId):
+                continue
+            if all(getattr(imageDef, key) == value
+                    for key, value in kwargs.items()):
+                imageDefs.append(imageDef)
         return imageDefs
 
+    def _getCatalogSummaries(self, kind, resource, refresh=False):
+        # name, description and URI of each resource in a catalog; only
+        # these are kept on disk, the resources are always fetched live
+        def fetch():
+            summaries = []
+            for item in self._getResources(resource):
+                description = getattr(item, 'description', None)
+                if description is not None:
+                    description = unicode(description)
+                summaries.append(dict(id=str(item.id), name=str(item.name),
+                                      description=description))
+            return summaries
+        return self._getCachedData(kind, resource, fetch, refresh=refresh)
+
+    def _getCatalogIds(self, kind, resource, refresh=False):
+        index = {}
+        for summary in self._getCatalogSummaries(kind, resource, refresh):
+            index.setdefault(summary['name'], summary['id'])
+        return index
+
+    def _getCatalogResource(self, getIds, key):
+        '''
+        Fetch the single catalog resource whose URI C{getIds} maps C{key}
+        to.  The cached index is rebuilt once if C{key} is missing from it
+        or its URI is stale.
+
+        @param getIds: callable returning the index, given C{refresh}
+        @param key: key of the resource in the index
+        @return: rObj resource, or None if there is no such resource
+        '''
+        for refresh in (False, True):
+            resourceIds = getIds(refresh=refresh)
+            if key in resourceIds:
+                try:
+                    return self.api._client.do_GET(resourceIds[key])
+                except robj.errors.HTTPNotFoundError:
+                    pass
+        return None
+
     def getImageTypes(self, *args, **kwargs):
         return self._getResources("image_types", **kwargs)
 
-    def getImageTypeDef(self, product, version, imageType, arch):
-        client = self.api._client
-        uri = ('/products/%s/versions/%s/imageTypeDefinitions' %
-               (product, version))
+    def listImageTypes(self):
+        return [_CatalogEntry(x) for x in
+                self._getCatalogSummaries('image_types', 'image_types')]
+
+    def getImageType(self, name):
+        if self.responseCache is None:
+            for imageType in self.getImageTypes():
+                if imageType.name == name:
+                    return imageType
+            return None
+        return self._getCatalogResource(
+            lambda refresh: self._getCatalogIds('image_types', 'image_types',
+                                                refresh), name)
+
+    def _getImageTypeDefsUri(self, product, version):
+        return ('/products/%s/versions/%s/imageTypeDefinitions' %
+                (product, version))
+
+    def _getImageTypeDefs(self, product, version):
+        uri = self._getImageTypeDefsUri(product, version)
         try:
-            for imageTypeDef in client.do_GET(uri):
-                if (imageTypeDef.container.name == imageType
-                        and imageTypeDef.architecture.name == arch):
-                    return imageTypeDef
+            return self.api._client.do_GET(uri)
         except robj.errors.HTTPNotFoundError:
             raise errors.RbuildError(
                 "Project '%s' and version '%s' not found" % (product, version))
 
+    def _getImageTypeDefIds(self, product, version, refresh=False):
+        # (container, architecture) -> definition URI
+        def fetch():
+            index = {}
+            for imageTypeDef in self._getImageTypeDefs(product, version):
+                key = (str(imageTypeDef.container.name),
+                       str(imageTypeDef.architecture.name))
+                index.setdefault(key, str(imageTypeDef.id))
+            return index
+        return self._getCachedData('image_type_defs',
+            self._getImageTypeDefsUri(product, version), fetch,
+            refresh=refresh)
+
+    def getImageTypeDef(self, product, version, imageType, arch):
+        if self.responseCache is not None:
+            imageTypeDef = self._getCatalogResource(
+                lambda refresh: self._getImageTypeDefIds(product, version,
+                                                         refresh),
+                (imageType, arch))
+        else:
+            index = self._imageTypeDefIndex.get((product, version))
+            if index is None:
+                index = {}
+                for imageTypeDef in self._getImageTypeDefs(product, version):
+                    key = (str(imageTypeDef.container.name),
+                           str(imageTypeDef.architecture.name))
+                    # keep the first match, as the linear search did
+                    index.setdefault(key, imageTypeDef)
+                self._imageTypeDefIndex[(product, version)] = index
+            imageTypeDef = index.get((imageType, arch))
+
+        if imageTypeDef is not None:
+            return imageTypeDef
         raise errors.RbuildError("No image type definition with name '%s'"
                                  " and architecture '%s'" % (imageType, arch))
 
@@ -600,6 +1025,21 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
     def getTargetTypes(self, **kwargs):
         return self._getResources("target_types", **kwargs)
 
+    def listTargetTypes(self):
+        return [_CatalogEntry(x) for x in
+                self._getCatalogSummaries('target_types', 'target_types')]
+
+    def getTargetType(self, name):
+        if self.responseCache is None:
+            for targetType in self.getTargetTypes():
+                if targetType.name == name:
+                    return targetType
+            return None
+        return self._getCatalogResource(
+            lambda refresh: self._getCatalogIds('target_types',
+                                                'target_types', refresh),
+            name)
+
     def getTargets(self, **kwargs):
         '''
         Get all configured targets
@@ -682,6 +1122,20 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             raise errors.RbuildError("A project with conflicting "
                     "parameters already exists")
 
+    def getResource(self, uri):
+        '''
+        Fetch a resource by its URI, such as the C{id} of a link
+
+        @param uri: absolute URI of the resource
+        @type uri: str
+        @return: the resource
+        @rtype: rObj
+        '''
+        try:
+            return self.api._client.do_GET(uri)
+        except robj.errors.HTTPNotFoundError:
+            raise errors.RbuildError("Resource '%s' not found" % (uri,))
+
     def getProject(self, shortName):
         # FIXME: robj allows neither URL construction nor searching/filtering,
         # so the only "kosher" way to find a project is to iterate over all of
@@ -717,9 +1171,50 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             raise errors.RbuildError("Branch named '%s' already exists" % name)
         return br.label
 
+    def getPlatforms(self):
+        return self.api.platforms
+
+    def _getPlatformIds(self, refresh=False):
+        # label -> platform URI; only the URIs are kept on disk, the
+        # platforms themselves are always fetched live
+        def fetch():
+            index = {}
+            for platform in self.getPlatforms():
+                index.setdefault(str(platform.label), str(platform.id))
+            return index
+        return self._getCachedData('platforms', 'platforms', fetch,
+                                   refresh=refresh)
+
+    def getPlatform(self, label):
+        if self._platformIndex is None:
+            self._platformIndex = {}
+            if self.responseCache is None:
+                for platform in self.getPlatforms():
+                    self._platformIndex.setdefault(str(platform.label),
+                                                   platform)
+        if label in self._platformIndex:
+            return self._platformIndex[label]
+        if self.responseCache is None:
+            return None
+
+        platformIds = self._getPlatformIds()
+        platform = None
+        if label in platformIds:
+            try:
+                platform = self.api._client.do_GET(platformIds[label])
+            except robj.errors.HTTPNotFoundError:
+                pass
+        if platform is None:
+            # the cached index may be out of date
+            platformIds = self._getPlatformIds(refresh=True)
+            if label in platformIds:
+                platform = self.api._client.do_GET(platformIds[label])
+        self._platformIndex[label] = platform
+        return platform
+
     def listPlatforms(self):
         ret = []
-        for platform in self.api.platforms:
+        for platform in self.getPlatforms():
             if platform.enabled.lower() == 'false':
                 continue
             if platform.hidden.lower() == 'true':
@@ -744,6 +1239,19 @@ class RbuilderFacade(object):
         @param handle: The handle with which this instance is associated.
         """
         self._handle = handle
+        self._restClient = None
+        self._restClientKey = None
+        self._useCache = True
+        self._pageSize = None
+
+    def close(self):
+        """
+        Close the REST session shared by this facade, if one is open.
+        """
+        if self._restClient is not None:
+            self._restClient.close()
+        self._restClient = None
+        self._restClientKey = None
 
     def _getRbuilderClient(self, clientcls=None):
         if clientcls is None:
@@ -756,7 +1264,51 @@ class RbuilderFacade(object):
         return self._getRbuilderClient(RbuilderRPCClient)
 
     def _getRbuilderRESTClient(self):
-        return self._getRbuilderClient(RbuilderRESTClient)
+        # the REST client is a session: it keeps the negotiated API root
+        # and its pooled connections, so share one per server and user
+        cfg = self._handle.getConfig()
+        key = (cfg.serverUrl, cfg.user)
+        if self._restClient is None or self._restClientKey != key:
+            self.close()
+            self._restClient = self._getRbuilderClient(RbuilderRESTClient)
+            self._restClient.responseCache = self._getResponseCache()
+            self._restClient.pageSize = self._pageSize
+            self._restClientKey = key
+        return self._restClient
+
+    def _getResponseCache(self):
+        if not self._useCache:
+            return None
+        productStore = getattr(self._handle, 'productStore', None)
+        if productStore is None:
+            return None
+        return productStore.getCache()
+
+    def setUseCache(self, useCache):
+        """
+        Choose whether slow-changing rBuilder data (the platform index,
+        the image and target type catalogs, image type definitions and
+        their descriptors) may be served from the product checkout's
+        on-disk cache.
+        @param useCache: False to always fetch catalogs from the rBuilder
+        @type useCache: bool
+        """
+        self._useCache = useCache
+        if self._restClient is not None:
+            self._restClient.responseCache = self._getResponseCache()
+
+    def setPageSize(self, pageSize):
+        """
+        Fetch REST collections lazily, C{pageSize} resources per request,
+        until this is called again with C{None}.  Collections fetched
+        meanwhile keep paging after that.
+        @param pageSize: resources per request, or C{None} to fetch whole
+        collections at once
+        @type pageSize: int
+        """
+        self._pageSize = pageSize
+        if self._restClient is not None:
+            self._restClient.pageSize = pageSize
 
     def _getBaseServerUrl(self):
         """
@@ -861,19 +1413,27 @@ class RbuilderFacade(object):
         return client.getImageTypeDef(product, version, imageType, arch)
 
     def getPlatform(self, label):
-        client = self._getRbuilderRESTClient()
-        for platform in client.api.platforms:
-            if platform.label == label:
-                return platform
+        return self._getRbuilderRESTClient().getPlatform(label)
 
     def getPlatforms(self):
-        return self._getRbuilderRESTClient().api.platforms
+        return self._getRbuilderRESTClient().getPlatforms()
 
     def getProductLabelFromNameAndVersion(self, productName, versionName):
         client = self._getRbuilderRPCClient()
         return client.getProductLabelFromNameAndVersion(productName,
                                                         versionName)
 
+    def getResource(self, uri):
+        '''
+        Fetch a REST resource by its URI, such as the C{id} of a link
+
+        @param uri: absolute URI of the resource
+        @type uri: str
+        @return: the resource
+        @rtype: rObj
+        '''
+        return self._getRbuilderRESTClient().getResource(uri)
+
     def getProjects(self, **kwargs):
         '''
             Get a list projects. The projects returned can be filtered by
@@ -919,7 +1479,7 @@ class RbuilderFacade(object):
             return project.project_branches
 
     def watchImages(self, buildIds, timeout=0, interval = 5, quiet = False):
-        client = self._getRbuilderRPCClient()
+        client = self._getRbuilderRESTClient()
         return client.watchImages(buildIds, timeout=timeout, interval=interval,
                 quiet=quiet)
 
@@ -1093,6 +1653,26 @@ class RbuilderFacade(object):
         client = self._getRbuilderRESTClient()
         return client.getImageTypes(*args, **kwargs)
 
+    def listImageTypes(self):
+        '''
+        Summarize the available image types, from the cache if possible
+
+        @return: image types, with C{id}, C{name} and C{description}
+        @rtype: list
+        '''
+        return self._getRbuilderRESTClient().listImageTypes()
+
+    def getImageType(self, name):
+        '''
+        Get an image type by name
+
+        @param name: name of the image type
+        @type name: str
+        @return: image type or None
+        @rtype: rObj(image_type)
+        '''
+        return self._getRbuilderRESTClient().getImageType(name)
+
     def getTarget(self, name):
         '''
         Get a target object by name
@@ -1118,6 +1698,26 @@ class RbuilderFacade(object):
     def getTargetTypes(self):
         return self._getRbuilderRESTClient().getTargetTypes()
 
+    def listTargetTypes(self):
+        '''
+        Summarize the available target types, from the cache if possible
+
+        @return: target types, with C{id}, C{name} and C{description}
+        @rtype: list
+        '''
+        return self._getRbuilderRESTClient().listTargetTypes()
+
+    def getTargetType(self, name):
+        '''
+        Get a target type by name
+
+        @param name: name of the target type
+        @type name: str
+        @return: target type or None
+        @rtype: rObj(target_type)
+        '''
+        return self._getRbuilderRESTClient().getTargetType(name)
+
     def getUsers(self, **kwargs):
         return self._getRbuilderRESTClient().getUsers(**kwargs)
 
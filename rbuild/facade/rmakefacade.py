@@ -24,14 +24,13 @@ via C{handle.facade.rmake} which is automatically available to
 all plugins through the C{handle} object.
 """
 
+import copy
 import itertools
 import os
 
 from rmake.build import buildcfg
-from rmake.cmdline import helper
-from rmake.cmdline import query
-from rmake import plugins
 from rbuild import errors
+from rbuild.lib import util
 from conary import trovetup
 
 class RmakeFacade(object):
@@ -43,15 +42,41 @@ class RmakeFacade(object):
     of such objecst are not included in the stable rBuild API.
     """
 
+    #: most group search path lookups run at once
+    searchPathLookupJobs = 8
+
     def __init__(self, handle):
         """
         @param handle: The handle with which this instance is associated.
         """
         self._handle = handle
+        self._plugins = None
+        self.clearCachedConfig()
+
+    def clearCachedConfig(self):
+        """
+        Purges the cached rMake config objects, so that they are rebuilt
+        when next used.  This happens automatically when the product
+        definition is reloaded or the active stage changes.
+        """
+        self._rmakeConfigKey = None
+        self._sharedRmakeConfig = None
         self._rmakeConfig = None
         self._rmakeConfigWithContexts = None
         self._rmakeConfigWithGroupContexts = None
-        self._plugins = None
+        # group search path troves found for each install label path,
+        # flavor and resolveTroves
+        self._searchPathTroves = {}
+
+    def _checkCachedConfig(self):
+        # cached configs are built from the product definition and stage
+        # that were current at the time
+        product = self._handle.product
+        stageName = self._handle.productStore.getActiveStageName()
+        key = self._rmakeConfigKey
+        if key is None or key[0] is not product or key[1] != stageName:
+            self.clearCachedConfig()
+            self._rmakeConfigKey = (product, stageName)
 
     def _getBaseRmakeConfig(self, readConfigFiles=True):
         """
@@ -81,16 +106,37 @@ class RmakeFacade(object):
         @return: rMake configuration file suitable for use with the current
         product.
         """
-        if not includeContext:
+        if not includeContext or not useCache:
             # context-free config must not be cached
-            useCache = False
+            return self._buildRmakeConfig(includeContext=includeContext)
 
-        if self._rmakeConfig and useCache:
-            return self._rmakeConfig
+        self._checkCachedConfig()
+        if self._rmakeConfig is None:
+            self._rmakeConfig = self._copySharedRmakeConfig()
+        return self._rmakeConfig
 
+    def _copySharedRmakeConfig(self):
+        """
+        Returns a copy of the rmake configuration for the current product,
+        which is built only once for the configs derived from it.  Callers
+        may modify the copy.
+        """
+        if self._sharedRmakeConfig is None:
+            self._sharedRmakeConfig = self._buildRmakeConfig()
+        return copy.deepcopy(self._sharedRmakeConfig)
+
+    def _buildRmakeConfig(self, includeContext=True):
+        """
+        Builds a new rmake configuration file for the current product.
+        @param includeContext: include context-specific information
+        (default: True)
+        @type includeContext: bool
+        """
         conaryFacade = self._handle.facade.conary
         rbuildConfig = self._handle.getConfig()
         if not self._plugins:
+            # the rMake client modules are only needed once rMake is used
+            from rmake import plugins
             p = plugins.PluginManager(rbuildConfig.rmakePluginDirs,
                                       ['test'])
             p.loadPlugins()
@@ -176,9 +222,6 @@ class RmakeFacade(object):
             if os.path.exists(rmakeConfigPath):
                 cfg.includeConfigFile(rmakeConfigPath)
 
-        if useCache:
-            self._rmakeConfig = cfg
-
         return cfg
 
     def _getRmakeConfigWithContexts(self, hasGroups=False):
@@ -197,12 +240,13 @@ class RmakeFacade(object):
         the flavors in the current product's build definitions.
         """
 
+        self._checkCachedConfig()
         if hasGroups and self._rmakeConfigWithGroupContexts:
             return self._rmakeConfigWithGroupContexts
         elif not hasGroups and self._rmakeConfigWithContexts:
             return self._rmakeConfigWithContexts
 
-        cfg = self._getRmakeConfig(useCache=False)
+        cfg = self._copySharedRmakeConfig()
         conaryFacade = self._handle.facade.conary
         buildFlavors = [x[1] 
                         for x in self._handle.productStore.getGroupFlavors() ]
@@ -238,6 +282,7 @@ class RmakeFacade(object):
         product, and a dictionary of {flavor : contextName} lists that match the
         flavors in the current product's build definitions.
         """
+        from rmake.cmdline import helper
         cfg, contextDict = self._getRmakeConfigWithContexts()
         client = helper.rMakeHelper(buildConfig=cfg, plugins=self._plugins)
         return client, contextDict
@@ -251,11 +296,12 @@ class RmakeFacade(object):
         @return: an rMakeHelper object suitable for use with the current
         product (without any contexts for use in starting a build)
         """
+        from rmake.cmdline import helper
         cfg = self._getRmakeConfig()
         return helper.rMakeHelper(buildConfig=cfg)
 
     def createBuildJobForStage(self, itemList, recurse=True, rebuild=True,
-      useLocal=False, progress=True):
+      useLocal=False, progress=True, recipeAttributes=None):
         """
         @param itemList: list of troveSpec style items to build or
             paths to recipes.  May include version (after =) flavor
@@ -269,6 +315,10 @@ class RmakeFacade(object):
             will be inserted into resolveTroves
         @param progress: if C{True} (the default), print a progress
             indication at the start of the operation
+        @param recipeAttributes: class attributes, including C{name}, of
+            the recipes in C{itemList} that the caller already loaded,
+            by recipe path
+        @type  recipeAttributes: dict of str to dict
         @return: The new build job object
         """
         rmakeClient = self._getRmakeHelperWithContexts()[0]
@@ -283,8 +333,18 @@ class RmakeFacade(object):
             recurse = rmakeClient.BUILD_RECURSE_GROUPS_SOURCE
 
         # When building groups, use the same flavor and buildFlavor (RBLD-350).
-        hasGroups = bool([ x for x in itemList
-            if os.path.basename(x).startswith('group-') ])
+        recipeAttributes = recipeAttributes or {}
+        hasGroups = False
+        for item in itemList:
+            attributes = recipeAttributes.get(
+                item.split('{', 1)[0].split('[', 1)[0])
+            if attributes:
+                name = attributes['name']
+            else:
+                name = os.path.basename(item)
+            if name.startswith('group-'):
+                hasGroups = True
+                break
         cfg = self._getRmakeConfigWithContexts(hasGroups=hasGroups)[0]
 
         if useLocal:
@@ -307,30 +367,10 @@ class RmakeFacade(object):
         # Iterate over each config that belongs to at least one trove
         # (generally one per context)
         troveConfigs = dict((id(x.cfg), x.cfg) for x in job.iterTroves())
+        groupSearchPaths = self._findGroupSearchPaths(searchPathTups,
+                                                      troveConfigs.values())
         for troveCfg in troveConfigs.itervalues():
-            # Figure out which troves we need to look up by filtering
-            # out the ones rMake already looked up for us.
-            alreadyFoundMap = dict((troveSpec, troveTup)
-                    for (troveSpec, troveTup) in itertools.izip(
-                        itertools.chain(*troveCfg.resolveTroves),
-                        itertools.chain(*troveCfg.resolveTroveTups)))
-            toFind = [x for x in searchPathTups if x not in alreadyFoundMap]
-
-            # Look up the remaining ones using the config's flavor.
-            results = handle.facade.conary._findTroves(toFind,
-                    troveCfg.installLabelPath, troveCfg.flavor,
-                    allowMissing=True)
-
-            groupSearchPath = []
-            for troveSpec in searchPathTups:
-                if troveSpec in alreadyFoundMap:
-                    troveTup = alreadyFoundMap[troveSpec]
-                elif troveSpec in results:
-                    troveTup = max(results[troveSpec])
-                else:
-                    raise errors.MissingGroupSearchPathElementError(*troveSpec)
-                groupSearchPath.append('%s=%s' % troveTup[:2])
-
+            groupSearchPath = groupSearchPaths[id(troveCfg)]
             troveCfg.macros['productDefinitionSearchPath'] = '\n'.join(
                     groupSearchPath)
             proddefVersion = handle.product.getLoadedTrove()
@@ -347,6 +387,86 @@ class RmakeFacade(object):
 
         return job
 
+    def _findGroupSearchPaths(self, searchPathTups, troveConfigs):
+        """
+        Find the troves of the product's group search path for each of
+        C{troveConfigs}: first in the lookups rMake did for its
+        resolveTroveTups, then with C{findTroves}.  Configs that share an
+        install label path, flavor and resolveTroves share one lookup, and
+        its results are kept until the product definition or stage
+        changes.  Lookups for different configs run concurrently, in
+        worker threads sharing the conary facade's repository client.
+        @param searchPathTups: trove specs of the group search path
+        @param troveConfigs: build configurations of a job
+        @return: search path strings, by C{id} of each config
+        @rtype: dict
+        """
+        self._checkCachedConfig()
+        alreadyFoundMaps = {}
+        lookupKeys = {}
+        lookups = {}
+        for troveCfg in troveConfigs:
+            # Figure out which troves we need to look up by filtering
+            # out the ones rMake already looked up for us.
+            alreadyFoundMap = dict((troveSpec, troveTup)
+                    for (troveSpec, troveTup) in itertools.izip(
+                        itertools.chain(*troveCfg.resolveTroves),
+                        itertools.chain(*troveCfg.resolveTroveTups)))
+            alreadyFoundMaps[id(troveCfg)] = alreadyFoundMap
+            toFind = [x for x in searchPathTups if x not in alreadyFoundMap]
+            if not toFind:
+                continue
+            key = self._getSearchPathLookupKey(troveCfg)
+            lookupKeys[id(troveCfg)] = key
+            found = self._searchPathTroves.setdefault(key, {})
+            lookup = lookups.setdefault(key, (troveCfg, set()))
+            lookup[1].update(x for x in toFind if x not in found)
+
+        # Look up the remaining ones using each config's flavor.
+        conary = self._handle.facade.conary
+        lookups = [(key, troveCfg, sorted(toFind))
+                   for key, (troveCfg, toFind) in lookups.iteritems()
+                   if toFind]
+        def findTroves(lookup):
+            _, troveCfg, toFind = lookup
+            return conary._findTroves(toFind, troveCfg.installLabelPath,
+                    troveCfg.flavor, allowMissing=True)
+        if len(lookups) > 1:
+            # create the shared client before the workers need it
+            conary._getRepositoryClient()
+        allResults = util.threadedMap(findTroves, lookups,
+                                      self.searchPathLookupJobs)
+        for (key, _, _), results in itertools.izip(lookups, allResults):
+            self._searchPathTroves[key].update(
+                (x, max(y)) for (x, y) in results.iteritems() if y)
+
+        groupSearchPaths = {}
+        for troveCfg in troveConfigs:
+            alreadyFoundMap = alreadyFoundMaps[id(troveCfg)]
+            found = self._searchPathTroves.get(lookupKeys.get(id(troveCfg)),
+                                               {})
+            groupSearchPath = []
+            for troveSpec in searchPathTups:
+                if troveSpec in alreadyFoundMap:
+                    troveTup = alreadyFoundMap[troveSpec]
+                elif troveSpec in found:
+                    troveTup = found[troveSpec]
+                else:
+                    raise errors.MissingGroupSearchPathElementError(*troveSpec)
+                groupSearchPath.append('%s=%s' % troveTup[:2])
+            groupSearchPaths[id(troveCfg)] = groupSearchPath
+        return groupSearchPaths
+
+    @staticmethod
+    def _getSearchPathLookupKey(troveCfg):
+        # every context setting that decides what is still to be found
+        # and where
+        flavor = troveCfg.flavor
+        if isinstance(flavor, list):
+            flavor = tuple(flavor)
+        return (tuple(troveCfg.installLabelPath), flavor,
+                tuple(tuple(x) for x in troveCfg.resolveTroves))
+
     def createImagesJobForStage(self, nameFilter = None):
         #pylint: disable-msg=R0914
         # fewer local variables would make this hard; it's pretty simple
@@ -428,6 +548,7 @@ class RmakeFacade(object):
                             exitOnFinish=True)
 
     def displayJob(self, jobId, troveList=None, showLogs=False):
+        from rmake.cmdline import query
         client = self._getRmakeHelper()
         query.displayJobInfo(client, jobId, troveList, showLogs=showLogs,
                              displayTroves=True)
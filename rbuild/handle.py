@@ -25,9 +25,6 @@ that implement rBuild functionality, and by which plugins communicate
 with each other.
 """
 
-import rbuild.facade.conaryfacade
-import rbuild.facade.rmakefacade
-import rbuild.facade.rbuilderfacade
 from rbuild import errors
 from rbuild import rbuildcfg
 from rbuild import ui
@@ -44,13 +41,33 @@ class _PluginProxy(dict):
     Note that while this is currently a superclass to RbuildHandle, it
     could become an attribute of it instead, changing the calling
     convention from handle.Plugin.foo to handle.plugins.Plugin.foo.
+
+    Entries may also be registered as factories with C{addFactory}, in
+    which case they are only created when first accessed as attributes.
     """
 
+    def __init__(self, *args, **kwargs):
+        super(_PluginProxy, self).__init__(*args, **kwargs)
+        self._factories = {}
+
+    def addFactory(self, name, factory):
+        """
+        Register a callable that creates the entry C{name} when it is first
+        accessed.
+        @param name: entry name
+        @param factory: callable taking no arguments
+        """
+        self.pop(name, None)
+        self._factories[name] = factory
+
     def __getattr__(self, attr):
         if attr.startswith('_'):
             raise AttributeError
         elif attr in self:
             return self[attr]
+        elif attr in self._factories:
+            self[attr] = self._factories.pop(attr)()
+            return self[attr]
         else:
             raise errors.MissingPluginError(attr)
 
@@ -87,6 +104,7 @@ class RbuildHandle(_PluginProxy):
         super(RbuildHandle, self).__init__()
 
         self.product = None
+        self._hooksInstalled = 0
         if cfg is None:
             cfg = self.configClass(readConfigFiles=True)
 
@@ -109,7 +127,10 @@ class RbuildHandle(_PluginProxy):
             plugin.setHandle(self)
 
         # Provide access to facades
-        self.facade = _PluginProxy(self._getFacades())
+        facades = self._getFacades()
+        if not isinstance(facades, _PluginProxy):
+            facades = _PluginProxy(facades)
+        self.facade = facades
 
         # Provide the command manager as if it were a plugin
         self['Commands'] = CommandManager()
@@ -135,7 +156,8 @@ class RbuildHandle(_PluginProxy):
         self.productStore = productStore
 
         if productStore:
-            self.product = productStore.getProduct()
+            # the product definition is only read once it is used
+            self._productLoader = productStore.getProduct
 
             if hasattr(productStore, 'getRbuildConfigPath'):
                 rBuildConfigPath = productStore.getRbuildConfigPath()
@@ -145,17 +167,59 @@ class RbuildHandle(_PluginProxy):
                 RbuildConfigData = productStore.getRbuildConfigData()
                 if RbuildConfigData is not None:
                     self._cfg.readObject('INTERNAL', RbuildConfigData)
-            self.facade.conary.clearCachedConfig()
+            if 'conary' in self.facade:
+                # only a facade that already exists can have cached the
+                # configuration that was just changed
+                self.facade.conary.clearCachedConfig()
+
+    def __getattr__(self, attr):
+        if not attr.startswith('_') and attr not in self:
+            # plugins not needed by the command line are loaded when used
+            self._loadPluginOnDemand(className=attr)
+        return _PluginProxy.__getattr__(self, attr)
+
+    def _loadPluginOnDemand(self, **kwargs):
+        loadPluginOnDemand = getattr(
+            getattr(self, '_pluginManager', None), 'loadPluginOnDemand', None)
+        if loadPluginOnDemand is not None:
+            loadPluginOnDemand(self, **kwargs)
+
+    def _getProduct(self):
+        if self._productLoader is not None:
+            loader, self._productLoader = self._productLoader, None
+            self._product = loader()
+        return self._product
+
+    def _setProduct(self, product):
+        self._productLoader = None
+        self._product = product
+
+    product = property(_getProduct, _setProduct)
 
     def _getFacades(self):
         '''
         Override this method to provide your own versions of these facades.
+        Either a dictionary of facades or a C{_PluginProxy} may be
+        returned; the default proxy creates each facade, importing its
+        module, on first use.
         '''
-        return {
-            'conary': rbuild.facade.conaryfacade.ConaryFacade(self),
-            'rmake': rbuild.facade.rmakefacade.RmakeFacade(self),
-            'rbuilder': rbuild.facade.rbuilderfacade.RbuilderFacade(self),
-        }
+        def conary():
+            from rbuild.facade import conaryfacade
+            return conaryfacade.ConaryFacade(self)
+
+        def rmake():
+            from rbuild.facade import rmakefacade
+            return rmakefacade.RmakeFacade(self)
+
+        def rbuilder():
+            from rbuild.facade import rbuilderfacade
+            return rbuilderfacade.RbuilderFacade(self)
+
+        facades = _PluginProxy()
+        facades.addFactory('conary', conary)
+        facades.addFactory('rmake', rmake)
+        facades.addFactory('rbuilder', rbuilder)
+        return facades
 
     def __repr__(self):
         if self.product:
@@ -170,9 +234,35 @@ class RbuildHandle(_PluginProxy):
         """
         return self._cfg
 
+    def getPluginManager(self):
+        """
+        @return: PluginManager object holding the plugins of this handle.
+        """
+        return self._pluginManager
+
     def getPlugin(self, name):
+        self._loadPluginOnDemand(name=name)
         return self._pluginManager.getPlugin(name)
 
+    def popHooksInstalled(self):
+        """
+        @return: number of hooks installed since the last call, used to
+        find plugins that must always be loaded
+        """
+        count, self._hooksInstalled = self._hooksInstalled, 0
+        return count
+
+    def close(self):
+        """
+        Release network sessions held by the facades.  The handle remains
+        usable; sessions are reopened on demand.  Facades that were never
+        used are not created.
+        """
+        for facadeObj in self.facade.values():
+            close = getattr(facadeObj, 'close', None)
+            if close is not None:
+                close()
+
     def installPrehook(self, apiMethod, hookFunction):
         """
         Installs a hook that will be called before the given apiMethod
@@ -200,6 +290,7 @@ class RbuildHandle(_PluginProxy):
         # we need to do this here.
         #pylint: disable-msg=W0212
         plugin._installPrehook(methodName, hookFunction)
+        self._hooksInstalled += 1
 
     def installPosthook(self, apiMethod, hookFunction):
         """
@@ -225,6 +316,7 @@ class RbuildHandle(_PluginProxy):
         # we need to do this here.
         #pylint: disable-msg=W0212
         plugin._installPosthook(methodName, hookFunction)
+        self._hooksInstalled += 1
 
 class CommandManager(object):
     """
@@ -233,6 +325,7 @@ class CommandManager(object):
     """
     def __init__(self):
         self._commands = {}
+        self._used = set()
 
     def registerCommand(self, commandClass):
         """
@@ -248,6 +341,7 @@ class CommandManager(object):
             @param name: command name as specified on the command line
             @return: commandClass that matches the given command line command.
         """
+        self._used.add(name)
         return self._commands[name]
 
     def getAllCommandClasses(self):
@@ -255,3 +349,18 @@ class CommandManager(object):
             @return: all registered command classes
         """
         return set(self._commands.values())
+
+    def getAllCommandNames(self):
+        """
+            @return: names of all registered commands
+        """
+        return self._commands.keys()
+
+    def popUsedCommands(self):
+        """
+            @return: names of the commands looked up with C{getCommandClass}
+            since the last call, used to record which plugins extend which
+            commands
+        """
+        used, self._used = self._used, set()
+        return used
@@ -0,0 +1,534 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Built in "daemon" command, and the client that forwards commands to it
+
+C{rbuild daemon} listens on a UNIX socket and runs the command lines
+forwarded to it one at a time, in its own process: rBuild, its plugins
+and their libraries are already imported and, for each checkout, the
+daemon keeps an initialized handle with the configuration read, plugins
+loaded, the Conary configuration built and its network sessions open.
+The handle is rebuilt when an rbuildrc or the product definition
+changes.
+
+When the socket exists, the C{rbuild} front end forwards its command
+line, working directory and environment, streams back the output and
+returns the exit code.  The daemon declines, and the front end runs the
+command itself, when it is busy with another command, when the command
+line changes the configuration, or when the command may prompt: commands
+run by the daemon read standard input from C{/dev/null}.  Commands that
+never prompt say so by setting C{promptsUser = False}.
+"""
+
+import errno
+import json
+import os
+import select
+import socket
+import struct
+import Queue
+import sys
+import threading
+import traceback
+
+from conary.lib import mainhandler
+
+from rbuild import errors
+from rbuild import handle
+from rbuild.internal import pluginloader
+from rbuild.pluginapi.command import BaseCommand, NO_PARAM, ONE_PARAM
+from rbuild.productstore import dirstore
+
+#: environment variable overriding the socket path
+SOCKET_ENV = 'RBUILD_DAEMON_SOCKET'
+
+# frames are a one character kind followed by the length of the data
+_HEADER = struct.Struct('!cI')
+(_RUN, _STOP, _STDOUT, _STDERR, _EXIT, _DECLINE) = (
+    'r', 's', 'o', 'e', 'x', 'n')
+
+# pre-command options that change the configuration a command runs with
+_CONFIG_OPTIONS = ('--config', '--config-file', '--skip-default-config')
+
+
+class DaemonCommand(BaseCommand):
+    """
+    Runs rbuild commands forwarded by the rbuild front end, keeping
+    plugins and configuration loaded between them.  Stop it with
+    C{rbuild daemon --stop}.
+    """
+    commands = ['daemon']
+    help = 'Run commands in a persistent background process'
+    docs = {
+        'socket': 'Path of the daemon socket (default ~/.rbuild/daemon.sock)',
+        'stop': 'Stop the running daemon',
+        }
+
+    # configuration setup is not required to run the daemon
+    requireConfig = False
+
+    def addLocalParameters(self, argDef):
+        argDef['socket'] = ONE_PARAM
+        argDef['stop'] = NO_PARAM
+
+    def runCommand(self, handle, argSet, args):
+        #pylint: disable-msg=C0999
+        # interface implementation does not require argument documentation
+        self.requireParameters(args)
+        socketPath = argSet.pop('socket', None) or getSocketPath()
+        if not socketPath:
+            raise errors.PluginError('The HOME environment variable must be'
+                                     ' set, or use --socket')
+        if argSet.pop('stop', False):
+            if not stop(socketPath):
+                handle.ui.warning('No rbuild daemon is running on %s',
+                                  socketPath)
+            return 0
+        handle.ui.info('Listening on %s', socketPath)
+        RbuildDaemon(socketPath).serve()
+        return 0
+
+
+def getSocketPath():
+    """
+    @return: path of the daemon socket, or C{None} if it cannot be found
+    @rtype: str
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if not path and 'HOME' in os.environ:
+        path = os.environ['HOME'] + '/.rbuild/daemon.sock'
+    return path
+
+
+def _sendFrame(sock, kind, data=''):
+    sock.sendall(_HEADER.pack(kind, len(data)) + data)
+
+
+def _recvExactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def _recvFrame(sock):
+    kind, size = _HEADER.unpack(_recvExactly(sock, _HEADER.size))
+    return kind, _recvExactly(sock, size)
+
+
+def _connect(socketPath):
+    if not socketPath or not os.path.exists(socketPath):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socketPath)
+    except socket.error:
+        # most likely left behind by a daemon that did not exit cleanly
+        sock.close()
+        return None
+    return sock
+
+
+def forward(argv, socketPath=None, outStream=None, errorStream=None):
+    """
+    Run a command line through the daemon, if one is running.
+
+    @param argv: command line, including the program name
+    @param socketPath: daemon socket (default from L{getSocketPath})
+    @return: exit code of the command, or C{None} if no daemon is running
+    or it declined to run the command
+    @rtype: int
+    """
+    if argv[1:2] == ['daemon']:
+        return None
+    sock = _connect(socketPath or getSocketPath())
+    if sock is None:
+        return None
+    if outStream is None:
+        outStream = sys.stdout
+    if errorStream is None:
+        errorStream = sys.stderr
+    try:
+        _sendFrame(sock, _RUN, json.dumps(dict(
+            argv=list(argv), cwd=os.getcwd(), env=dict(os.environ))))
+        while True:
+            kind, data = _recvFrame(sock)
+            if kind == _STDOUT:
+                outStream.write(data)
+                outStream.flush()
+            elif kind == _STDERR:
+                errorStream.write(data)
+                errorStream.flush()
+            elif kind == _EXIT:
+                return int(data)
+            elif kind == _DECLINE:
+                return None
+    except (EOFError, socket.error):
+        raise errors.RbuildError(
+            'The rbuild daemon exited before the command finished')
+    finally:
+        sock.close()
+
+
+def stop(socketPath):
+    """
+    Ask the daemon listening on C{socketPath} to exit.
+
+    @return: C{True} if a daemon was running
+    @rtype: bool
+    """
+    sock = _connect(socketPath)
+    if sock is None:
+        return False
+    try:
+        _sendFrame(sock, _STOP)
+        try:
+            _recvFrame(sock)
+        except EOFError:
+            pass
+    finally:
+        sock.close()
+    return True
+
+
+def _getConfigSignature(cwd, productDir):
+    # files whose changes invalidate a warm handle
+    paths = ['/etc/rbuildrc', cwd + '/rbuildrc']
+    if 'HOME' in os.environ:
+        paths.append(os.environ['HOME'] + '/.rbuildrc')
+    if productDir:
+        paths.extend([productDir + '/.rbuild/rbuildrc', productDir
+            + '/.rbuild/product-definition/product-definition.xml'])
+    signature = []
+    for path in paths:
+        try:
+            signature.append((path, os.stat(path).st_mtime))
+        except OSError:
+            signature.append((path, None))
+    return tuple(signature)
+
+
+def _createWarmHandle():
+    from rbuild.internal import main
+    cfg = main.RbuildMain.configClass(readConfigFiles=True)
+    plugins = pluginloader.getPlugins([], cfg.pluginDirs)
+    warmHandle = handle.RbuildHandle(cfg, plugins)
+    plugins.registerCommands(main.RbuildMain(), warmHandle)
+    plugins.registerFacade(warmHandle)
+    plugins.initialize()
+    if warmHandle.Config.isComplete(cfg):
+        warmHandle.facade.conary.getConaryConfig()
+    return warmHandle
+
+
+def _changesConfig(argv):
+    for arg in argv:
+        for option in _CONFIG_OPTIONS:
+            if arg == option or arg.startswith(option + '='):
+                return True
+    return False
+
+
+def _getCommandClass(warmHandle, argv):
+    for arg in argv[1:]:
+        if not arg.startswith('-'):
+            try:
+                return warmHandle.Commands.getCommandClass(arg)
+            except KeyError:
+                return None
+    return None
+
+
+def _mayPrompt(warmHandle, argv):
+    """
+    @return: C{True} if running C{argv} might ask the user for input
+    """
+    commandClass = _getCommandClass(warmHandle, argv)
+    if commandClass is None or getattr(commandClass, 'promptsUser', True):
+        return True
+    if not getattr(commandClass, 'requireConfig', True):
+        return False
+    # the main handler asks for missing configuration and passwords
+    cfg = warmHandle.getConfig()
+    if not warmHandle.Config.isComplete(cfg):
+        return True
+    return bool(cfg.user and cfg.user[0] and not cfg.user[1])
+
+
+def _getMainClass(warmHandle):
+    from rbuild.internal import main
+
+    class DaemonMain(main.RbuildMain):
+        """
+        Main handler that starts from the daemon's warm handle when the
+        command line does not change the configuration
+        """
+
+        # the handle and its sessions outlive the command
+        closeHandle = False
+
+        def getConfigFile(self, argv):
+            if warmHandle is not None and not _changesConfig(argv):
+                return warmHandle.getConfig()
+            return main.RbuildMain.getConfigFile(self, argv)
+
+        def getCommand(self, argv, cfg):
+            if warmHandle is None or cfg is not warmHandle.getConfig():
+                return main.RbuildMain.getCommand(self, argv, cfg)
+            self.handle = warmHandle
+            self.plugins = warmHandle.getPluginManager()
+            self.handle.ui.pushContext('rBuild %s: %s',
+                                       self.version, ' '.join(argv))
+            for commandClass in warmHandle.Commands.getAllCommandClasses():
+                self.registerCommand(commandClass)
+            return mainhandler.MainHandler.getCommand(self, argv, cfg)
+
+    return DaemonMain
+
+
+def _pumpOutput(conn, streams):
+    # copy output to the client until every stream is closed; keep
+    # draining if the client goes away so that the command never blocks
+    connected = True
+    while streams:
+        readable, _, _ = select.select(list(streams), [], [])
+        for fd in readable:
+            data = os.read(fd, 65536)
+            if not data:
+                os.close(fd)
+                del streams[fd]
+            elif connected:
+                try:
+                    _sendFrame(conn, streams[fd], data)
+                except socket.error:
+                    connected = False
+
+
+def _resetHandle(warmHandle, currentStage):
+    # undo what options of the last command changed on the shared handle
+    if warmHandle.productStore is not None:
+        warmHandle.productStore._currentStage = currentStage
+    if 'rbuilder' in warmHandle.facade:
+        warmHandle.facade.rbuilder.setUseCache(True)
+
+
+def _runForwarded(conn, request, warmHandle):
+    oldCwd = os.getcwd()
+    oldEnviron = dict(os.environ)
+    currentStage = getattr(warmHandle.productStore, '_currentStage', None)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    savedFds = [os.dup(fd) for fd in (0, 1, 2)]
+    devNull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devNull, 0)
+    outRead, outWrite = os.pipe()
+    errRead, errWrite = os.pipe()
+    os.dup2(outWrite, 1)
+    os.dup2(errWrite, 2)
+    os.close(outWrite)
+    os.close(errWrite)
+    pump = threading.Thread(target=_pumpOutput,
+        args=(conn, {outRead: _STDOUT, errRead: _STDERR}))
+    pump.start()
+
+    from rbuild.internal import main
+    try:
+        try:
+            rc = main._main(request['argv'], _getMainClass(warmHandle))
+        except SystemExit, err:
+            rc = err.code
+            if rc is not None and not isinstance(rc, int):
+                sys.stderr.write('%s\n' % (rc,))
+                rc = 1
+        except:
+            traceback.print_exc()
+            rc = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # closing the last write ends of the pipes stops the pump
+        os.dup2(devNull, 1)
+        os.dup2(devNull, 2)
+        pump.join()
+        for fd, savedFd in zip((0, 1, 2), savedFds):
+            os.dup2(savedFd, fd)
+            os.close(savedFd)
+        os.close(devNull)
+        os.environ.clear()
+        os.environ.update(oldEnviron)
+        os.chdir(oldCwd)
+        _resetHandle(warmHandle, currentStage)
+    _sendFrame(conn, _EXIT, str(rc or 0))
+
+
+class RbuildDaemon(object):
+    """
+    Serves forwarded rbuild commands on a UNIX socket.
+
+    Connections are accepted on a separate thread, which declines
+    commands while another one is running; commands themselves run on
+    the thread that called L{serve}, so that they keep the main thread's
+    signal handling.
+
+    @param socketPath: path of the socket to listen on
+    """
+
+    #: seconds between checks for a stop request when idle
+    pollInterval = 1
+
+    def __init__(self, socketPath):
+        self.socketPath = socketPath
+        # checkout or working directory to (signature, handle)
+        self._warmHandles = {}
+        # (connection, request) pairs to run, or None to stop
+        self._requests = Queue.Queue()
+        self._busy = threading.Event()
+
+    def serve(self):
+        """
+        Serve commands until asked to stop.
+        """
+        if _connect(self.socketPath) is not None:
+            raise errors.PluginError('An rbuild daemon is already running on'
+                                     ' %s' % self.socketPath)
+        socketDir = os.path.dirname(self.socketPath)
+        if socketDir and not os.path.isdir(socketDir):
+            os.makedirs(socketDir, 0700)
+        if os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        oldUmask = os.umask(0077)
+        try:
+            server.bind(self.socketPath)
+        finally:
+            os.umask(oldUmask)
+        server.listen(16)
+        acceptor = threading.Thread(target=self._acceptConnections,
+                                    args=(server,))
+        acceptor.setDaemon(True)
+        acceptor.start()
+        try:
+            while True:
+                try:
+                    item = self._requests.get(True, self.pollInterval)
+                except Queue.Empty:
+                    continue
+                if item is None:
+                    break
+                conn, request = item
+                try:
+                    try:
+                        self._runRequest(conn, request)
+                    except socket.error:
+                        # the front end went away; the daemon carries on
+                        pass
+                finally:
+                    conn.close()
+                    self._busy.clear()
+        finally:
+            server.close()
+            try:
+                os.unlink(self.socketPath)
+            except OSError:
+                pass
+
+    def _acceptConnections(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.error:
+                # the server socket was closed
+                return
+            queued = False
+            try:
+                try:
+                    queued = self._handleConnection(conn)
+                except (EOFError, socket.error):
+                    pass
+            finally:
+                if not queued:
+                    conn.close()
+
+    def _handleConnection(self, conn):
+        """
+        @return: C{True} if the connection was queued to run a command
+        """
+        kind, data = _recvFrame(conn)
+        if kind == _STOP:
+            _sendFrame(conn, _EXIT, '0')
+            self._requests.put(None)
+        elif kind == _RUN:
+            if self._busy.isSet():
+                _sendFrame(conn, _DECLINE)
+            else:
+                self._busy.set()
+                self._requests.put((conn, json.loads(data)))
+                return True
+        return False
+
+    def _runRequest(self, conn, request):
+        argv = request['argv']
+        warmHandle = None
+        if not _changesConfig(argv):
+            warmHandle = self._getWarmHandle(request)
+        if warmHandle is None or _mayPrompt(warmHandle, argv):
+            _sendFrame(conn, _DECLINE)
+            return
+        _runForwarded(conn, request, warmHandle)
+
+    def _getWarmHandle(self, request):
+        """
+        @return: an initialized handle for the request's working directory,
+        kept for the commands that follow, or C{None} if the request cannot
+        use one
+        """
+        cwd = request['cwd']
+        if request['env'].get('HOME') != os.environ.get('HOME'):
+            return None
+        try:
+            productDir = dirstore.getDefaultProductDirectory(cwd)
+        except errors.MissingProductStoreError:
+            return None
+        key = productDir or cwd
+        signature = _getConfigSignature(cwd, productDir)
+        entry = self._warmHandles.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        oldCwd = os.getcwd()
+        warmHandle = None
+        try:
+            os.chdir(cwd)
+            #pylint: disable-msg=W0703
+            # * catch Exception is safe: the command will report the error
+            try:
+                warmHandle = _createWarmHandle()
+            except Exception:
+                pass
+        finally:
+            os.chdir(oldCwd)
+        self._warmHandles[key] = (signature, warmHandle)
+        return warmHandle
@@ -33,6 +33,7 @@ class HelpCommand(BaseCommand):
 
     # configuration setup is not required to run the help command
     requireConfig = False
+    promptsUser = False
 
     def runCommand(self, handle, argSet, args):
         #pylint: disable-msg=C0999
@@ -42,8 +42,10 @@ from robj import errors as robjerrors
 from rbuild import handle
 from rbuild import constants
 from rbuild import errors
+from rbuild.internal import daemon
 from rbuild.internal import pluginloader
 from rbuild.internal import helpcommand
+from rbuild.lib import importprofile
 from rbuild.pluginapi import command
 
 
@@ -58,11 +60,14 @@ class RbuildMain(mainhandler.MainHandler):
 
     abstractCommand = command.BaseCommand
     configClass = handle.RbuildHandle.configClass
-    commandList = [helpcommand.HelpCommand]
+    commandList = [helpcommand.HelpCommand, daemon.DaemonCommand]
 
     useConaryOptions = False
     setSysExcepthook = False
 
+    #: release the handle's network sessions once the command has run
+    closeHandle = True
+
     def __init__(self, *args, **kw):
         mainhandler.MainHandler.__init__(self, *args, **kw)
         self.plugins = None
@@ -70,8 +75,9 @@ class RbuildMain(mainhandler.MainHandler):
 
     def getCommand(self, argv, cfg):
         """
-        Initializes plugins so that all commands are available,
-        then returns the correct command based on argv.
+        Initializes the plugins needed for the command in argv (all of
+        them if it cannot be determined), then returns the correct command
+        based on argv.
 
         @param argv: Argument vector as provided by C{sys.argv}
         @param cfg: An C{RbuildConfiguration} object
@@ -84,6 +90,7 @@ class RbuildMain(mainhandler.MainHandler):
         self.plugins.registerCommands(self, self.handle)
         self.plugins.registerFacade(self.handle)
         self.plugins.initialize()
+        self.plugins.saveIndex()
         return mainhandler.MainHandler.getCommand(self, argv, cfg)
 
     def _getPreCommandOptions(self, argv, cfg):
@@ -165,6 +172,9 @@ class RbuildMain(mainhandler.MainHandler):
             stageName = argSet.pop('stage')
             self.handle.productStore.setActiveStageName(stageName)
 
+        if argSet.pop('no-cache', False):
+            self.handle.facade.rbuilder.setUseCache(False)
+
         lsprof = False
         if argSet.has_key('lsprof'):
             import cProfile
@@ -173,6 +183,9 @@ class RbuildMain(mainhandler.MainHandler):
             lsprof = True
             del argSet['lsprof']
 
+        # startup is over once the command is about to run
+        _reportImportProfile()
+
         try:
             rv = thisCommand.runCommand(self.handle, argSet, args)
             self.handle.ui.popContext('Command returned %r', rv)
@@ -186,7 +199,9 @@ class RbuildMain(mainhandler.MainHandler):
             except:
                 pass
             raise e, None, exc_info[2]
-
+        finally:
+            if self.closeHandle:
+                self.handle.close()
 
         if lsprof:
             prof.disable()
@@ -232,6 +247,12 @@ class RbuildMain(mainhandler.MainHandler):
         sys.exit("Unable to authenticate to the rBuilder")
 
 
+def _reportImportProfile():
+    profiler = importprofile.stop()
+    if profiler is not None:
+        profiler.report(sys.stderr)
+
+
 def _main(argv, MainClass):
     """
     Python hook for starting rbuild from the command line.
@@ -250,6 +271,9 @@ def _main(argv, MainClass):
             argv.remove('--debug-all')
         else:
             debuggerException = errors.RbuildInternalError
+        if '--profile-startup' in argv:
+            argv.remove('--profile-startup')
+            importprofile.install()
         sys.excepthook = errors.genExcepthook(debug=debugAll,
                                               debugCtrlC=debugAll)
         rc = MainClass().main(argv, debuggerException=debuggerException)
@@ -282,6 +306,9 @@ username and password''')
             raise
     except KeyboardInterrupt:
         return 1
+    finally:
+        # report even if the command never started
+        _reportImportProfile()
     return 0
 
 def main(argv=None):
@@ -289,4 +316,14 @@ def main(argv=None):
     Python hook for starting rbuild from the command line.
     @param argv: standard argument vector
     """
+    if argv is None:
+        argv = sys.argv
+    # let a running daemon execute the command with its warm state
+    try:
+        rc = daemon.forward(argv)
+    except errors.RbuildError, err:
+        log.error(err)
+        return 1
+    if rc is not None:
+        return rc
     return _main(argv, RbuildMain)
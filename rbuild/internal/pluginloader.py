@@ -15,19 +15,117 @@
 #
 
 
+import os
+
 from rmake.lib import pluginlib
 
+from rbuild import constants
+from rbuild.lib import diskcache
+
 #: C{PLUGIN_PREFIX} is a synthetic namespace which plugins use to
 #: refer to each other: C{from rbuild_plugins import ...}
 PLUGIN_PREFIX = 'rbuild_plugins'
 
+#: version of the saved plugin index; change it when the index changes
+INDEX_VERSION = 1
+
+#: directory holding the saved plugin index
+INDEX_CACHE_DIR = '~/.rbuild/cache'
+
+
+class PluginIndex(object):
+    """
+    Record of which plugins provide and extend each command, so that a
+    command line can be run after importing only the plugins it needs.
+
+    @ivar plugins: plugin class name to C{(directory, fileName, name)}
+    @ivar provides: command name to class names of plugins registering it
+    @ivar uses: plugin class name to names of the commands it looks up
+    @ivar subCommands: C{(command, subcommand)} to class names of plugins
+    registering that subcommand
+    @ivar eager: class names of plugins that must always be loaded because
+    they install hooks, facades or configuration
+    """
+
+    def __init__(self, plugins=None, provides=None, uses=None,
+                 subCommands=None, eager=None):
+        self.plugins = plugins or {}
+        self.provides = provides or {}
+        self.uses = uses or {}
+        self.subCommands = subCommands or {}
+        self.eager = eager or set()
+
+    def getClassName(self, name):
+        """
+        @param name: plugin name, as passed to C{handle.getPlugin}
+        @return: class name of the plugin, or C{None} if not indexed
+        """
+        for className, (_, _, pluginName) in self.plugins.iteritems():
+            if pluginName == name:
+                return className
+        return None
+
+    def getClosure(self, classNames):
+        """
+        @return: C{classNames} plus the plugins providing every command
+        those plugins look up, recursively
+        @rtype: set
+        """
+        needed = set()
+        pending = list(classNames)
+        while pending:
+            className = pending.pop()
+            if className in needed or className not in self.plugins:
+                continue
+            needed.add(className)
+            for commandName in self.uses.get(className, ()):
+                pending.extend(self.provides.get(commandName, ()))
+        return needed
+
+    def getPluginsForCommand(self, commandName, subCommandName=None):
+        """
+        @return: class names of the plugins needed to run a command, or
+        C{None} if the command is not indexed
+        @rtype: set
+        """
+        if commandName not in self.provides:
+            return None
+        classNames = set(self.provides[commandName]) | self.eager
+        users = self.subCommands.get((commandName, subCommandName))
+        if users:
+            classNames.update(users)
+        else:
+            # unknown or missing subcommand: load everything extending the
+            # command so that its usage is complete
+            classNames.update(className
+                              for className, used in self.uses.iteritems()
+                              if commandName in used)
+        return self.getClosure(classNames)
+
+
 class PluginManager(pluginlib.PluginManager):
     #pylint: disable-msg=R0904
     # "the creature can't help its ancestry"
 
+    #: L{PluginIndex} used to load plugins on demand, or C{None} if all
+    #: plugins were loaded
+    index = None
+    #: L{PluginIndex} being recorded while all plugins are loaded, and the
+    #: cache key and plugin directory signature to save it under
+    _recording = None
+    _indexKey = None
+    _indexSignature = None
+
     def registerCommands(self, main, handle):
         for plugin in self.plugins:
+            if self._recording is None:
+                plugin.registerCommands()
+                continue
+            before = set(handle.Commands.getAllCommandNames())
+            handle.Commands.popUsedCommands()
             plugin.registerCommands()
+            self._record(plugin, handle,
+                set(handle.Commands.getAllCommandNames()) - before)
         for command in handle.Commands.getAllCommandClasses():
             main.registerCommand(command)
 
@@ -37,7 +135,15 @@ class PluginManager(pluginlib.PluginManager):
 
     def initialize(self):
         for plugin in self.plugins:
+            if self._recording is None:
+                plugin.initialize()
+                continue
+            handle = plugin.handle
+            before = self._getSubCommands(handle)
+            handle.Commands.popUsedCommands()
             plugin.initialize()
+            self._record(plugin, handle, (),
+                self._getSubCommands(handle) - before)
 
     def addPluginConfigurationClasses(self, cfg):
         for plugin in self.plugins:
@@ -47,12 +153,180 @@ class PluginManager(pluginlib.PluginManager):
         for plugin in self.plugins:
             plugin.pluginCfg = cfg.getSection(plugin.name)
 
+    def _getSubCommands(self, handle):
+        return set((commandName, subCommandName)
+                   for commandName in handle.Commands.getAllCommandNames()
+                   for subCommandName in getattr(
+                       handle.Commands.getCommandClass(commandName),
+                       'getSubCommandNames', lambda: ())())
+
+    def _record(self, plugin, handle, commands, subCommands=()):
+        index = self._recording
+        # imported here to avoid a circular import through the handle
+        from rbuild import pluginapi
+
+        className = plugin.__class__.__name__
+        index.plugins[className] = (os.path.dirname(plugin.path),
+                                    os.path.basename(plugin.path),
+                                    plugin.name)
+        for commandName in commands:
+            index.provides.setdefault(commandName, set()).add(className)
+        for key in subCommands:
+            index.subCommands.setdefault(key, set()).add(className)
+        index.uses.setdefault(className, set()).update(
+            handle.Commands.popUsedCommands())
+        if (handle.popHooksInstalled()
+                or plugin.PluginConfiguration
+                    is not pluginapi.PluginConfiguration
+                or plugin.__class__.registerFacade.im_func
+                    is not pluginapi.Plugin.registerFacade.im_func):
+            index.eager.add(className)
+
+    def loadIndexedPlugins(self, classNames):
+        """
+        Load plugins named in the index, along with the plugins they
+        depend on, skipping any that are already loaded.
+
+        @param classNames: plugin class names
+        @return: newly loaded plugins
+        @rtype: list
+        """
+        if self.index is None:
+            return []
+        loaded = set(x.__class__.__name__ for x in self.plugins)
+        newPlugins = []
+        for className in sorted(self.index.getClosure(classNames) - loaded):
+            pluginDir, fileName, _ = self.index.plugins[className]
+            plugin = self.loadPluginFromFileName(pluginDir, fileName)
+            if plugin is None:
+                continue
+            if plugin not in self.plugins:
+                self.plugins.append(plugin)
+            newPlugins.append(plugin)
+        return newPlugins
+
+    def loadPluginOnDemand(self, handle, className=None, name=None):
+        """
+        Load and activate an indexed plugin that was not needed at startup,
+        identified by its class name or its plugin name.
+
+        @return: True if any plugins were loaded
+        @rtype: bool
+        """
+        if self.index is None:
+            return False
+        if className is None:
+            className = self.index.getClassName(name)
+        if className not in self.index.plugins:
+            return False
+        plugins = self.loadIndexedPlugins([className])
+        self.activatePlugins(handle, plugins)
+        return bool(plugins)
+
+    def activatePlugins(self, handle, plugins):
+        """
+        Attach plugins loaded after the handle was created to it, taking
+        them through the same steps as plugins loaded at startup.
+        """
+        cfg = handle.getConfig()
+        for plugin in plugins:
+            # plugins with configuration sections are always loaded at
+            # startup, so these only need their empty default section
+            cfg.addPluginConfigHandler(plugin.name, plugin.PluginConfiguration)
+            cfg.setSection(plugin.name, plugin.PluginConfiguration)
+            plugin.pluginCfg = cfg.getSection(plugin.name)
+            handle[plugin.__class__.__name__] = plugin
+            plugin.setHandle(handle)
+        for plugin in plugins:
+            plugin.registerCommands()
+        for plugin in plugins:
+            plugin.registerFacade(handle)
+        for plugin in plugins:
+            plugin.initialize()
+
+    def saveIndex(self):
+        """
+        Save the index recorded while loading every plugin, if any.
+        """
+        if self._recording is None:
+            return
+        _getIndexCache().set(self._indexKey, diskcache.CacheEntry(dict(
+            signature=self._indexSignature,
+            index=vars(self._recording))))
+        self._recording = None
+
+
+def _getIndexCache():
+    return diskcache.DiskCache(os.path.expanduser(INDEX_CACHE_DIR))
+
+
+def _getPluginDirSignature(pluginDirs):
+    # modification times of the plugin directories and of each plugin in
+    # them; any change invalidates the index
+    signature = []
+    for pluginDir in pluginDirs:
+        try:
+            fileNames = sorted(os.listdir(pluginDir))
+            signature.append((pluginDir, os.stat(pluginDir).st_mtime))
+        except OSError:
+            signature.append((pluginDir, None))
+            continue
+        for fileName in fileNames:
+            path = os.path.join(pluginDir, fileName)
+            if os.path.isdir(path):
+                path = os.path.join(path, '__init__.py')
+            try:
+                signature.append((path, os.stat(path).st_mtime))
+            except OSError:
+                pass
+    return tuple(signature)
+
+
+def _getCommandNames(argv):
+    # command and subcommand names as typed, before option parsing; a
+    # wrong guess only means loading more plugins than needed
+    args = list(argv[1:])
+    if args and args[0] == 'help':
+        args = args[1:]
+    if not args or args[0].startswith('-'):
+        return None, None
+    if len(args) > 1 and not args[1].startswith('-'):
+        return args[0], args[1]
+    return args[0], None
+
+
 def getPlugins(argv, pluginDirs, disabledPlugins=None):
-    # TODO: look for plugin-related options in argv, perhaps with our
-    # own lenient parser.
-    # until then, ignore unused argv argument
-    # pylint: disable-msg=W0613
+    """
+    Load the plugins needed to run the command line C{argv}.
+
+    When C{argv} names a command, the plugins providing and extending it
+    are looked up in an index saved by an earlier run, and only those
+    are imported; any other plugin is imported when first used through
+    the handle.  Otherwise, or when the plugin directories have changed
+    since the index was saved, every plugin is loaded and the index is
+    recorded again.
+    """
     pluginMgr = PluginManager(pluginDirs, disabledPlugins,
                               pluginPrefix=PLUGIN_PREFIX)
+    commandName, subCommandName = _getCommandNames(argv or ['rbuild'])
+    if commandName is None:
+        pluginMgr.loadPlugins()
+        return pluginMgr
+
+    key = ('plugin-index', INDEX_VERSION, constants.VERSION,
+           tuple(pluginDirs), tuple(sorted(disabledPlugins or ())))
+    signature = _getPluginDirSignature(pluginDirs)
+    entry = _getIndexCache().get(key)
+    if entry is not None and entry.data.get('signature') == signature:
+        index = PluginIndex(**entry.data['index'])
+        classNames = index.getPluginsForCommand(commandName, subCommandName)
+        if classNames is not None:
+            pluginMgr.index = index
+            pluginMgr.loadIndexedPlugins(classNames)
+            return pluginMgr
+
+    pluginMgr._recording = PluginIndex()
+    pluginMgr._indexKey = key
+    pluginMgr._indexSignature = signature
     pluginMgr.loadPlugins()
     return pluginMgr
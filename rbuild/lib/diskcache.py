@@ -0,0 +1,164 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Small on-disk cache for data fetched from remote services
+
+Entries are stored one per file, named by a hash of their key, together
+with the time they were fetched and any HTTP validators (ETag and
+Last-Modified) needed to revalidate them.  A missing, unreadable or
+corrupt entry is treated as a cache miss, and failing to write an entry
+is never an error.
+"""
+
+import cPickle
+import errno
+import hashlib
+import os
+import tempfile
+import time
+
+
+class CacheEntry(object):
+    """One cached item and the validators needed to revalidate it
+
+    :param data: cached data, any picklable object
+    :param str etag: ETag returned with the data, if any
+    :param str lastModified: Last-Modified returned with the data, if any
+    :param float fetched: time the data was fetched or last revalidated
+    """
+
+    def __init__(self, data, etag=None, lastModified=None, fetched=None):
+        self.data = data
+        self.etag = etag
+        self.lastModified = lastModified
+        if fetched is None:
+            fetched = time.time()
+        self.fetched = fetched
+
+    def isFresh(self, ttl):
+        """Return True if the entry is younger than C{ttl} seconds
+
+        :param float ttl: time to live, in seconds
+        :rtype: bool
+        """
+        age = time.time() - self.fetched
+        return 0 <= age < ttl
+
+    def getValidationHeaders(self):
+        """Return the HTTP headers that make a request conditional on
+        this entry having changed
+
+        :rtype: dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.lastModified:
+            headers['If-Modified-Since'] = self.lastModified
+        return headers
+
+
+class DiskCache(object):
+    """Store of L{CacheEntry} objects under a directory
+
+    Keys are tuples of strings; include whatever makes the entry unique,
+    such as the server URL and resource path.
+
+    :param str path: directory holding the cache files
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _getPath(self, key):
+        digest = hashlib.sha1('\0'.join(str(x) for x in key)).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def get(self, key):
+        """Return the entry stored for C{key}, fresh or not
+
+        :param tuple key: entry key
+        :rtype: CacheEntry or None
+        """
+        try:
+            fileObj = open(self._getPath(key), 'rb')
+        except IOError:
+            return None
+        try:
+            #pylint: disable-msg=W0703
+            # * catch Exception is safe: a corrupt entry is a cache miss
+            try:
+                stored = cPickle.load(fileObj)
+            except Exception:
+                return None
+        finally:
+            fileObj.close()
+
+        if not isinstance(stored, dict) or stored.get('key') != tuple(key):
+            return None
+        return CacheEntry(stored['data'], etag=stored['etag'],
+                          lastModified=stored['lastModified'],
+                          fetched=stored['fetched'])
+
+    def set(self, key, entry):
+        """Store C{entry} under C{key}, replacing any previous entry
+
+        :param tuple key: entry key
+        :param CacheEntry entry: entry to store
+        """
+        stored = dict(key=tuple(key), data=entry.data, etag=entry.etag,
+                      lastModified=entry.lastModified, fetched=entry.fetched)
+        try:
+            try:
+                os.makedirs(self.path, 0700)
+            except OSError, err:
+                if err.errno != errno.EEXIST:
+                    raise
+            fd, tmpPath = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+            try:
+                fileObj = os.fdopen(fd, 'wb')
+                try:
+                    cPickle.dump(stored, fileObj, cPickle.HIGHEST_PROTOCOL)
+                finally:
+                    fileObj.close()
+                os.rename(tmpPath, self._getPath(key))
+            except:
+                os.unlink(tmpPath)
+                raise
+        except (IOError, OSError):
+            # the cache is only an optimization
+            pass
+
+    def touch(self, key, entry):
+        """Mark C{entry} as revalidated now and store it under C{key}
+
+        :param tuple key: entry key
+        :param CacheEntry entry: entry that was revalidated
+        """
+        entry.fetched = time.time()
+        self.set(key, entry)
+
+    def invalidate(self, key):
+        """Drop any entry stored under C{key}
+
+        :param tuple key: entry key
+        """
+        try:
+            os.unlink(self._getPath(key))
+        except OSError, err:
+            if err.errno != errno.ENOENT:
+                raise
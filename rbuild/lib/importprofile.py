@@ -0,0 +1,120 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Import time profiling for C{rbuild --profile-startup}
+
+The profiler replaces the built-in C{__import__} so that it can time
+every module imported while it is installed: the plugins, facades and
+libraries loaded while rbuild starts up.
+"""
+
+import __builtin__
+import threading
+import time
+
+
+class ImportProfiler(object):
+    """Records the time spent importing each module
+
+    :ivar dict times: module name to C{(cumulative, self)} seconds, where
+        self time excludes the time spent in nested imports
+    """
+
+    def __init__(self):
+        self.times = {}
+        self._stack = []
+        self._lock = threading.RLock()
+        self._origImport = None
+
+    def install(self):
+        """Start timing imports"""
+        if self._origImport is None:
+            self._origImport = __builtin__.__import__
+            __builtin__.__import__ = self._import
+
+    def uninstall(self):
+        """Stop timing imports"""
+        if self._origImport is not None:
+            __builtin__.__import__ = self._origImport
+            self._origImport = None
+
+    def _import(self, name, *args, **kwargs):
+        origImport = self._origImport
+        # imports from other threads are not timed, so that the stack of
+        # nested imports stays consistent
+        if origImport is None or not self._lock.acquire(False):
+            return (origImport or __builtin__.__import__)(
+                name, *args, **kwargs)
+        try:
+            self._stack.append(0.0)
+            start = time.time()
+            try:
+                return origImport(name, *args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                nested = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                cumulative, selfTime = self.times.get(name, (0.0, 0.0))
+                self.times[name] = (cumulative + elapsed,
+                                    selfTime + elapsed - nested)
+        finally:
+            self._lock.release()
+
+    def report(self, stream, limit=30):
+        """Write the modules that took longest to import to C{stream}
+
+        :param stream: file-like object to write to
+        :param int limit: maximum number of modules to list
+        """
+        rows = sorted(self.times.iteritems(),
+                      key=lambda x: x[1][1], reverse=True)
+        total = sum(selfTime for _, (_, selfTime) in rows)
+        stream.write('Imports took %.3fs\n' % total)
+        stream.write('%10s %10s  %s\n' % ('SELF', 'CUMULATIVE', 'MODULE'))
+        for name, (cumulative, selfTime) in rows[:limit]:
+            stream.write('%8.1fms %8.1fms  %s\n' % (
+                selfTime * 1000, cumulative * 1000, name))
+
+
+_profiler = None
+
+
+def install():
+    """Install the shared profiler, creating it on first use
+
+    :rtype: ImportProfiler
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler()
+    _profiler.install()
+    return _profiler
+
+
+def stop():
+    """Uninstall the shared profiler and forget it
+
+    :return: the profiler, or None if it was not installed
+    :rtype: ImportProfiler
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.uninstall()
+    return profiler
@@ -18,11 +18,21 @@
 Generic utility functions that can be used by rbuild or rbuild plugins
 """
 
+import Queue
+import sys
+import threading
+import time
 from datetime import datetime
 
 from dateutil import parser as dtparser
 from dateutil import tz
 
+from rbuild import errors
+
+
+#: job states that mean an rBuilder job has not finished yet
+ACTIVE_JOB_STATES = ('Queued', 'Running')
+
 
 def convertTime(string):
     """Convert a time string to something human readable, and in local time
@@ -41,3 +51,169 @@ def convertTime(string):
 
     d.replace(tzinfo=tz.tzlocal())
     return datetime.strftime(d, "%Y/%m/%d %H:%M:%S")
+
+
+def threadedMap(func, items, jobs=1):
+    """Call C{func} on each of C{items} using up to C{jobs} worker threads
+
+    Results are returned in the same order as C{items}. If any call raises,
+    the exception from the earliest such item is re-raised once all workers
+    have finished. With C{jobs} of 1 or less the calls are made serially in
+    the calling thread.
+
+    :param callable func: function taking a single item
+    :param iterable items: items to process
+    :param int jobs: maximum number of concurrent calls
+    :rtype: list
+    """
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        return [func(x) for x in items]
+
+    results = [None] * len(items)
+    failures = [None] * len(items)
+    pending = Queue.Queue()
+    for idx, item in enumerate(items):
+        pending.put((idx, item))
+
+    def worker():
+        while True:
+            try:
+                idx, item = pending.get_nowait()
+            except Queue.Empty:
+                return
+            #pylint: disable-msg=W0703
+            # * catch Exception is safe: it is re-raised in the caller
+            try:
+                results[idx] = func(item)
+            except Exception:
+                failures[idx] = sys.exc_info()
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(jobs, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for excInfo in failures:
+        if excInfo is not None:
+            raise excInfo[0], excInfo[1], excInfo[2]
+    return results
+
+
+def forkedMap(func, items, jobs=1, initializer=None):
+    """Call C{func} on each of C{items} using up to C{jobs} worker processes
+
+    Unlike L{threadedMap}, each worker is a separate process forked from
+    this one, with its own working directory and its own copy of any
+    cached clients, so C{func} may use code that is not thread-safe.
+    C{initializer}, if given, is called once in each worker before any
+    item, for instance to drop network connections inherited from the
+    parent.  Items and results must be picklable.
+
+    Results are returned in the same order as C{items}. If any call
+    raises, an L{errors.RbuildError} describing the earliest failure is
+    raised once all calls have finished. With C{jobs} of 1 or less the
+    calls are made serially in the calling process.
+
+    :param callable func: function taking a single item
+    :param iterable items: items to process
+    :param int jobs: maximum number of worker processes
+    :param callable initializer: function called in each worker
+    :rtype: list
+    """
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        return [func(x) for x in items]
+
+    import multiprocessing
+    pool = multiprocessing.Pool(min(jobs, len(items)), _initForkedWorker,
+                                (func, initializer))
+    try:
+        results = pool.map(_callForked, items, 1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for failed, value in results:
+        if failed:
+            raise errors.RbuildError(value)
+    return [x[1] for x in results]
+
+
+_forkedFunc = None
+
+
+def _initForkedWorker(func, initializer):
+    # runs in each worker, which inherits func when forked; only the
+    # items and results need to be pickled
+    global _forkedFunc
+    _forkedFunc = func
+    if initializer is not None:
+        initializer()
+
+
+def _callForked(item):
+    #pylint: disable-msg=W0703
+    # * catch Exception is safe: it is reported to the caller
+    try:
+        return False, _forkedFunc(item)
+    except Exception, err:
+        return True, formatException(err)
+
+
+def formatException(err):
+    """Describe an exception in one line for the user
+
+    rBuild errors are already worded for users; other exceptions are
+    prefixed with their class name.
+
+    :param Exception err: exception to describe
+    :rtype: str
+    """
+    if isinstance(err, errors.RbuildBaseError):
+        return str(err)
+    return '%s: %s' % (err.__class__.__name__, err)
+
+
+def waitForJob(job, interval=1, maxInterval=10, timeout=0, callback=None):
+    """Poll an rBuilder job until it leaves the queued and running states
+
+    The job is refreshed every C{interval} seconds. Each poll that shows no
+    change in state or status text doubles the delay, up to C{maxInterval};
+    any change drops it back to C{interval}. C{callback}, if given, is
+    called with the job before every wait.
+
+    :param job: rObj(job) to wait on
+    :param float interval: initial seconds between polls
+    :param float maxInterval: longest delay between polls
+    :param float timeout: seconds to wait before giving up, 0 for no limit
+    :param callable callback: progress callback taking the job
+    :raises JobTimeoutError: if C{timeout} expires first
+    :return: the finished job
+    """
+    maxInterval = max(interval, maxInterval)
+    delay = interval
+    lastSeen = None
+    start = time.time()
+    while job.job_state.name in ACTIVE_JOB_STATES:
+        if callback is not None:
+            callback(job)
+        seen = (job.job_state.name, job.status_text)
+        if seen == lastSeen:
+            delay = min(delay * 2, maxInterval)
+        else:
+            delay = interval
+        lastSeen = seen
+
+        wait = delay
+        if timeout:
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                raise errors.JobTimeoutError(timeout=timeout)
+            wait = min(wait, remaining)
+        time.sleep(wait)
+        job.refresh()
+    return job
@@ -38,10 +38,12 @@ any help messages
 from conary.lib import command
 from conary.lib import log
 from conary.lib import options
+import itertools
 import optparse
 import sys
 
 from rbuild import errors
+from rbuild.lib import util
 
 
 (NO_PARAM,  ONE_PARAM)  = (options.NO_PARAM, options.ONE_PARAM)
@@ -66,11 +68,17 @@ class BaseCommand(command.AbstractCommand):
                                     "Display more detailed information where"
                                     " available"),
             'stage'              : (VERBOSE_HELP, "Specify the stage to use"),
+            'no-cache'           : (VERBOSE_HELP,
+                                    "Fetch rBuilder catalogs instead of"
+                                    " using the cached copies"),
             'lsprof'             : SUPPRESS_HELP,
             }
 
     projectCommand = False
     stageCommand = False
+    #: commands that never ask for input set this to False, so that the
+    #: rbuild daemon may run them without a terminal
+    promptsUser = True
 
     def addParameters(self, argDef):
         """
@@ -92,6 +100,7 @@ class BaseCommand(command.AbstractCommand):
         d["verbose"] = NO_PARAM
         d["quiet"] = NO_PARAM
         d["stage"] = ONE_PARAM
+        d["no-cache"] = NO_PARAM
         d["lsprof"] = NO_PARAM
         argDef[self.defaultGroup] = d
         self.addLocalParameters(argDef)
@@ -200,6 +209,13 @@ class CommandWithSubCommands(BaseCommand):
         for cls in self._subCommands.values():
             cls().addLocalParameters(argDef)
 
+    @classmethod
+    def getSubCommandNames(cls):
+        """
+        @return: names and aliases of the registered subcommands
+        """
+        return cls.__dict__.get('_subCommands', {}).keys()
+
     @classmethod
     def getSubCommandClass(cls, name):
         """
@@ -282,6 +298,22 @@ class CommandWithSubCommands(BaseCommand):
         return errNo
 
 
+class _LinkedResource(object):
+    """
+    Resource whose linked resources have already been fetched; other
+    attributes come from the wrapped resource.
+    """
+
+    def __init__(self, resource, links):
+        self._resource = resource
+        self._links = links
+
+    def __getattr__(self, name):
+        if name in self._links:
+            return self._links[name]
+        return getattr(self._resource, name)
+
+
 class ListCommand(BaseCommand):
     """
         Inherit for commands/sub-commands that lists or show things. Must
@@ -303,6 +335,10 @@ class ListCommand(BaseCommand):
             hidden: never display this field, defaults to False
             verbose: do not display this field unless verbose is on, defaults
                 to False
+            link: name of the linked resource the accessor dereferences,
+                such as 'created_by'. Links are fetched concurrently for a
+                batch of listed rows before it is rendered, or for all shown
+                resources, each distinct link once.
 
         Example:
             class FooListCommand(ListCommand):
@@ -318,7 +354,49 @@ class ListCommand(BaseCommand):
     paramHelp = '[options] [id]*'
     listFieldMap = dict()
 
+    docs = dict(BaseCommand.docs)
+    docs.update({
+        'limit': 'Show at most this many resources',
+        'page-size': 'Fetch resources from the rBuilder this many at a time',
+        })
+
+    #: rows to read ahead when computing column widths, unless a page size
+    #: is given
+    lookahead = 100
+
+    #: number of linked resources to fetch concurrently
+    prefetchJobs = 8
+
+    #: maximum number of resources to list, or None for all of them
+    limit = None
+    #: number of resources to fetch per request, or None to fetch the whole
+    #: collection at once
+    pageSize = None
+
+    def addLocalParameters(self, argDef):
+        argDef['limit'] = ONE_PARAM
+        argDef['page-size'] = ONE_PARAM
+
+    def _processListOptions(self, argSet):
+        for option, attr in (('limit', 'limit'), ('page-size', 'pageSize')):
+            value = argSet.pop(option, None)
+            if value is None:
+                continue
+            try:
+                value = int(value)
+            except ValueError:
+                value = 0
+            if value < 1:
+                raise errors.BadParameterError(
+                    "--%s must be a positive integer" % option)
+            setattr(self, attr, value)
+
+        if self.pageSize is None and self.limit is not None:
+            # no need to fetch more than will be shown
+            self.pageSize = self.limit
+
     def runCommand(self, handle, argSet, args):
+        self._processListOptions(argSet)
         _, idList = self.requireParameters(args, allowExtra=True)
         if idList:
             self._show(handle, idList)
@@ -354,32 +432,140 @@ class ListCommand(BaseCommand):
                 display_name = self._fieldNameToDisplayName(field, mapping)
                 yield (display_name, value)
 
+    def _getLinkUri(self, resource, link):
+        # only bare links (an id and no content) need fetching; summaries
+        # included in the resource are used as they are
+        node = getattr(getattr(resource, '_root', None), link, None)
+        xobjData = getattr(node, '_xobj', None)
+        if xobjData is None or xobjData.elements:
+            return None
+        uri = getattr(node, 'id', None)
+        if uri:
+            return str(uri)
+        return None
+
+    def _prefetchLinks(self, handle, resources, fields, mapping,
+                       fetched=None):
+        """
+        Fetch the linked resources used by C{fields} of C{resources},
+        concurrently and once per distinct link.
+
+        @param fetched: links already fetched, by URI; newly fetched links
+        are added to it so later calls can reuse them
+        @type fetched: dict
+        @return: C{resources}, wrapped so that accessors find the fetched
+        links in place of the lazy ones
+        @rtype: list
+        """
+        links = set()
+        for field in fields:
+            fdict = mapping.get(field, dict())
+            if fdict.get('hidden', False) or fdict.get('verbose', False):
+                continue
+            if fdict.get('link'):
+                links.add(fdict['link'])
+        if not links:
+            return resources
+
+        wanted = [dict((link, self._getLinkUri(resource, link))
+                       for link in links) for resource in resources]
+        uris = sorted(set(uri for linkMap in wanted
+                          for uri in linkMap.values() if uri))
+        if not uris:
+            return resources
+
+        if fetched is None:
+            fetched = {}
+        missing = [uri for uri in uris if uri not in fetched]
+        rb = handle.facade.rbuilder
+        def fetch(uri):
+            try:
+                return rb.getResource(uri)
+            except errors.RbuildError:
+                # leave it to the accessor to fetch, or fail, lazily
+                return None
+        if missing:
+            fetched.update(zip(missing, util.threadedMap(fetch, missing,
+                                                         self.prefetchJobs)))
+
+        results = []
+        for resource, linkMap in zip(resources, wanted):
+            linked = dict((link, fetched[uri])
+                          for link, uri in linkMap.items()
+                          if uri and fetched[uri] is not None)
+            if linked:
+                resource = _LinkedResource(resource, linked)
+            results.append(resource)
+        return results
+
+    def _iterListRows(self, handle, resources, window):
+        # prefetch links one window at a time, so rows are written as each
+        # batch completes; links shared across batches are fetched once
+        resources = iter(resources)
+        fetched = {}
+        while True:
+            batch = list(itertools.islice(resources, window))
+            if not batch:
+                return
+            for resource in self._prefetchLinks(handle, batch,
+                    self.listFields, self.listFieldMap, fetched):
+                yield tuple(self._getResourceData(
+                    resource, self.listFields, self.listFieldMap))
+
     def _list(self, handle, *args, **kwargs):
         headers = tuple(self._fieldNameToDisplayName(field, self.listFieldMap)
                         for field in self.listFields)
 
-        resources = handle.getPlugin(self.resource).list(*args, **kwargs)
+        # REST collections fetched while listing are paged, and their
+        # pages requested only as rows are written
+        rb = handle.facade.rbuilder
+        rb.setPageSize(self.pageSize)
+        try:
+            resources = handle.getPlugin(self.resource).list(*args, **kwargs)
+        finally:
+            rb.setPageSize(None)
+
         if resources:
-            data = []
-            for resource in resources:
-                data.append(tuple(self._getResourceData(
-                    resource, self.listFields, self.listFieldMap)))
-            handle.ui.writeTable(data, headers)
+            window = self.pageSize or self.lookahead
+            data = self._iterListRows(handle,
+                itertools.islice(resources, self.limit), window)
+            handle.ui.writeTable(data, headers, lookahead=window)
         else:
             handle.ui.warning('No %s found' % self.resource)
         return resources
 
+    def _getShowResources(self, handle, idList):
+        """
+        Fetch the resources to show; override to fetch them all at once
+
+        @return: pairs of each id in C{idList} and its resource, or None if
+        it was not found
+        """
+        plugin = handle.getPlugin(self.resource)
+        for resourceId in idList:
+            yield resourceId, plugin.show(resourceId)
+
     def _show(self, handle, idList):
         if not hasattr(self, 'showFieldMap'):
             raise errors.PluginError(
                 "'%s' does not support showing specific resources" %
                 self.resource)
-        for resourceId in idList:
-            resource = handle.getPlugin(self.resource).show(resourceId)
+        found = list(self._getShowResources(handle, idList))
+        showFields = set(self.showFieldMap)
+        for _, resource in found:
+            if resource:
+                showFields.update(resource.elements)
+        resources = self._prefetchLinks(handle,
+            [resource for _, resource in found if resource],
+            showFields, self.showFieldMap)
+        resources.reverse()
+
+        for resourceId, resource in found:
             if resource:
                 showFieldList = list(set(resource.elements
                                          + self.showFieldMap.keys()))
                 showFieldList.sort()
+                resource = resources.pop()
                 handle.ui.writeTable(list(self._getResourceData(
                     resource,
                     showFieldList,
@@ -19,6 +19,7 @@ from rpath_proddef import api1 as proddef
 
 from rbuild import errors
 from rbuild.internal.internal_types import WeakReference
+from rbuild.lib import diskcache
 
 
 #pylint: disable-msg=R0201,R0904
@@ -42,6 +43,9 @@ class ProductStore(object):
     def __init__(self, handle=None):
         self._handle = handle
         self._currentStage = None
+        self._productIndex = None
+        # (base flavor, build flavor) -> full flavor
+        self._fullFlavors = {}
 
     def setHandle(self, handle):
         self._handle = handle
@@ -61,8 +65,23 @@ class ProductStore(object):
         Save the changes to the product into the product store, but don't
         commit
         """
+        self.invalidateProductIndex()
         return self
 
+    def invalidateProductIndex(self):
+        """
+        Discard the lookups derived from the build definitions of the
+        current product, including the rMake configuration built from
+        them.  Must be called after editing the product definition in
+        place; replacing C{handle.product} is noticed without it.
+        """
+        self._productIndex = None
+        handle = self._handle
+        if handle is not None and 'rmake' in handle.facade:
+            # only a facade that already exists can have cached configs
+            # and search path troves for the old product
+            handle.facade.rmake.clearCachedConfig()
+
     def commit(self, message):
         """
         Commit a product definition change
@@ -100,13 +119,48 @@ class ProductStore(object):
         product = self._handle.product
         buildDefs = product.getBuildDefinitions()
         self._assertImages(buildDefs)
-        groupFlavors = [ (str(self.getBuildDefinitionGroupToBuild(x)),
-                          str(x.getBuildBaseFlavor()))
-                         for x in buildDefs ]
-        fullFlavors = self._handle.facade.conary._overrideFlavors(
-                                             str(product.getBaseFlavor()),
-                                             [x[1] for x in groupFlavors])
-        return [(x[0][0], x[1]) for x in zip(groupFlavors, fullFlavors)]
+        index = self._getProductIndex()
+        if index.groupFlavors is None:
+            groupFlavors = [ (str(self.getBuildDefinitionGroupToBuild(x)),
+                              str(x.getBuildBaseFlavor()))
+                             for x in buildDefs ]
+            fullFlavors = self._getFullFlavors(product.getBaseFlavor(),
+                                               [x[1] for x in groupFlavors])
+            index.groupFlavors = [(x[0][0], x[1])
+                                  for x in zip(groupFlavors, fullFlavors)]
+        return list(index.groupFlavors)
+
+    def _getProductIndex(self):
+        """
+        @return: lookups derived from the current product's build
+        definitions, rebuilt when the product is replaced or after
+        L{invalidateProductIndex}
+        @rtype: L{_ProductIndex}
+        """
+        product = self._handle.product
+        index = self._productIndex
+        if index is None or index.product is not product:
+            index = self._productIndex = _ProductIndex(product)
+        return index
+
+    def _getFullFlavors(self, baseFlavor, flavors):
+        """
+        Override C{baseFlavor} with each of C{flavors}, parsing each
+        combination only once per product store.
+        @return: full flavor strings, in the order of C{flavors}
+        @rtype: list
+        """
+        baseFlavor = str(baseFlavor)
+        missing = {}
+        for flavor in flavors:
+            if (baseFlavor, str(flavor)) not in self._fullFlavors:
+                missing[str(flavor)] = flavor
+        if missing:
+            fullFlavors = self._handle.facade.conary._overrideFlavors(
+                baseFlavor, missing.values())
+            for flavor, fullFlavor in zip(missing, fullFlavors):
+                self._fullFlavors[baseFlavor, flavor] = fullFlavor
+        return [ self._fullFlavors[baseFlavor, str(x)] for x in flavors ]
 
     def getBuildDefinitionGroupToBuild(self, buildDefinition):
         """
@@ -154,20 +208,9 @@ class ProductStore(object):
         if not buildDefinition.imageGroup:
             return None
 
-        for bd in self._handle.product.getBuildDefinitions():
-            # Test for flavor equality.
-            if bd.getBuildBaseFlavor() == buildDefinition.getBuildBaseFlavor():
-
-                # Test for image group equality.
-                if bd.imageGroup and \
-                   bd.imageGroup == buildDefinition.imageGroup:
-
-                    # If defined, return the source group for this definition.
-                    sourceGroup = bd.getBuildSourceGroup()
-                    if sourceGroup:
-                        return sourceGroup
-
-        return None                    
+        sourceGroups = self._getProductIndex().getSourceGroups()
+        return sourceGroups.get((buildDefinition.getBuildBaseFlavor(),
+                                 buildDefinition.imageGroup))
 
     def getBuildsWithFullFlavors(self, stageName):
         """
@@ -181,9 +224,7 @@ class ProductStore(object):
         builds = product.getBuildsForStage(stageName)
         self._assertImages(builds)
         flavors = [ x.getBuildBaseFlavor() for x in builds ]
-        fullFlavors = self._handle.facade.conary._overrideFlavors(
-                                             str(product.getBaseFlavor()),
-                                             flavors)
+        fullFlavors = self._getFullFlavors(product.getBaseFlavor(), flavors)
         return zip(builds, fullFlavors)
 
     def getPackageJobId(self):
@@ -214,6 +255,14 @@ class ProductStore(object):
         raise errors.IncompleteInterfaceError(
             'rBuild status storage unsupported for this configuration')
 
+    def getPackageManifest(self, stageName=None):
+        raise errors.IncompleteInterfaceError(
+            'rBuild status storage unsupported for this configuration')
+
+    def setPackageManifest(self, manifest, stageName=None):
+        raise errors.IncompleteInterfaceError(
+            'rBuild status storage unsupported for this configuration')
+
     def getRbuildConfigData(self):
         raise errors.IncompleteInterfaceError(
             'rBuild configuration data unsupported for this configuration')
@@ -244,6 +293,17 @@ class ProductStore(object):
             autoLoadRecipes.append(alr.getTroveName())
         searchPaths = [ x.getTroveTup()
                 for x in self._handle.product.getSearchPaths() ]
+
+        cache = None
+        key = self._getSearchPathCacheKey('autoLoadRecipes', searchPaths,
+                                          autoLoadRecipes)
+        if key is not None:
+            cache = self.getCache()
+        if cache is not None:
+            entry = cache.get(key)
+            if entry is not None:
+                return list(entry.data)
+
         troveTups = self._handle.facade.conary._findPackagesInSearchPaths(
                 searchPaths, autoLoadRecipes)
         ret = []
@@ -251,8 +311,38 @@ class ProductStore(object):
             if pkgTroveTup:
                 ret.append("%s=%s" % (pkgTroveTup[0][0], pkgTroveTup[0][1]))
 
+        if cache is not None:
+            cache.set(key, diskcache.CacheEntry(ret))
         return ret
 
+    def getCache(self):
+        """
+        @return: cache for data derived from the product definition, or
+        C{None} if this product store has nowhere to keep one
+        @rtype: L{diskcache.DiskCache}
+        """
+        return None
+
+    def _getSearchPathCacheKey(self, kind, searchPaths, names):
+        """
+        Key for caching what C{names} resolve to in C{searchPaths}.  The
+        answer can only change with the product definition while every
+        search path is pinned to a version, so the key includes the
+        version of the product definition source trove.
+        @return: cache key, or C{None} if the answer must not be cached
+        """
+        sourceTrove = getattr(self._handle.product, '_sourceTrove', None)
+        if not sourceTrove:
+            return None
+        key = [kind, sourceTrove]
+        for name, version, flavor in searchPaths:
+            if not version or '/' not in str(version):
+                # search paths on a label resolve differently over time
+                return None
+            key.append('%s=%s[%s]' % (name, version, flavor))
+        key.extend(names)
+        return tuple(key)
+
     def _assertImages(self, images):
         if not images:
             raise errors.MissingImageDefinitionError(
@@ -290,3 +380,35 @@ class ProductStore(object):
             return info.rpmRequirements
         else:
             return []
+
+
+class _ProductIndex(object):
+    """
+    Lookups derived from the build definitions of one product definition,
+    each computed when first needed.
+
+    @param product: product definition the lookups are derived from
+    """
+
+    def __init__(self, product):
+        self.product = product
+        #: (group, full flavor) for each build definition
+        self.groupFlavors = None
+        self._sourceGroups = None
+
+    def getSourceGroups(self):
+        """
+        @return: the first source group defined for each pair of build
+        flavor and image group
+        @rtype: dict
+        """
+        if self._sourceGroups is None:
+            self._sourceGroups = {}
+            for bd in self.product.getBuildDefinitions():
+                if not bd.imageGroup:
+                    continue
+                sourceGroup = bd.getBuildSourceGroup()
+                if sourceGroup:
+                    self._sourceGroups.setdefault(
+                        (bd.getBuildBaseFlavor(), bd.imageGroup), sourceGroup)
+        return self._sourceGroups
@@ -15,12 +15,14 @@
 #
 
 
+import json
 import os
 
 from conary.lib import cfg
 from conary.lib import cfgtypes
 
 from rbuild import errors
+from rbuild.lib import diskcache
 from rbuild.productstore.abstract import ProductStore
 
 
@@ -101,6 +103,10 @@ class CheckoutProductStore(ProductStore):
             # Cannot load product yet, so cannot validate
             self._currentStage = stageName
         self.statusStore = None            
+        # parsed product definition, and the signature of the files it
+        # was read from
+        self._product = None
+        self._productSignature = None
 
     def getBaseDirectory(self):
         return self._baseDirectory
@@ -111,10 +117,31 @@ class CheckoutProductStore(ProductStore):
         return path
 
     def getProduct(self):
-        path = self.getProductDefinitionXmlPath()
-        pdef = self.proddef.ProductDefinition(fromStream=open(path))
-        pdef._sourceTrove = self._getSourceTroveVersion()
-        return pdef
+        """
+        Returns the product definition, which is parsed again only when
+        the checkout has changed since it was last read.  The same object
+        is returned until then; use C{save()} to persist changes to it.
+        """
+        signature = self._getProductSignature()
+        if self._product is None or self._productSignature != signature:
+            path = self.getProductDefinitionXmlPath()
+            pdef = self.proddef.ProductDefinition(fromStream=open(path))
+            pdef._sourceTrove = self._getSourceTroveVersion()
+            self._product = pdef
+            self._productSignature = signature
+        return self._product
+
+    def _getProductSignature(self):
+        signature = []
+        for path in (self.getProductDefinitionXmlPath(),
+                     self.getProductDefinitionDirectory() + '/CONARY'):
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime, st.st_size, st.st_ino))
+        return tuple(signature)
 
     def _getSourceTroveVersion(self):
         return self._handle.facade.conary._getRepositoryStateFromDirectory(self.getProductDefinitionDirectory())[1].getNameVersionFlavor().asString()
@@ -130,6 +157,7 @@ class CheckoutProductStore(ProductStore):
         if not self._handle.facade.conary.updateCheckout(
             self.getProductDefinitionDirectory()):
             raise errors.RbuildError('Failed to update product definition')
+        self._product = None
         ProductStore.update(self)
 
     def save(self, product):
@@ -139,6 +167,8 @@ class CheckoutProductStore(ProductStore):
         """
         pdXmlPath = self.getProductDefinitionXmlPath()
         product.serialize(file(pdXmlPath, "w"))
+        self._product = None
+        self.invalidateProductIndex()
         return self
 
     def commit(self, message):
@@ -274,6 +304,9 @@ class CheckoutProductStore(ProductStore):
     def getRmakeConfigPath(self):
         return self.getProductDefinitionDirectory() + '/rmakerc'
 
+    def getCache(self):
+        return diskcache.DiskCache(self._baseDirectory + '/.rbuild/cache')
+
     def getStatus(self, key):
         return self._getStatusStore()[key]
 
@@ -282,6 +315,46 @@ class CheckoutProductStore(ProductStore):
         statusStore.setValue(key, value)
         statusStore.save()
 
+    def getPackageManifest(self, stageName=None):
+        """
+        @param stageName: (None) Stage name, default the active stage
+        @return: record of the package sources in the stage that were
+        last built and committed, or an empty C{dict}
+        @rtype: dict
+        """
+        try:
+            fileObj = open(self._getPackageManifestPath(stageName))
+        except IOError:
+            return {}
+        try:
+            try:
+                return json.load(fileObj)
+            except ValueError:
+                return {}
+        finally:
+            fileObj.close()
+
+    def setPackageManifest(self, manifest, stageName=None):
+        """
+        @param manifest: record to return from C{getPackageManifest}
+        @type manifest: dict
+        @param stageName: (None) Stage name, default the active stage
+        """
+        path = self._getPackageManifestPath(stageName)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fileObj = open(path + '.new', 'w')
+        try:
+            json.dump(manifest, fileObj)
+        finally:
+            fileObj.close()
+        os.rename(path + '.new', path)
+
+    def _getPackageManifestPath(self, stageName=None):
+        if stageName is None:
+            stageName = self.getActiveStageName()
+        return '%s/.rbuild/manifests/%s' % (self._baseDirectory, stageName)
+
     def _getStatusStore(self):
         if self.statusStore is None:
             self.statusStore = _FileStatusStore(self._baseDirectory
@@ -20,6 +20,7 @@ User interface module for rbuild.
 """
 import getpass
 import fcntl
+import itertools
 import os
 import struct
 import sys
@@ -433,7 +434,7 @@ class UserInterface(object):
             else:
                 self.progress(msg, *args)
 
-    def writeTable(self, rows, headers=None, padded=True):
+    def writeTable(self, rows, headers=None, padded=True, lookahead=None):
         '''
         Writes a table; used to display data that is best displayed in rows and
         columns. If 'headers' is not provided, then we assume the first row is
@@ -446,32 +447,56 @@ class UserInterface(object):
         @type headers: tuple of strings
         @param padded: pad each row element so columns are aligned
         @type padded: bool
+        @param lookahead: if set, C{rows} may be any iterable, and is written
+        in batches of this many rows as they become available. Each batch is
+        padded to the widest element seen so far, so columns only grow.
+        @type lookahead: int
         '''
         if headers is None:
             headers = rows.pop(0)
 
+        if lookahead is None:
+            batches = [rows]
+        else:
+            rows = iter(rows)
+            batches = iter(lambda: list(itertools.islice(rows, lookahead)), [])
+
         columns = len(headers)
         padding = [''] * (columns - 1)
         if padded:
             padding = [len(h) for h in headers[:-1]]
-            for row in rows:
-                for idx, elem in enumerate(row[:columns - 1]):
-                    padding[idx] = max(padding[idx], len(elem))
 
+        wroteHeaders = False
+        for batch in batches:
+            if padded:
+                for row in batch:
+                    for idx, elem in enumerate(row[:columns - 1]):
+                        padding[idx] = max(padding[idx], len(elem))
+            format_string = self._getTableFormat(columns, padding)
+
+            if not wroteHeaders:
+                self._writeTableRow(format_string, headers)
+                wroteHeaders = True
+
+            for row in batch:
+                if len(row) < columns:
+                    # extend row with empty strings
+                    row = row + ('',) * (columns - len(row))
+                self._writeTableRow(format_string, row[:columns])
+            self.outStream.flush()
+
+        if not wroteHeaders:
+            self._writeTableRow(self._getTableFormat(columns, padding),
+                                headers)
+            self.outStream.flush()
+
+    def _getTableFormat(self, columns, padding):
         # create a padded format string, but do not pad the last column
-        format_string = '  '.join(
+        return '  '.join(
             ['{%d:%s}' % x for x in zip(range(columns - 1), padding)]
             + ['{%d:%s}' % (columns - 1, '')])
 
-        output = format_string.format(*headers)
+    def _writeTableRow(self, format_string, row):
+        output = format_string.format(*row)
         self.outStream.write('%s\n' % output)
         self._log(output)
-
-        for row in rows:
-            if len(row) < columns:
-                # extend row with empty strings
-                row = row + ('',) * (columns - len(row))
-            output = format_string.format(*row[:columns])
-            self.outStream.write('%s\n' % output)
-            self._log(output)
-        self.outStream.flush()
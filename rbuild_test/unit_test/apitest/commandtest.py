@@ -18,9 +18,11 @@
 
 
 from rbuild_test import rbuildhelp
+from testutils import mock
 
 from conary.lib import log
 
+from rbuild import errors
 from rbuild.pluginapi import command
 from rbuild.internal import main
 from rbuild.internal import helpcommand
@@ -32,7 +34,7 @@ class BaseCommandTest(rbuildhelp.RbuildHelper):
         d = {}
         cmd.addParameters(d)
         self.assertEquals(set(d['Common Options']),
-            set(['config', 'config-file', 'lsprof', 'quiet', 
+            set(['config', 'config-file', 'lsprof', 'no-cache', 'quiet',
             'skip-default-config', 'stage', 'verbose']))
 
     def testProcessConfigOptions(self):
@@ -51,6 +53,136 @@ class BaseCommandTest(rbuildhelp.RbuildHelper):
                           cmd.runCommand, None, None, None)
 
 
+class ListCommandTest(rbuildhelp.RbuildHelper):
+    def testProcessListOptions(self):
+        cmd = command.ListCommand()
+        argSet = {'limit': '5'}
+        cmd._processListOptions(argSet)
+        self.assertEquals((cmd.limit, cmd.pageSize), (5, 5))
+        self.assertEquals(argSet, {})
+
+        cmd = command.ListCommand()
+        cmd._processListOptions({'limit': '5', 'page-size': '50'})
+        self.assertEquals((cmd.limit, cmd.pageSize), (5, 50))
+
+        cmd = command.ListCommand()
+        cmd._processListOptions({})
+        self.assertEquals((cmd.limit, cmd.pageSize), (None, None))
+
+        for value in ('0', 'ten'):
+            err = self.assertRaises(errors.BadParameterError,
+                command.ListCommand()._processListOptions, {'limit': value})
+            self.assertEquals(str(err), '--limit must be a positive integer')
+
+    def testListStreams(self):
+        class ListThingsCommand(command.ListCommand):
+            resource = 'things'
+            listFields = ('name',)
+
+        handle = mock.MockObject()
+        resources = [mock.MockObject(name='r%d' % x) for x in range(5)]
+        plugin = mock.MockObject()
+        plugin.list._mock.setReturn(resources)
+        handle.getPlugin._mock.setReturn(plugin, 'things')
+
+        cmd = ListThingsCommand()
+        cmd._processListOptions({'limit': '3'})
+        self.assertEquals(cmd._list(handle), resources)
+        handle.facade.rbuilder.setPageSize._mock.assertCalled(3)
+        handle.facade.rbuilder.setPageSize._mock.assertCalled(None)
+
+        args, kwargs = handle.ui.writeTable._mock.popCall()
+        self.assertEquals(args[1], ('NAME',))
+        self.assertEquals(kwargs, (('lookahead', 3),))
+        self.assertEquals(list(args[0]), [('r0',), ('r1',), ('r2',)])
+
+        # without a page size the default lookahead is used
+        cmd = ListThingsCommand()
+        cmd._list(handle)
+        args, kwargs = handle.ui.writeTable._mock.popCall()
+        self.assertEquals(kwargs, (('lookahead', cmd.lookahead),))
+        self.assertEquals(len(list(args[0])), 5)
+
+    def testPrefetchLinks(self):
+        class ListThingsCommand(command.ListCommand):
+            resource = 'things'
+            listFields = ('name', 'owner')
+            listFieldMap = dict(
+                owner=dict(accessor=lambda t: t.owner.full_name,
+                           link='owner'),
+                )
+
+        class Node(object):
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+
+        def thing(name, ownerUri):
+            link = Node(id=ownerUri, _xobj=Node(elements=[]))
+            return Node(name=name, _root=Node(owner=link), owner=link)
+
+        resources = [thing('t0', 'http://localhost/users/1'),
+                     thing('t1', 'http://localhost/users/2'),
+                     thing('t2', 'http://localhost/users/1')]
+        handle = mock.MockObject()
+        rb = handle.facade.rbuilder
+        rb.getResource._mock.setReturn(Node(full_name='Alice'),
+                                       'http://localhost/users/1')
+        rb.getResource._mock.setReturn(Node(full_name='Bob'),
+                                       'http://localhost/users/2')
+
+        plugin = mock.MockObject()
+        plugin.list._mock.setReturn(resources)
+        handle.getPlugin._mock.setReturn(plugin, 'things')
+
+        # links are fetched a batch at a time, as rows are written, and
+        # once for the whole listing
+        cmd = ListThingsCommand()
+        cmd.lookahead = 2
+        cmd._list(handle)
+        rb.getResource._mock.assertNotCalled()
+        args, _ = handle.ui.writeTable._mock.popCall()
+        rows = iter(args[0])
+        self.assertEquals(rows.next(), ('t0', 'Alice'))
+        self.assertEquals(sorted(c[0] for c in rb.getResource._mock.calls),
+            [('http://localhost/users/1',), ('http://localhost/users/2',)])
+        del rb.getResource._mock.calls[:]
+        self.assertEquals(list(rows), [('t1', 'Bob'), ('t2', 'Alice')])
+        rb.getResource._mock.assertNotCalled()
+
+        # the rest of the listing is not read past --limit
+        cmd = ListThingsCommand()
+        cmd._processListOptions({'limit': '1'})
+        cmd._list(handle)
+        args, _ = handle.ui.writeTable._mock.popCall()
+        self.assertEquals(list(args[0]), [('t0', 'Alice')])
+        self.assertEquals(rb.getResource._mock.calls,
+            [(('http://localhost/users/1',), ())])
+
+        # and once across all the resources shown
+        del rb.getResource._mock.calls[:]
+        ListThingsCommand.showFieldMap = ListThingsCommand.listFieldMap
+        for resource in resources:
+            resource.elements = ['name']
+        plugin.show._mock.setReturn(resources[0], 't0')
+        plugin.show._mock.setReturn(resources[2], 't2')
+        plugin.show._mock.setReturn(None, 'none')
+        cmd._show(handle, ['t0', 'none', 't2'])
+        self.assertEquals(rb.getResource._mock.calls,
+            [(('http://localhost/users/1',), ())])
+        shown = [list(c[0][0]) for c in handle.ui.writeTable._mock.calls]
+        self.assertEquals(shown,
+            [[('NAME', 't0'), ('OWNER', 'Alice')],
+             [('NAME', 't2'), ('OWNER', 'Alice')]])
+
+        # links that failed to fetch are left to the accessor
+        handle = mock.MockObject()
+        handle.facade.rbuilder.getResource._mock.raiseErrorOnAccess(
+            errors.RbuildError('not found'))
+        resources[0].owner = Node(full_name='Carol')
+        self.assertEquals(cmd._prefetchLinks(handle, resources[:1],
+            cmd.listFields, cmd.listFieldMap), resources[:1])
+
+
 class CommandWithSubCommands(rbuildhelp.RbuildHelper):
     def genCommand(self):
         class MyCommand(command.CommandWithSubCommands):
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+
+import os
+import time
+
+from rbuild_test import rbuildhelp
+
+from rbuild.lib import diskcache
+
+
+class DiskCacheTest(rbuildhelp.RbuildHelper):
+
+    def testSetGet(self):
+        cache = diskcache.DiskCache(self.workDir + '/cache')
+        key = ('rbuilder', 'http://localhost', 'platforms')
+        self.assertEquals(cache.get(key), None)
+
+        cache.set(key, diskcache.CacheEntry(['<platforms/>'], etag='"1"',
+                                            lastModified='yesterday'))
+        entry = cache.get(key)
+        self.assertEquals(entry.data, ['<platforms/>'])
+        self.assertEquals(entry.etag, '"1"')
+        self.assertEquals(entry.getValidationHeaders(), {
+            'If-None-Match': '"1"', 'If-Modified-Since': 'yesterday'})
+        self.failUnless(entry.isFresh(60))
+        self.failIf(entry.isFresh(0))
+
+        self.assertEquals(cache.get(('rbuilder', 'http://other',
+                                     'platforms')), None)
+
+        cache.invalidate(key)
+        self.assertEquals(cache.get(key), None)
+        # invalidating a missing entry is harmless
+        cache.invalidate(key)
+
+    def testTouch(self):
+        cache = diskcache.DiskCache(self.workDir + '/cache')
+        key = ('conaryrc',)
+        entry = diskcache.CacheEntry('data', fetched=time.time() - 120)
+        self.failIf(entry.isFresh(60))
+        cache.touch(key, entry)
+        self.failUnless(cache.get(key).isFresh(60))
+
+    def testCorruptEntry(self):
+        cache = diskcache.DiskCache(self.workDir + '/cache')
+        key = ('conaryrc',)
+        cache.set(key, diskcache.CacheEntry('data'))
+        self.writeFile(cache._getPath(key), 'garbage')
+        self.assertEquals(cache.get(key), None)
+
+    def testUnwritableCache(self):
+        self.writeFile(self.workDir + '/cache', '')
+        cache = diskcache.DiskCache(self.workDir + '/cache')
+        cache.set(('conaryrc',), diskcache.CacheEntry('data'))
+        self.assertEquals(cache.get(('conaryrc',)), None)
+        self.failUnless(os.path.isfile(self.workDir + '/cache'))
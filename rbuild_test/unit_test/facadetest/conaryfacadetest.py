@@ -24,8 +24,10 @@ unit tests for conary facade
 from rbuild_test import rbuildhelp
 from testutils import mock
 import os
+import time
 
 from rbuild.facade import conaryfacade
+from rbuild.lib import diskcache
 from rbuild import errors
 
 from conary import conarycfg
@@ -74,6 +76,13 @@ def mockedFunction(real, saveList, fakeReturn, *args, **kwargs):
     else:
         return fakeReturn
 
+def mockLabelIndexConfig(client, user='jdoe'):
+    cfg = mock.MockObject(
+        repositoryMap={'localhost': 'https://localhost/conary/'})
+    cfg.user.find._mock.setDefaultReturn((user, 'secret'))
+    client._mock.set(cfg=cfg)
+    return cfg
+
 class MockConfig(object):
     def __init__(self, serverUrl=None):
         self.serverUrl = serverUrl
@@ -84,8 +93,11 @@ class MockConfig(object):
         self.contact = None
         self.signatureKey = None
         self.signatureKeyMap = {}
+        self.readObjects = []
     def includeConfigFile(self, path):
         self.includedConfigFile = path
+    def readObject(self, path, fileObj):
+        self.readObjects.append((path, fileObj.read()))
 
 class MockHandle(object):
     def __init__(self, serverUrl=None):
@@ -161,15 +173,109 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
 
     def testParseRBuilderConfigFile(self):
         handle, facade = self.prep()
+        mock.mockMethod(facade._getRBuilderConfig)
         cfg = MockConfig()
         facade._parseRBuilderConfigFile(cfg)
         assert cfg.includedConfigFile is None
+        facade._getRBuilderConfig._mock.assertNotCalled()
 
         handle._setServerUrl('http://conary.example.com')
         handle._cfg = None # cached config is now wrong, must regenerate
         facade._parseRBuilderConfigFile(cfg)
         assert cfg.includedConfigFile == 'http://conary.example.com/conaryrc'
 
+        # a fetched copy is read without conary fetching it again
+        cfg = MockConfig()
+        facade._getRBuilderConfig._mock.setDefaultReturn('name foo\n')
+        facade._parseRBuilderConfigFile(cfg)
+        assert cfg.includedConfigFile is None
+        self.assertEquals(cfg.readObjects,
+            [('http://conary.example.com/conaryrc', 'name foo\n')])
+
+    def testGetRBuilderConfig(self):
+        _, facade = self.prep()
+        url = 'http://conary.example.com/conaryrc'
+        cfg = mock.MockObject()
+        self.mock(conaryfacade, 'CONFIG_CACHE_DIR', self.workDir + '/cache')
+
+        class Response(object):
+            def __init__(self, contents):
+                self.contents = contents
+                self.headers = {'ETag': '"1"'}
+            def read(self):
+                return self.contents
+            def close(self):
+                pass
+
+        class ResponseError(Exception):
+            def __init__(self, errcode):
+                Exception.__init__(self, errcode)
+                self.errcode = errcode
+
+        requests = []
+        def openUrl(url, cfg, headers):
+            requests.append((url, cfg, headers))
+            return response
+        response = Response('name foo\n')
+        self.mock(conaryfacade.ConaryFacade, '_openRBuilderConfig',
+            staticmethod(openUrl))
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), 'name foo\n')
+        self.assertEquals(requests, [(url, cfg, {})])
+        # later configurations in this process share the fetch
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), 'name foo\n')
+        self.assertEquals(len(requests), 1)
+
+        # other processes use the cached copy while it is fresh
+        facade = self.getFacade(self.getMockedHandle())
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), 'name foo\n')
+        self.assertEquals(len(requests), 1)
+
+        # and revalidate it afterwards
+        def notModified(url, cfg, headers):
+            requests.append((url, cfg, headers))
+            raise ResponseError(304)
+        self.mock(conaryfacade.ConaryFacade, '_openRBuilderConfig',
+            staticmethod(notModified))
+        facade = self.getFacade(self.getMockedHandle())
+        facade.rbuilderConfigTTL = 0
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), 'name foo\n')
+        self.assertEquals(requests[-1][2], {'If-None-Match': '"1"'})
+
+        # a stale copy is used when the server cannot be reached
+        def unreachable(url, cfg, headers):
+            raise IOError('no route to host')
+        self.mock(conaryfacade.ConaryFacade, '_openRBuilderConfig',
+            staticmethod(unreachable))
+        facade = self.getFacade(self.getMockedHandle())
+        facade.rbuilderConfigTTL = 0
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), 'name foo\n')
+        facade = self.getFacade(self.getMockedHandle())
+        self.assertEquals(facade._getRBuilderConfig(url + '.other', cfg),
+            None)
+
+        # but not when the server reports an error
+        def forbidden(url, cfg, headers):
+            raise ResponseError(403)
+        self.mock(conaryfacade.ConaryFacade, '_openRBuilderConfig',
+            staticmethod(forbidden))
+        facade = self.getFacade(self.getMockedHandle())
+        facade.rbuilderConfigTTL = 0
+        self.assertEquals(facade._getRBuilderConfig(url, cfg), None)
+
+    def testOpenRBuilderConfig(self):
+        url = 'http://conary.example.com/conaryrc'
+        cfg = mock.MockObject()
+        cfg.getProxyMap._mock.setDefaultReturn('proxyMap')
+        opener = mock.MockObject()
+        opener.open._mock.setDefaultReturn('response')
+        mock.mock(conaryfacade.transport, 'URLOpener', opener)
+        self.assertEquals(conaryfacade.ConaryFacade._openRBuilderConfig(
+            url, cfg, {'If-None-Match': '"1"'}), 'response')
+        conaryfacade.transport.URLOpener._mock.assertCalled(
+            proxyMap='proxyMap')
+        opener.open._mock.assertCalled(url,
+            headers=[('If-None-Match', '"1"')])
+
     def xtestParseRBuilderConfigFile(self):
         handle, facade = self.prep()
         cfg = MockConfig()
@@ -192,6 +298,26 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         facade._getConaryClient()
         self.assertEquals(savedArgs, [(('c',), {})])
 
+    def testGetConaryClientCached(self):
+        _, facade = self.prep()
+        mock.mock(facade, 'getConaryConfig')
+        facade.getConaryConfig._mock.setDefaultReturn('c')
+        mock.mock(conaryclient, 'ConaryClient')
+        client = facade._getConaryClient()
+        self.assertEquals(facade._getConaryClient(), client)
+        conaryclient.ConaryClient._mock.assertCalled('c')
+        conaryclient.ConaryClient._mock.assertNotCalled()
+
+        # a different configuration gets a new client
+        facade.getConaryConfig._mock.setDefaultReturn('d')
+        facade._getConaryClient()
+        conaryclient.ConaryClient._mock.assertCalled('d')
+
+        facade.clearCachedConfig()
+        self.assertEquals(facade._conaryClient, None)
+        facade._getConaryClient()
+        conaryclient.ConaryClient._mock.assertCalled('d')
+
     def testGetRepositoryClient(self):
         _, facade = self.prep()
         mock.mock(facade, '_getConaryClient')
@@ -632,6 +758,51 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         output = facade._getRepositoryVersions('.')
         self.assertEquals(output, [])
 
+    def testGetNewerRepositoryVersionsForDirectories(self):
+        _, facade = self.prep()
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        states = {}
+        for dirName, name, ver in (
+                ('foo', 'foo:source', '/a@b:devel/1.0-1'),
+                ('bar', 'bar:source', '/a@b:devel/1.0-2'),
+                ('qa/foo', 'foo:source', '/a@b:qa/1.0-1')):
+            ver = VFS(ver)
+            sourceState = mock.MockObject()
+            sourceState.getName._mock.setDefaultReturn(name)
+            sourceState.getBranch._mock.setDefaultReturn(ver.branch())
+            sourceState.getVersion._mock.setDefaultReturn(ver)
+            states[dirName + '/CONARY'] = sourceState
+        def ConaryStateFromFile(path, repos):
+            conaryState = mock.MockObject()
+            conaryState.getSourceState._mock.setDefaultReturn(states[path])
+            return conaryState
+        self.mock(state, 'ConaryStateFromFile', ConaryStateFromFile)
+
+        fooDevel = [VFS('/a@b:devel/1.0-%d' % x) for x in (1, 2, 3)]
+        fooQa = [VFS('/a@b:qa/1.0-1')]
+        barDevel = [VFS('/a@b:devel/1.0-2')]
+        repos.getTroveVersionsByBranch._mock.setDefaultReturn({
+            'foo:source': dict.fromkeys(fooDevel + fooQa),
+            'bar:source': dict.fromkeys(barDevel)})
+        output = facade.getNewerRepositoryVersionsForDirectories(
+            ['foo', 'bar', 'qa/foo'])
+        self.assertEquals(output, {
+            'foo': [fooDevel[2], fooDevel[1]],
+            'bar': [],
+            'qa/foo': []})
+        # one query covers every checkout
+        query = repos.getTroveVersionsByBranch._mock.popCall()[0][0]
+        repos.getTroveVersionsByBranch._mock.assertNotCalled()
+        self.assertEquals(query, {
+            'foo:source': {fooDevel[0].branch(): None,
+                           fooQa[0].branch(): None},
+            'bar:source': {barDevel[0].branch(): None}})
+
+        self.assertEquals(
+            facade.getNewerRepositoryVersionsForDirectories([]), {})
+        repos.getTroveVersionsByBranch._mock.assertNotCalled()
+
     def testGetRepositoryStateFromDirectory(self):
         _, facade = self.prep()
         repos = mock.MockObject()
@@ -879,6 +1050,46 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
                                             self.workDir + '/foo.recipe')
         self.assertEquals(result, 'recipe')
 
+    def testLoadRecipeAttributesFromCheckouts(self):
+        _, facade = self.prep()
+        mock.mockMethod(facade._getRepositoryClient)
+        mock.mockMethod(facade._initializeFlavors)
+        class Recipe(object):
+            buildRequires = ['foo:devel']
+        def loadRecipeClass(recipePath):
+            if recipePath.endswith('bad.recipe'):
+                raise RuntimeError('bad recipe: ' + recipePath)
+            return Recipe
+        self.mock(facade, '_loadRecipeClassFromCheckout', loadRecipeClass)
+
+        # a single recipe is loaded in this process
+        self.mock(conaryfacade, '_getRecipeLoaderCount', lambda: 4)
+        self.assertEquals(facade.loadRecipeAttributesFromCheckouts(
+            ['a.recipe'], ['buildRequires']),
+            {'a.recipe': {'buildRequires': ['foo:devel']}})
+        facade._getRepositoryClient._mock.assertNotCalled()
+
+        # several are loaded by worker processes
+        self.assertEquals(facade.loadRecipeAttributesFromCheckouts(
+            ['a.recipe', 'b.recipe', 'a.recipe'], ['buildRequires']),
+            {'a.recipe': {'buildRequires': ['foo:devel']},
+             'b.recipe': {'buildRequires': ['foo:devel']}})
+        facade._initializeFlavors._mock.assertCalled()
+        # which open their own repository connections
+        facade._getRepositoryClient._mock.assertNotCalled()
+        self.mock(conaryfacade, '_recipeLoader', None)
+        worker = mock.MockObject()
+        conaryfacade._initRecipeLoader(worker, ['buildRequires'])
+        worker.clearCachedClient._mock.assertCalled()
+        self.assertEquals(conaryfacade._recipeLoader,
+                          (worker, ['buildRequires']))
+
+        # errors are raised in the calling process
+        err = self.assertRaises(RuntimeError,
+            facade.loadRecipeAttributesFromCheckouts,
+            ['a.recipe', 'bad.recipe'], ['buildRequires'])
+        self.assertEquals(str(err), 'bad recipe: bad.recipe')
+
 
 
     def testRemoveNonRecipeFilesFromCheckout(self):
@@ -983,44 +1194,213 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
 
     def testLatestPackages(self):
         _, facade = self.prep()
+        self.mock(conaryfacade, 'CONFIG_CACHE_DIR', self.workDir + '/cache')
         client = mock.MockObject()
+        mockLabelIndexConfig(client)
         mock.mockMethod(facade._getConaryClient, client)
+        foover = versions.ThawVersion('/localhost@rpl:devel/1.0:1.0-1-1')
+        barver = versions.ThawVersion('/localhost@rpl:devel/2.0:2.0-1-1')
+        bazver = versions.ThawVersion('/localhost@rpl:devel/3.0:3.0-1-1')
+        flav1, flav2, flav3, flav4 = [Flavor(x) for x in
+            ('is: x86', 'is: x86_64', 'ssl is: x86', '!ssl is: x86')]
         client.getRepos().getTroveLatestByLabel._mock.setReturn(
-            {'foo': {'foover': ['flav1', 'flav2']},
-             'foo:runtime': {'foover': ['flav1', 'flav2']},
-             'bar': {'barver': ['flav3']},
-             'group-baz': {'bazver': ['flav4']},
+            {'foo': {foover: [flav1, flav2]},
+             'foo:runtime': {foover: [flav1, flav2]},
+             'bar': {barver: [flav3]},
+             'group-baz': {bazver: [flav4]},
              },
             {None: {versions.Label('localhost@rpl:devel'): [None]}})
+        client.getRepos().getNewTroveList._mock.setDefaultReturn([])
 
         # Defaults
         packages = facade.getLatestPackagesOnLabel('localhost@rpl:devel')
-        self.failUnlessEqual(sorted(packages), [
-            ('bar', 'barver', 'flav3'),
-            ('foo', 'foover', 'flav1'),
-            ('foo', 'foover', 'flav2'),
-          ])
+        self.failUnlessEqual(sorted(packages), sorted([
+            ('bar', barver, flav3),
+            ('foo', foover, flav1),
+            ('foo', foover, flav2),
+          ]))
 
         # With components
         packages = facade.getLatestPackagesOnLabel('localhost@rpl:devel',
             keepComponents=True)
-        self.failUnlessEqual(sorted(packages), [
-            ('bar', 'barver', 'flav3'),
-            ('foo', 'foover', 'flav1'),
-            ('foo', 'foover', 'flav2'),
-            ('foo:runtime', 'foover', 'flav1'),
-            ('foo:runtime', 'foover', 'flav2'),
-          ])
+        self.failUnlessEqual(sorted(packages), sorted([
+            ('bar', barver, flav3),
+            ('foo', foover, flav1),
+            ('foo', foover, flav2),
+            ('foo:runtime', foover, flav1),
+            ('foo:runtime', foover, flav2),
+          ]))
 
         # With groups
         packages = facade.getLatestPackagesOnLabel('localhost@rpl:devel',
             keepGroups=True)
-        self.failUnlessEqual(sorted(packages), [
-            ('bar', 'barver', 'flav3'),
-            ('foo', 'foover', 'flav1'),
-            ('foo', 'foover', 'flav2'),
-            ('group-baz', 'bazver', 'flav4'),
-          ])
+        self.failUnlessEqual(sorted(packages), sorted([
+            ('bar', barver, flav3),
+            ('foo', foover, flav1),
+            ('foo', foover, flav2),
+            ('group-baz', bazver, flav4),
+          ]))
+
+    def testLatestPackagesIndex(self):
+        _, facade = self.prep()
+        self.mock(conaryfacade, 'CONFIG_CACHE_DIR', self.workDir + '/cache')
+        client = mock.MockObject(stableReturnValues=True)
+        mockLabelIndexConfig(client)
+        mock.mockMethod(facade._getConaryClient, client)
+        repos = client.getRepos()
+        label = versions.Label('localhost@rpl:devel')
+        query = {None: {label: [None]}}
+        foo1 = versions.ThawVersion('/localhost@rpl:devel/1.0:1.0-1-1')
+        foo2 = versions.ThawVersion('/localhost@rpl:devel/5.0:1.0-2-1')
+        other = versions.ThawVersion('/localhost@rpl:other/6.0:1.0-1-1')
+        x86, x86_64 = Flavor('is: x86'), Flavor('is: x86_64')
+        repos.getTroveLatestByLabel._mock.setReturn({'foo': {foo1: [x86]}},
+                                                     query)
+
+        # the first query lists the whole label
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo1: [x86]}})
+        repos.getTroveLatestByLabel._mock.assertCalled(query)
+        repos.getNewTroveList._mock.assertNotCalled()
+
+        # later ones only ask for what changed since
+        repos.getNewTroveList._mock.setDefaultReturn([
+            (10, ('foo', foo2, x86), 0),
+            (11, ('foo', foo2, x86_64), 0),
+            (12, ('foo', other, x86), 0),
+            (12, ('bar', foo1, x86), 0),
+            ])
+        repos.getNewTroveList._mock.setReturn([], 'localhost', 12)
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo2: [x86, x86_64]}, 'bar': {foo1: [x86]}})
+        repos.getTroveLatestByLabel._mock.assertNotCalled()
+        self.assertEquals(repos.getNewTroveList._mock.popCall()[0],
+                          ('localhost', 12))
+
+        # starting from the last mark
+        del repos.getNewTroveList._mock.calls[:]
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo2: [x86, x86_64]}, 'bar': {foo1: [x86]}})
+        self.assertEquals(repos.getNewTroveList._mock.popCall()[0],
+                          ('localhost', 12))
+        repos.getNewTroveList._mock.assertNotCalled()
+
+        # removed troves need the whole label again
+        repos.getNewTroveList._mock.setReturn(
+            [(13, ('foo', foo2, x86), 2)], 'localhost', 12)
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo1: [x86]}})
+        repos.getTroveLatestByLabel._mock.assertCalled(query)
+
+        # as do repositories that will not list new troves
+        def getNewTroveList(host, mark):
+            raise conaryerrors.ConaryError('permission denied')
+        self.mock(repos, 'getNewTroveList', getNewTroveList)
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo1: [x86]}})
+        repos.getTroveLatestByLabel._mock.assertCalled(query)
+        self.mock(repos, 'getNewTroveList', None)
+        self.assertEquals(facade._getLatestTrovesOnLabel(label),
+                          {'foo': {foo1: [x86]}})
+        repos.getTroveLatestByLabel._mock.assertCalled(query)
+
+    def testLatestPackagesIndexMatchesFullQuery(self):
+        _, facade = self.prep()
+        self.mock(conaryfacade, 'CONFIG_CACHE_DIR', self.workDir + '/cache')
+        label = versions.Label('localhost@rpl:devel')
+        x86, x86_64 = Flavor('is: x86'), Flavor('is: x86_64')
+
+        class Repository(object):
+            # keeps the latest version of each flavor of each trove
+            def __init__(self):
+                self.log = []
+                self.fullQueries = 0
+            def commit(self, mark, name, version, flavor, troveType=0):
+                self.log.append((mark, (name, versions.ThawVersion(version),
+                                        flavor), troveType))
+            def getNewTroveList(self, host, mark):
+                return [x for x in self.log if x[0] >= mark]
+            def getTroveLatestByLabel(self, query):
+                self.fullQueries += 1
+                return self.getLatest()
+            def getLatest(self):
+                latest = {}
+                for _, (name, version, flavor), _ in self.log:
+                    if version.trailingLabel() != label:
+                        continue
+                    old = latest.get((name, flavor))
+                    if (old is None or conaryfacade._getTimestamp(old)
+                            < conaryfacade._getTimestamp(version)):
+                        latest[name, flavor] = version
+                result = {}
+                for (name, flavor), version in latest.items():
+                    result.setdefault(name, {}).setdefault(version,
+                                                           []).append(flavor)
+                return result
+
+        def normalize(index):
+            return dict((name, dict((x[0], set(x[1]))
+                                    for x in versionDict.items()))
+                        for name, versionDict in index.items())
+
+        repos = Repository()
+        client = mock.MockObject()
+        client.getRepos._mock.setDefaultReturn(repos)
+        mockLabelIndexConfig(client)
+        mock.mockMethod(facade._getConaryClient, client)
+        stored = []
+        setEntry = diskcache.DiskCache.set
+        def countingSet(cache, key, entry):
+            stored.append(key[-1])
+            return setEntry(cache, key, entry)
+        self.mock(diskcache.DiskCache, 'set', countingSet)
+
+        repos.commit(1, 'foo', '/localhost@rpl:devel/1.0:1.0-1-1', x86)
+        repos.commit(1, 'foo', '/localhost@rpl:devel/1.0:1.0-1-1', x86_64)
+        repos.commit(1, 'bar', '/localhost@rpl:devel/1.0:1.0-1-1', x86)
+        facade._getLatestTrovesOnLabel(label)
+        self.assertEquals(repos.fullQueries, 1)
+
+        # each refresh gives the same answer as querying the whole label;
+        # the index itself (keyed last by user) is only stored again when
+        # it changed, otherwise only its new mark is
+        now = long(time.time())
+        steps = [
+            # one flavor moves on, the other stays behind
+            ([(now + 1, 'foo', '/localhost@rpl:devel/2.0:1.0-2-1', x86),
+              (now + 1, 'baz', '/localhost@rpl:devel/2.0:1.0-1-1', x86)],
+             ['jdoe']),
+            # other labels are not part of the index
+            ([(now + 2, 'bar', '/localhost@rpl:other/3.0:1.0-1-1', x86)],
+             ['mark']),
+            # neither are versions older than the latest one
+            ([(now + 3, 'bar', '/localhost@rpl:devel/0.5:0.5-1-1', x86),
+              (now + 3, 'foo', '/localhost@rpl:devel/3.0:1.0-3-1', x86_64)],
+             ['jdoe']),
+            # nothing new
+            ([], []),
+            ]
+        for commits, expectedStored in steps:
+            for commit in commits:
+                repos.commit(*commit)
+            del stored[:]
+            incremental = normalize(facade._getLatestTrovesOnLabel(label))
+            self.assertEquals(incremental, normalize(repos.getLatest()))
+            self.assertEquals(stored, expectedStored)
+        self.assertEquals(repos.fullQueries, 1)
+        self.assertEquals(incremental['foo'], {
+            versions.ThawVersion('/localhost@rpl:devel/2.0:1.0-2-1'):
+                set([x86]),
+            versions.ThawVersion('/localhost@rpl:devel/3.0:1.0-3-1'):
+                set([x86_64])})
+
+        # other users and servers get an index of their own
+        mockLabelIndexConfig(client, user='other')
+        facade._getLatestTrovesOnLabel(label)
+        self.assertEquals(repos.fullQueries, 2)
+        client.cfg.repositoryMap['localhost'] = 'https://mirror/conary/'
+        facade._getLatestTrovesOnLabel(label)
+        self.assertEquals(repos.fullQueries, 3)
 
     def testFlavorNames(self):
         handle, facade = self.prep()
@@ -1073,6 +1453,39 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         self.assertEquals(facade.getAllLabelsFromTroves(specs),
                 set(['foo@foo:foo', 'foo@foo:foo-bar', 'foo@foo:foo-baz']))
 
+    def testGetGroupBuildRequirements(self):
+        _, facade = self.prep()
+        groupTups = [('group-dist', '/foo@foo:foo/1-1-1', 'is: x86')]
+        group = mock.MockObject()
+        group.iterTroveList._mock.setReturn([
+            ('foo', '/foo@foo:foo/1-1-1', 'is: x86'),
+            ('foo:runtime', '/foo@foo:foo/1-1-1', 'is: x86'),
+            ('foo-doc', '/foo@foo:foo/1-1-1', ''),
+            ('group-core', '/foo@foo:foo/1-1-1', 'is: x86'),
+            ('bar', '/foo@foo:foo/2-1-1', 'is: x86')],
+            strongRefs=True, weakRefs=True)
+        packageTups = [('bar', '/foo@foo:foo/2-1-1', 'is: x86'),
+                       ('foo', '/foo@foo:foo/1-1-1', 'is: x86'),
+                       ('foo-doc', '/foo@foo:foo/1-1-1', '')]
+        packages = [mock.MockObject() for x in packageTups]
+        packages[0].getSourceName._mock.setReturn('bar:source')
+        packages[0].getBuildRequirements._mock.setReturn(
+            [('foo:devel', '/foo@foo:foo/1-1-1', 'is: x86')])
+        for package in packages[1:]:
+            package.getSourceName._mock.setReturn('foo:source')
+        packages[1].getBuildRequirements._mock.setReturn(
+            [('glibc:devel', '/foo@foo:foo/1-1-1', 'is: x86')])
+        packages[2].getBuildRequirements._mock.setReturn(
+            [('doxygen:runtime', '/foo@foo:foo/1-1-1', 'is: x86')])
+
+        mock.mock(facade, '_getRepositoryClient')
+        repos = facade._getRepositoryClient()
+        repos.getTroves._mock.setReturn([group], groupTups, withFiles=False)
+        repos.getTroves._mock.setReturn(packages, packageTups,
+                                        withFiles=False)
+        self.assertEquals(facade.getGroupBuildRequirements(groupTups),
+            {'foo': set(['glibc', 'doxygen']), 'bar': set(['foo'])})
+
 
 class QuietUpdateTest(rbuildhelp.RbuildHelper):
     def testQuietUpdateCallback(self):
@@ -20,6 +20,7 @@
 unit tests for rmake facade
 '''
 
+import itertools
 import os
 import robj
 import socket
@@ -32,6 +33,7 @@ from StringIO import StringIO
 from rbuild import errors
 from rbuild import facade as fac_mod
 from rbuild.facade import rbuilderfacade
+from rbuild.lib import diskcache
 from rbuild_test import rbuildhelp
 from testutils import mock
 from xobj import xobj
@@ -105,6 +107,31 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
         rbuilderfacade.RbuilderRESTClient._mock.assertCalled(
             'http://localhost', 'foo', 'bar', facade._handle)
 
+    def test_getRbuilderRESTClientShared(self):
+        handle, facade = self.prep()
+        mock.mock(rbuilderfacade, 'RbuilderRESTClient')
+        client = facade._getRbuilderRESTClient()
+        self.assertTrue(facade._getRbuilderRESTClient() is client)
+        self.assertEquals(
+            len(rbuilderfacade.RbuilderRESTClient._mock.calls), 1)
+
+        # a different server or user gets a new session
+        handle.getConfig()._mock.set(user=('baz', 'bar'))
+        facade._getRbuilderRESTClient()
+        client.close._mock.assertCalled()
+        self.assertEquals(
+            len(rbuilderfacade.RbuilderRESTClient._mock.calls), 2)
+
+    def testClose(self):
+        _, facade = self.prep()
+        mock.mock(rbuilderfacade, 'RbuilderRESTClient')
+        client = facade._getRbuilderRESTClient()
+        facade.close()
+        client.close._mock.assertCalled()
+        self.assertEquals(facade._restClient, None)
+        # closing twice is harmless
+        facade.close()
+
     def test_getBaseServerUrl(self):
         _, facade = self.prep()
         rbcfg = mock.MockObject()
@@ -223,9 +250,9 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
 
     def testWatchImages(self):
         _, facade = self.prep()
-        mock.mockMethod(facade._getRbuilderRPCClient)
+        mock.mockMethod(facade._getRbuilderRESTClient)
         facade.watchImages([1])
-        facade._getRbuilderRPCClient().watchImages._mock.assertCalled([1], interval=5, quiet=False, timeout=0)
+        facade._getRbuilderRESTClient().watchImages._mock.assertCalled([1], interval=5, quiet=False, timeout=0)
 
     def testGetBuildFiles(self):
         _, facade = self.prep()
@@ -372,6 +399,14 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
         facade._getRbuilderRESTClient().getProject._mock.setReturn('project', 'shortname')
         self.assertEqual(facade.getProject('shortname'), 'project')
 
+    def testGetResource(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        facade._getRbuilderRESTClient().getResource._mock.setReturn(
+            'resource', 'http://localhost/api/v1/users/1')
+        self.assertEqual(
+            facade.getResource('http://localhost/api/v1/users/1'), 'resource')
+
     def testListPlatforms(self):
         handle, facade = self.prep()
         mock.mockMethod(facade._getRbuilderRESTClient)
@@ -421,17 +456,59 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
             ['foo', 'bar'])
         self.assertEqual(facade.getTargets(), ['foo', 'bar'])
 
+    def testGetImageType(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        client = facade._getRbuilderRESTClient()
+        client.getImageType._mock.setReturn('ami', 'ami')
+        client.listImageTypes._mock.setReturn(['summary'])
+        self.assertEqual(facade.getImageType('ami'), 'ami')
+        self.assertEqual(facade.listImageTypes(), ['summary'])
+
+    def testGetTargetType(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        client = facade._getRbuilderRESTClient()
+        client.getTargetType._mock.setReturn('ec2', 'ec2')
+        client.listTargetTypes._mock.setReturn(['summary'])
+        self.assertEqual(facade.getTargetType('ec2'), 'ec2')
+        self.assertEqual(facade.listTargetTypes(), ['summary'])
+
     def testGetPlatform(self):
         handle, facade = self.prep()
         mock.mockMethod(facade._getRbuilderRESTClient)
-        _platform1 = mock.MockObject()
-        _platform1._mock.set(label='label1')
-        _platform2 = mock.MockObject()
-        _platform2._mock.set(label='label2')
-        facade._getRbuilderRESTClient().api._mock.set(
-            platforms=[_platform1, _platform2])
-        self.assertEqual(facade.getPlatform('label2'), _platform2)
-        self.assertEqual(facade.getPlatform('no label'), None)
+        facade._getRbuilderRESTClient().getPlatform._mock.setReturn(
+            'platform', 'label2')
+        self.assertEqual(facade.getPlatform('label2'), 'platform')
+
+    def testGetPlatforms(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        facade._getRbuilderRESTClient().getPlatforms._mock.setReturn(
+            ['platform'])
+        self.assertEqual(facade.getPlatforms(), ['platform'])
+
+    def testSetUseCache(self):
+        _, facade = self.prep()
+        mock.mock(rbuilderfacade, 'RbuilderRESTClient')
+        cache = diskcache.DiskCache(self.workDir + '/.rbuild/cache')
+        mock.mockMethod(facade._handle.productStore.getCache, cache)
+        client = facade._getRbuilderRESTClient()
+        self.assertEqual(client.responseCache, cache)
+
+        facade.setUseCache(False)
+        self.assertEqual(client.responseCache, None)
+        facade.close()
+        self.assertEqual(facade._getRbuilderRESTClient().responseCache, None)
+
+    def testSetPageSize(self):
+        _, facade = self.prep()
+        mock.mock(rbuilderfacade, 'RbuilderRESTClient')
+        facade.setPageSize(10)
+        client = facade._getRbuilderRESTClient()
+        self.assertEqual(client.pageSize, 10)
+        facade.setPageSize(None)
+        self.assertEqual(client.pageSize, None)
 
     def testGetProjectBranches(self):
         handle, facade = self.prep()
@@ -737,7 +814,7 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
         client.watchImages([1, 2])
         client._handle.ui.info._mock.assertNotCalled()
         client._handle.ui.warning._mock.assertNotCalled()
-        client._handle.ui.error._mock.assertNotCalled()
+        client._handle.ui.writeError._mock.assertNotCalled()
         self.assertEquals(
             [x[0][0]%x[0][1:] for x in client._handle.ui.write._mock.calls],
             ['1: Waiting "foo"',
@@ -771,7 +848,7 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
         client.watchImages([1, 2])
         client._handle.ui.info._mock.assertNotCalled()
         client._handle.ui.warning._mock.assertNotCalled()
-        client._handle.ui.error._mock.assertNotCalled()
+        client._handle.ui.writeError._mock.assertNotCalled()
         self.assertEquals(
             [x[0][0]%x[0][1:] for x in client._handle.ui.write._mock.calls],
             ['qux 1: Waiting "foo"',
@@ -820,8 +897,9 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
              "    Last status: Build 2 ended with 'Built' status: bam",
              'Finished builds:'])
         self.assertEquals(
-            [x[0][0]%x[0][1:] for x in client._handle.ui.error._mock.calls],
-            ['Timed out while waiting for build status to change (30 seconds)'])
+            [x[0][0]%x[0][1:] for x in client._handle.ui.warning._mock.calls],
+            ['Timed out while waiting for build status to change (30 seconds)',
+             'Unfinished builds:'])
 
     def testGetBuildFiles(self):
         client = self._getClient()
@@ -948,7 +1026,7 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
         client.showImageStatus([1, 2])
         client._handle.ui.info._mock.assertNotCalled()
         client._handle.ui.warning._mock.assertNotCalled()
-        client._handle.ui.error._mock.assertNotCalled()
+        client._handle.ui.writeError._mock.assertNotCalled()
         self.assertEquals(
             [x[0][0]%x[0][1:] for x in client._handle.ui.write._mock.calls],
             ['1: Waiting "foo"',
@@ -1022,6 +1100,18 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         self.failIfEqual(client._api, None)
         self.failUnlessEqual(api, v1)
 
+    def testClose(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        # nothing to close yet
+        client.close()
+
+        mock.mock(client, '_api')
+        api = client._api
+        client.close()
+        api._client._client.close._mock.assertCalled()
+        self.assertEqual(client._api, None)
+
     def testGetGroups(self):
         client = rbuilderfacade.RbuilderRESTClient(
             'http://localhost', 'foo', 'bar', mock.MockObject())
@@ -1061,6 +1151,10 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             '/products/baz/versions/1/imageTypeDefinitions')
         self.assertEqual(
             client.getImageTypeDef('baz', '1', 'foo', 'bar'), _imageTypeDef1)
+        # later lookups in the same session use the index
+        self.assertEqual(
+            client.getImageTypeDef('baz', '1', 'spam', 'eggs'), _imageTypeDef2)
+        self.assertEqual(len(client._api._client.do_GET._mock.calls), 1)
 
         client._api._client.do_GET._mock.raiseErrorOnAccess(
             robj.errors.HTTPNotFoundError(uri=None, status=None, reason=None,
@@ -1101,6 +1195,12 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         client._api._client.do_GET._mock.setReturn(
             [_imageDef2, _imageDef1],
             '/products/baz/versions/1/imageDefinitions')
+        client._api._client.do_GET._mock.setReturn(
+            _imageDef1, '/products/baz/versions/1/imageDefinitions/foo')
+        client._api._client.do_GET._mock.setReturn(
+            [_imageDef2],
+            '/products/baz/versions/1/imageDefinitions'
+                ';filter_by=AND(EQUAL(name,"eggs"))')
 
         self.assertEqual(
             client.getImageDefs('baz', '1'), [_imageDef2, _imageDef1])
@@ -1108,6 +1208,8 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             client.getImageDefs('baz', '1', id='foo'), [_imageDef1])
         self.assertEqual(
             client.getImageDefs('baz', '1', name='eggs'), [_imageDef2])
+        self.assertEqual(
+            client.getImageDefs('baz', '1', id='foo', name='eggs'), [])
 
         client._api._client.do_GET._mock.raiseErrorOnAccess(
             robj.errors.HTTPNotFoundError(uri=None, status=None, reason=None,
@@ -1120,6 +1222,39 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             )
         self.assertIn('not found', str(err))
 
+    def testGetImageDefsUnfiltered(self):
+        # servers without filter support get the whole list filtered here
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', mock.MockObject())
+        mock.mock(client, '_api')
+
+        _imageDef1 = mock.MockObject(id='http://localhost/foo', name='bar')
+        _imageDef2 = mock.MockObject(id='http://localhost/spam', name='eggs')
+        notFound = robj.errors.HTTPNotFoundError(uri=None, status=None,
+                                                 reason=None, response=None)
+        uri = '/products/baz/versions/1/imageDefinitions'
+        def do_GET(path):
+            if path != uri:
+                raise notFound
+            return [_imageDef1, _imageDef2]
+        client._api._client._mock.set(do_GET=do_GET)
+
+        self.assertEqual(
+            client.getImageDefs('baz', '1', id='spam'), [_imageDef2])
+        self.assertEqual(
+            client.getImageDefs('baz', '1', name='bar'), [_imageDef1])
+        self.assertEqual(client.getImageDefs('baz', '1', id='none'), [])
+
+        # some servers reject filters they do not understand
+        def do_GET(path):
+            if path != uri:
+                raise robj.errors.HTTPBadRequestError(uri=None, status=None,
+                    reason=None, response=None)
+            return [_imageDef1, _imageDef2]
+        client._api._client._mock.set(do_GET=do_GET)
+        self.assertEqual(
+            client.getImageDefs('baz', '1', name='eggs'), [_imageDef2])
+
     def testGetProductDefinitionSchemaVersion(self):
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
             'bar', mock.MockObject())
@@ -1199,12 +1334,24 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         self.assertEqual(results, target)
         self.assertTrue(len(_jobs) == 1)
 
+        # running jobs are polled, with a pause between refreshes
+        from rbuild.lib.util import time
+        mock.mock(time, 'sleep')
+        job.job_state._mock.set(name='Running')
+        job._mock.set(status_text='configuring')
+        job._mock.set(refresh=lambda: job.job_state._mock.set(
+            name='Completed'))
+        results = client.configureTarget(target, ddata)
+        self.assertEqual(results, target)
+        time.sleep._mock.assertCalled(1)
+        self.assertTrue(len(_jobs) == 2)
+
         job.job_state._mock.set(name='Failed')
         job._mock.set(status_text='failed for some reason')
         err = self.assertRaises(
             errors.RbuildError, client.configureTarget, target, ddata)
         self.assertEqual('failed for some reason', str(err))
-        self.assertTrue(len(_jobs) == 2)
+        self.assertTrue(len(_jobs) == 3)
 
     def testConfigureTargetCredentials(self):
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
@@ -1336,6 +1483,23 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         err = self.assertRaises(errors.RbuildError, client.getProject, 'bar')
         self.assertIn('not found', str(err))
 
+    def testGetResource(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+                'bar', mock.MockObject())
+        mock.mock(client, '_api')
+
+        client._api._client.do_GET._mock.setReturn('response',
+                'http://localhost/api/v1/users/1')
+        self.assertEqual(client.getResource('http://localhost/api/v1/users/1'),
+                'response')
+
+        client._api._client.do_GET._mock.raiseErrorOnAccess(
+                robj.errors.HTTPNotFoundError(uri=None, status=None,
+                    reason=None, response=None))
+        err = self.assertRaises(errors.RbuildError, client.getResource,
+                'http://localhost/api/v1/users/2')
+        self.assertIn('not found', str(err))
+
     def testGetTargetTypes(self):
         TargetType = namedtuple('TargetType', 'name value')
 
@@ -1433,6 +1597,178 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         results = client.listPlatforms()
         self.assertEqual(results, [Platform('true', 'false', 'false', 'plat1', 'plat@1')])
 
+    def _mockCachedClient(self, documents):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        client.responseCache = diskcache.DiskCache(self.workDir + '/cache')
+        calls = []
+        def _getRaw(path, headers=None):
+            calls.append((path, headers))
+            return documents[path]
+        mock.mock(client, '_getRaw', _getRaw)
+        return client, calls
+
+    def testGetImageDefDescriptorCached(self):
+        path = 'platforms/image_type_definition_descriptors/ami'
+        documents = {path: (mock.MockObject(status=200,
+                                            headers={'ETag': '"v1"'}),
+                            '<descriptor/>')}
+        client, calls = self._mockCachedClient(documents)
+
+        self.assertEqual(client.getImageDefDescriptor('ami'), '<descriptor/>')
+        self.assertEqual(calls, [(path, None)])
+
+        # fresh entries are served without asking the rBuilder
+        del calls[:]
+        self.assertEqual(client.getImageDefDescriptor('ami'), '<descriptor/>')
+        self.assertEqual(calls, [])
+
+        # stale entries are revalidated with the stored ETag
+        mock.mock(client, 'catalogTTLs',
+                  dict(client.catalogTTLs, descriptors=0))
+        documents[path] = (mock.MockObject(status=304), '')
+        self.assertEqual(client.getImageDefDescriptor('ami'), '<descriptor/>')
+        self.assertEqual(calls, [(path, {'If-None-Match': '"v1"'})])
+
+    def testGetPlatformCached(self):
+        client, _ = self._mockCachedClient({})
+        _platform1 = mock.MockObject(label='a@b:c',
+            id='http://localhost/api/v1/platforms/1')
+        _platform2 = mock.MockObject(label='d@e:f',
+            id='http://localhost/api/v1/platforms/2')
+        mock.mockMethod(client.getPlatforms, [_platform1, _platform2])
+        mock.mock(client, '_api')
+        do_GET = client._api._client.do_GET
+        do_GET._mock.setReturn('live2', 'http://localhost/api/v1/platforms/2')
+
+        # platforms are always fetched live, only their URIs are cached
+        self.assertEqual(client.getPlatform('d@e:f'), 'live2')
+        self.assertEqual(client.getPlatform('x@y:z'), None)
+        self.assertEqual(len(client.getPlatforms._mock.calls), 2)
+
+        # a new session reuses the cached index
+        client._platformIndex = None
+        del do_GET._mock.calls[:]
+        self.assertEqual(client.getPlatform('d@e:f'), 'live2')
+        self.assertEqual(len(client.getPlatforms._mock.calls), 2)
+        self.assertEqual(len(do_GET._mock.calls), 1)
+
+        # a label missing from the cached index refreshes it
+        client._platformIndex = None
+        _platform3 = mock.MockObject(label='g@h:i',
+            id='http://localhost/api/v1/platforms/3')
+        client.getPlatforms._mock.setDefaultReturn(
+            [_platform1, _platform2, _platform3])
+        do_GET._mock.setReturn('live3', 'http://localhost/api/v1/platforms/3')
+        self.assertEqual(client.getPlatform('g@h:i'), 'live3')
+        self.assertEqual(len(client.getPlatforms._mock.calls), 3)
+
+    def testGetPlatformIndexed(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        _platform1 = mock.MockObject(label='label1')
+        _platform2 = mock.MockObject(label='label2')
+        mock.mockMethod(client.getPlatforms, [_platform1, _platform2])
+
+        self.assertEqual(client.getPlatform('label2'), _platform2)
+        self.assertEqual(client.getPlatform('label1'), _platform1)
+        self.assertEqual(client.getPlatform('no label'), None)
+        self.assertEqual(len(client.getPlatforms._mock.calls), 1)
+
+        # a new session starts with an empty index
+        client.close()
+        client.getPlatform('label1')
+        self.assertEqual(len(client.getPlatforms._mock.calls), 2)
+
+    def testGetImageTypeCached(self):
+        client, _ = self._mockCachedClient({})
+        ImageType = namedtuple('ImageType', 'id name description')
+        _ami = ImageType('http://localhost/api/v1/image_types/1', 'ami',
+                         'Amazon Machine Image')
+        _vmware = ImageType('http://localhost/api/v1/image_types/2',
+                            'vmware', 'VMware Image')
+        mock.mockMethod(client._getResources)
+        client._getResources._mock.setReturn([_ami, _vmware], 'image_types')
+        mock.mock(client, '_api')
+        do_GET = client._api._client.do_GET
+        do_GET._mock.setReturn('live1', _ami.id)
+
+        # listings are served from plain summaries
+        summaries = client.listImageTypes()
+        self.assertEqual([(x.id, x.name, x.description) for x in summaries],
+                         [tuple(_ami), tuple(_vmware)])
+        self.assertEqual([x.name for x in client.listImageTypes()],
+                         ['ami', 'vmware'])
+        self.assertEqual(len(client._getResources._mock.calls), 1)
+
+        # lookups by name fetch only the resource, live
+        self.assertEqual(client.getImageType('ami'), 'live1')
+        self.assertEqual(len(client._getResources._mock.calls), 1)
+        do_GET._mock.assertCalled(_ami.id)
+
+        # a name missing from the cached index refreshes it once
+        self.assertEqual(client.getImageType('xen'), None)
+        self.assertEqual(len(client._getResources._mock.calls), 2)
+
+    def testGetImageTypeUncached(self):
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', mock.MockObject())
+        _ami = mock.MockObject(name='ami')
+        mock.mockMethod(client._getResources)
+        client._getResources._mock.setReturn([_ami], 'image_types')
+        self.assertEqual(client.getImageType('ami'), _ami)
+        self.assertEqual(client.getImageType('xen'), None)
+
+    def testGetTargetTypeCached(self):
+        client, _ = self._mockCachedClient({})
+        TargetType = namedtuple('TargetType', 'id name description')
+        _ec2 = TargetType('http://localhost/api/v1/target_types/1', 'ec2',
+                          'Amazon EC2')
+        mock.mockMethod(client._getResources)
+        client._getResources._mock.setReturn([_ec2], 'target_types')
+        mock.mock(client, '_api')
+        do_GET = client._api._client.do_GET
+        do_GET._mock.setReturn('live1', _ec2.id)
+
+        self.assertEqual([x.name for x in client.listTargetTypes()], ['ec2'])
+        self.assertEqual(client.getTargetType('ec2'), 'live1')
+        self.assertEqual(len(client._getResources._mock.calls), 1)
+
+        # a stale URI refreshes the index once
+        do_GET._mock.raiseErrorOnAccess(robj.errors.HTTPNotFoundError(
+            uri=None, status=None, reason=None, response=None))
+        self.assertEqual(client.getTargetType('ec2'), None)
+        self.assertEqual(len(client._getResources._mock.calls), 2)
+
+    def testGetImageTypeDefCached(self):
+        client, _ = self._mockCachedClient({})
+        mock.mock(client, '_api')
+        do_GET = client._api._client.do_GET
+
+        _imageTypeDef1 = mock.MockObject(id='http://localhost/defs/1')
+        _imageTypeDef1.container._mock.set(name='foo')
+        _imageTypeDef1.architecture._mock.set(name='bar')
+        _imageTypeDef2 = mock.MockObject(id='http://localhost/defs/2')
+        _imageTypeDef2.container._mock.set(name='spam')
+        _imageTypeDef2.architecture._mock.set(name='eggs')
+        do_GET._mock.setReturn([_imageTypeDef2, _imageTypeDef1],
+                               '/products/baz/versions/1/imageTypeDefinitions')
+        do_GET._mock.setReturn('live1', 'http://localhost/defs/1')
+        do_GET._mock.setReturn('live2', 'http://localhost/defs/2')
+
+        self.assertEqual(client.getImageTypeDef('baz', '1', 'foo', 'bar'),
+                         'live1')
+        # only the definition itself is fetched once the index is cached
+        del do_GET._mock.calls[:]
+        self.assertEqual(client.getImageTypeDef('baz', '1', 'spam', 'eggs'),
+                         'live2')
+        self.assertEqual(do_GET._mock.calls,
+                         [(('http://localhost/defs/2',), ())])
+
+        err = self.assertRaises(errors.RbuildError, client.getImageTypeDef,
+                                'baz', '1', 'none', 'none')
+        self.assertIn("No image type", str(err))
+
     def testGetTarget(self):
         client = rbuilderfacade.RbuilderRESTClient(
             'http://localhost', 'foo', 'bar', mock.MockObject())
@@ -1527,6 +1863,99 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
 
         self.assertEqual(client.getImages('bar'), [])
 
+    def testWatchImages(self):
+        handle = mock.MockObject()
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', handle)
+        mock.mock(time, 'sleep')
+
+        def image(imageId, status, message):
+            return mock.MockObject(image_id=str(imageId), status=str(status),
+                                   status_message=message, name='img')
+        cycles = [
+            [image(1, 100, 'building'), image(2, 0, 'waiting')],
+            [image(1, 100, 'building'), image(2, 0, 'waiting')],
+            [image(1, 100, 'building'), image(2, 0, 'waiting')],
+            [image(1, 300, 'done'), image(2, 100, 'building')],
+            [image(2, 301, 'broken')],
+            ]
+        mock.mockMethod(client._getResources)
+        client._getResources._mock.setReturns(cycles, 'images',
+            image_id=['1', '2'])
+        client._getResources._mock.setReturns(cycles[4:], 'images',
+            image_id=['2'])
+
+        self.assertEqual(client.watchImages([1, 2], interval=5), False)
+        # one request per cycle covers every active build
+        self.assertEqual(len(client._getResources._mock.calls), 5)
+        # back off while nothing changes, snap back once something does
+        self.assertEqual([x[0][0] for x in time.sleep._mock.calls],
+                         [5, 10, 20, 5])
+        self.assertEqual(
+            [x[0][0] % x[0][1:] for x in handle.ui.write._mock.calls],
+            ['img 1: Running "building"',
+             'img 2: Waiting "waiting"',
+             'img 1: Finished "done"',
+             'img 2: Running "building"',
+             'img 2: Failed "broken"',
+             'All jobs completed',
+             'Finished builds:',
+             "    Build 1 ended with 'Finished' status: done",
+             "    Build 2 ended with 'Failed' status: broken"])
+
+    def testWatchImagesTimeout(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', handle)
+        self.now = 1000
+        def now():
+            return self.now
+        def sleep(seconds):
+            self.now += seconds
+        self.mock(time, 'time', now)
+        self.mock(time, 'sleep', sleep)
+        mock.mockMethod(client._getResources)
+        client._getResources._mock.setDefaultReturn([mock.MockObject(
+            image_id='1', status='100', status_message='building',
+            name='img')])
+        self.assertEqual(client.watchImages([1], timeout=30, interval=5),
+                         True)
+        # never sleeps past the timeout
+        self.assertEqual(self.now, 1030)
+        handle.ui.errorStream.write._mock.assertCalled(
+            'warning: Timed out while waiting for build status to change'
+            ' (30 seconds)\n')
+        handle.ui.errorStream.write._mock.assertCalled(
+            'warning: Unfinished builds:\n')
+
+    def testWatchImagesWithoutInFilter(self):
+        handle = mock.MockObject()
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', handle)
+        mock.mock(time, 'sleep')
+        def getResources(resource, image_id):
+            if isinstance(image_id, list):
+                raise robj.errors.HTTPBadRequestError(uri=None, status=None,
+                    reason=None, response=None)
+            if image_id == '1':
+                return [mock.MockObject(image_id='1', status='300',
+                    status_message='done', name='img')]
+            return []
+        self.mock(client, '_getResources', getResources)
+
+        # builds are polled one at a time, and a missing one is final
+        self.assertEqual(client.watchImages([1, 2], interval=5), False)
+        self.assertEqual(client._inFilterSupported, False)
+        self.assertEqual(
+            [x[0][0] % x[0][1:] for x in handle.ui.write._mock.calls],
+            ['img 1: Finished "done"',
+             '2: Not found "Image not found"',
+             'All jobs completed',
+             'Finished builds:',
+             "    Build 1 ended with 'Finished' status: done",
+             "    Build 2 ended with 'Not found' status: Image not found"])
+        time.sleep._mock.assertNotCalled()
+
     def test_getResources(self):
         client = rbuilderfacade.RbuilderRESTClient(
             'http://localhost', 'foo', 'bar', mock.MockObject())
@@ -1572,6 +2001,16 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             'projects_ordered_filtered',
             )
 
+        client._api._client.do_GET._mock.setReturn(
+            'projects_in',
+            "http://localhost/projects"
+                ';filter_by=AND(IN(name,"foo","bar"))',
+            )
+        self.assertEquals(
+            client._getResources('projects', name=['foo', 'bar']),
+            'projects_in',
+            )
+
         self.assertEquals(
             client._getResources('projects', uri='/foo/bar/'),
             'custom_uri',
@@ -1593,3 +2032,38 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         err = self.assertRaises(
             errors.RbuildError, client._getResources, 'projects')
         self.assertIn('Unable to fetch', str(err))
+
+    def test_getResourcesPaged(self):
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', mock.MockObject())
+        mock.mock(client, '_api')
+        client._api._mock.set(_uri='http://localhost')
+        client.pageSize = 2
+
+        class Page(list):
+            _node = 'node'
+        pages = {0: Page(['a', 'b']), 2: ['c', 'd'], 4: ['e']}
+        calls = []
+        def do_GET(uri):
+            calls.append(uri)
+            prefix = 'http://localhost/users;order_by=name;start_index='
+            self.assertTrue(uri.startswith(prefix))
+            start, limit = uri[len(prefix):].split(';limit=')
+            self.assertEqual(limit, '2')
+            return pages[int(start)]
+        client._api._client._mock.set(do_GET=do_GET)
+
+        users = client._getResources('users', order_by='name')
+        self.assertTrue(users)
+        self.assertEqual(users._node, 'node')
+        self.assertEqual(len(calls), 1)
+
+        # pages are fetched as iteration reaches them
+        it = iter(users)
+        self.assertEqual(list(itertools.islice(it, 3)), ['a', 'b', 'c'])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(list(it), ['d', 'e'])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(users), 5)
+        self.assertEqual(users[-1], 'e')
+        self.assertEqual(len(calls), 3)
@@ -34,6 +34,7 @@ from rmake.build import buildcfg
 
 from rbuild.facade import conaryfacade
 from rbuild.facade import rmakefacade
+from rbuild.lib import util
 
 from rbuild import errors as rbuilderrors
 
@@ -257,6 +258,45 @@ class RmakeFacadeTest(rbuildhelp.RbuildHelper):
         self.assertEquals(rmakeCfg6.buildLabel, None)
         self.assertEquals(rmakeCfg6.rmakeUrl, 'unix://var/lib/rmake/socket2')
 
+    def testSharedRmakeConfig(self):
+        handle, facade = self.prep()
+        handle.productStore.getActiveStageName._mock.setReturn('devel')
+        handle.productStore.getGroupFlavors._mock.setReturn([])
+        built = []
+        def buildRmakeConfig(includeContext=True):
+            cfg = buildcfg.BuildConfiguration(False)
+            built.append(cfg)
+            return cfg
+        self.mock(facade, '_buildRmakeConfig', buildRmakeConfig)
+
+        # every cached variant is a copy of one shared config
+        cfg1 = facade._getRmakeConfigWithContexts()[0]
+        cfg2 = facade._getRmakeConfigWithContexts(hasGroups=True)[0]
+        cfg3 = facade._getRmakeConfig()
+        self.assertEquals(len(built), 1)
+        self.assertEquals(len(set([id(built[0]), id(cfg1), id(cfg2),
+                                   id(cfg3)])), 4)
+        cfg1.name = 'changed'
+        self.assertNotEquals(built[0].name, 'changed')
+        self.assertNotEquals(cfg2.name, 'changed')
+
+        # reloading the product definition invalidates them
+        handle.product = mock.MockObject()
+        cfg4 = facade._getRmakeConfigWithContexts()[0]
+        self.assertEquals(len(built), 2)
+        assert(cfg4 is not cfg1)
+        assert(facade._getRmakeConfig() is not cfg3)
+        self.assertEquals(len(built), 2)
+
+        # and so does changing the stage
+        handle.productStore.getActiveStageName._mock.setReturn('qa')
+        facade._getRmakeConfig()
+        self.assertEquals(len(built), 3)
+
+        facade.clearCachedConfig()
+        facade._getRmakeConfig()
+        self.assertEquals(len(built), 4)
+
     def test_getRmakeConfigSearchPathWithLabel(self):
         handle, facade = self.prep()
         handle.productStore.getActiveStageName._mock.setReturn('devel')
@@ -333,6 +373,16 @@ class RmakeFacadeTest(rbuildhelp.RbuildHelper):
         rmakeClient.createBuildJob._mock.assertCalled(['a', 'b', 'c'],
             rebuild=True, recurseGroups='z',
             limitToLabels=['localhost@foo:bar'], buildConfig=buildConfig)
+        facade._getRmakeConfigWithContexts._mock.assertCalled()
+        facade._getRmakeConfigWithContexts._mock.assertCalled(
+            hasGroups=False)
+
+        # recipes loaded by the caller are known by their class name
+        recipeAttributes = {'/src/dist/dist.recipe': {'name': 'group-dist'}}
+        facade.createBuildJobForStage(['/src/dist/dist.recipe[is: x86]{x86}'],
+            recipeAttributes=recipeAttributes)
+        facade._getRmakeConfigWithContexts._mock.assertCalled(
+            hasGroups=True)
 
     def testCreateBuildJobWithLocals(self):
         handle, facade = self.prep()
@@ -415,11 +465,68 @@ class RmakeFacadeTest(rbuildhelp.RbuildHelper):
             '/cny.tv@ns:1/1-1')
 
         # missing troves are an error
+        facade.clearCachedConfig()
         handle.facade.conary._findTroves._mock.setDefaultReturn({})
         self.assertRaises(rbuilderrors.MissingGroupSearchPathElementError,
             facade.createBuildJobForStage, ['a', 'b', 'c'], recurse=False,
             rebuild=False, useLocal=True)
 
+    def testFindGroupSearchPaths(self):
+        handle, facade = self.prep()
+        handle.productStore.getActiveStageName._mock.setDefaultReturn('QA')
+        osTup = ('group-os', 'example.distro@rpl:2', None)
+        devTup = ('group-dev', 'example.devenv@rpl:2', None)
+        found = {osTup: ('group-os', '/example.distro@rpl:2/1-2-3', 'f'),
+                 devTup: ('group-dev', '/example.devenv@rpl:2/5-6-7', 'f')}
+        ilp = [versions.Label('localhost@foo:bar')]
+        x86 = deps.parseFlavor('is: x86')
+        x86_64 = deps.parseFlavor('is: x86_64')
+        cfg1 = mock.MockObject(installLabelPath=ilp, flavor=[x86],
+            resolveTroves=[[devTup]], resolveTroveTups=[[found[devTup]]])
+        cfg2 = mock.MockObject(installLabelPath=ilp, flavor=[x86],
+            resolveTroves=[], resolveTroveTups=[])
+        cfg3 = mock.MockObject(installLabelPath=ilp, flavor=[x86_64],
+            resolveTroves=[], resolveTroveTups=[])
+        cfg4 = mock.MockObject(installLabelPath=ilp, flavor=[x86],
+            resolveTroves=[], resolveTroveTups=[])
+        lookups = []
+        def findTroves(specList, labelPath, flavor, allowMissing=False):
+            lookups.append((specList, flavor))
+            return dict((x, [found[x]]) for x in specList)
+        self.mock(handle.facade.conary, '_findTroves', findTroves)
+        mock.mockMethod(handle.facade.conary._getRepositoryClient)
+        threaded = []
+        def threadedMap(func, items, jobs=1):
+            threaded.append((len(items), jobs))
+            return [func(x) for x in items]
+        self.mock(util, 'threadedMap', threadedMap)
+
+        # configs with the same label path, flavor and resolveTroves share
+        # one lookup, and the lookups run concurrently
+        paths = facade._findGroupSearchPaths([osTup, devTup],
+                                             [cfg1, cfg2, cfg3, cfg4])
+        self.assertEquals(sorted(lookups), [
+            ([devTup, osTup], [x86]), ([devTup, osTup], [x86_64]),
+            ([osTup], [x86])])
+        self.assertEquals(threaded, [(3, facade.searchPathLookupJobs)])
+        handle.facade.conary._getRepositoryClient._mock.assertCalled()
+        self.assertEquals(paths[id(cfg1)], [
+            'group-os=/example.distro@rpl:2/1-2-3',
+            'group-dev=/example.devenv@rpl:2/5-6-7'])
+        self.assertEquals(paths[id(cfg2)], paths[id(cfg1)])
+        self.assertEquals(paths[id(cfg4)], paths[id(cfg1)])
+
+        # and the results are reused by later jobs
+        del lookups[:]
+        self.assertEquals(facade._findGroupSearchPaths([osTup, devTup],
+            [cfg2, cfg3]), dict((id(x), paths[id(x)]) for x in (cfg2, cfg3)))
+        self.assertEquals(lookups, [])
+
+        # until the stage changes
+        handle.productStore.getActiveStageName._mock.setDefaultReturn('Dev')
+        facade._findGroupSearchPaths([osTup], [cfg3])
+        self.assertEquals(lookups, [([osTup], [x86_64])])
+
     def testBuildJob(self):
         _, facade = self.prep()
         mock.mockMethod(facade._getRmakeHelper)
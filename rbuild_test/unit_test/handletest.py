@@ -54,6 +54,26 @@ class HandleTest(rbuildhelp.RbuildHelper):
         h.installPosthook(h.Config.displayConfig, self.postHook)
         mockedPost._mock.assertCalled('displayConfig', self.postHook)
 
+    def testPopHooksInstalled(self):
+        h = self.getRbuildHandle()
+        self.assertEquals(h.popHooksInstalled(), 0)
+        mock.mockMethod(h.Config._installPrehook)
+        mock.mockMethod(h.Config._installPosthook)
+        h.installPrehook(h.Config.displayConfig, self.preHook)
+        h.installPosthook(h.Config.displayConfig, self.postHook)
+        self.assertEquals(h.popHooksInstalled(), 2)
+        self.assertEquals(h.popHooksInstalled(), 0)
+
+    def testLoadPluginOnDemand(self):
+        h = self.getRbuildHandle()
+        plugin = mock.MockObject()
+        def loadPluginOnDemand(handle, className=None, name=None):
+            if className == 'Lazy' or name == 'lazy':
+                handle['Lazy'] = plugin
+        mock.mock(h._pluginManager, 'loadPluginOnDemand', loadPluginOnDemand)
+        self.assertEquals(h.Lazy, plugin)
+        self.assertRaises(errors.MissingPluginError, getattr, h, 'Bogus')
+
     def testGetConfig(self):
         h = self.getRbuildHandle()
         assert(h.getConfig() is self.rbuildCfg)
@@ -119,6 +139,58 @@ class HandleTest(rbuildhelp.RbuildHelper):
         self.failUnlessEqual(repr(handle2),
             '<RbuildHandle at %s, product dummy@label>' % hex(id(handle2)))
 
+    def testClose(self):
+        h = self.getRbuildHandle()
+        for name in ('conary', 'rmake', 'rbuilder'):
+            h.facade[name] = mock.MockObject()
+        h.close()
+        h.facade.rbuilder.close._mock.assertCalled()
+        h.facade.conary.close._mock.assertCalled()
+        h.facade.rmake.close._mock.assertCalled()
+
+    def testLazyFacades(self):
+        h = self.getRbuildHandle()
+        h.facade.pop('rmake', None)
+        self.assertEquals('rmake' in h.facade, False)
+        facadeObj = h.facade.rmake
+        self.assertEquals(facadeObj.__class__.__name__, 'RmakeFacade')
+        self.assertEquals(h.facade['rmake'], facadeObj)
+        # created once
+        self.assertEquals(h.facade.rmake, facadeObj)
+
+        proxy = handle._PluginProxy()
+        calls = []
+        proxy.addFactory('foo', lambda: calls.append(1) or 'bar')
+        self.assertEquals(calls, [])
+        self.assertEquals(proxy.foo, 'bar')
+        self.assertEquals(proxy.foo, 'bar')
+        self.assertEquals(calls, [1])
+        self.assertRaises(errors.MissingPluginError, getattr, proxy, 'baz')
+
+        # overrides may still return the facades themselves
+        class MyHandle(handle.RbuildHandle):
+            def _getFacades(self):
+                return dict(conary=mock.MockObject())
+        h = MyHandle(cfg=self.rbuildCfg, logRoot=False,
+                     userInterface=mock.MockObject())
+        self.assertEquals(isinstance(h.facade, handle._PluginProxy), True)
+        self.assertEquals(h.facade.keys(), ['conary'])
+
+    def testLazyProduct(self):
+        productStore = mock.MockObject()
+        productStore.getProduct._mock.setDefaultReturn('product')
+        h = self.getRbuildHandle(productStore=productStore)
+        self.assertEquals(productStore.getProduct._mock.calls, [])
+        # the conary facade is not created just to clear its config
+        self.assertEquals('conary' in h.facade, False)
+
+        self.assertEquals(h.product, 'product')
+        self.assertEquals(h.product, 'product')
+        self.assertEquals(len(productStore.getProduct._mock.calls), 1)
+
+        h.product = 'other'
+        self.assertEquals(h.product, 'other')
+
 
 class Command(object):
     commands = ['foo', 'bar']
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import __builtin__
+import sys
+from StringIO import StringIO
+
+from rbuild_test import rbuildhelp
+
+from rbuild.lib import importprofile
+
+
+class ImportProfileTest(rbuildhelp.RbuildHelper):
+
+    def testProfile(self):
+        origImport = __builtin__.__import__
+        profiler = importprofile.ImportProfiler()
+        profiler.install()
+        try:
+            self.assertNotEquals(__builtin__.__import__, origImport)
+            sys.modules.pop('colorsys', None)
+            import colorsys
+        finally:
+            profiler.uninstall()
+        self.assertEquals(__builtin__.__import__, origImport)
+        self.assertEquals(colorsys.__name__, 'colorsys')
+
+        cumulative, selfTime = profiler.times['colorsys']
+        self.assertTrue(0 <= selfTime <= cumulative)
+
+        stream = StringIO()
+        profiler.report(stream)
+        lines = stream.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Imports took '))
+        self.assertEquals(lines[1].split(), ['SELF', 'CUMULATIVE', 'MODULE'])
+        self.assertIn('colorsys', [line.split()[-1] for line in lines[2:]])
+
+    def testInstallStop(self):
+        origImport = __builtin__.__import__
+        profiler = importprofile.install()
+        try:
+            self.assertEquals(importprofile.install(), profiler)
+        finally:
+            self.assertEquals(importprofile.stop(), profiler)
+        self.assertEquals(__builtin__.__import__, origImport)
+        self.assertEquals(importprofile.stop(), None)
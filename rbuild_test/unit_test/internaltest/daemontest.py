@@ -0,0 +1,215 @@
+#!/usr/bin/python
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+import os
+import socket
+import StringIO
+import threading
+
+from rbuild_test import rbuildhelp
+from testutils import mock
+
+from rbuild import errors
+from rbuild.internal import daemon
+
+
+class DaemonTest(rbuildhelp.RbuildHelper):
+    def _serveOnce(self, socketPath, replies):
+        # fake daemon answering one connection with the given frames
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socketPath)
+        server.listen(1)
+        received = []
+        def serve():
+            conn, _ = server.accept()
+            try:
+                received.append(daemon._recvFrame(conn))
+                for kind, data in replies:
+                    daemon._sendFrame(conn, kind, data)
+            finally:
+                conn.close()
+                server.close()
+        thread = threading.Thread(target=serve)
+        thread.start()
+        return thread, received
+
+    def testFraming(self):
+        left, right = socket.socketpair()
+        try:
+            daemon._sendFrame(left, 'o', 'some output')
+            daemon._sendFrame(left, 'x', '')
+            self.assertEquals(daemon._recvFrame(right), ('o', 'some output'))
+            self.assertEquals(daemon._recvFrame(right), ('x', ''))
+            left.close()
+            self.assertRaises(EOFError, daemon._recvFrame, right)
+        finally:
+            right.close()
+
+    def testGetSocketPath(self):
+        self.mock(os, 'environ', {'HOME': '/home/user'})
+        self.assertEquals(daemon.getSocketPath(),
+                          '/home/user/.rbuild/daemon.sock')
+        os.environ[daemon.SOCKET_ENV] = '/tmp/rbuild.sock'
+        self.assertEquals(daemon.getSocketPath(), '/tmp/rbuild.sock')
+        self.mock(os, 'environ', {})
+        self.assertEquals(daemon.getSocketPath(), None)
+
+    def testChangesConfig(self):
+        self.assertEquals(daemon._changesConfig(['rbuild', 'build']), False)
+        self.assertEquals(daemon._changesConfig(
+            ['rbuild', '--config', 'user foo', 'build']), True)
+        self.assertEquals(daemon._changesConfig(
+            ['rbuild', '--config-file=/tmp/rc', 'build']), True)
+        self.assertEquals(daemon._changesConfig(
+            ['rbuild', '--skip-default-config', 'build']), True)
+
+    def testForwardWithoutDaemon(self):
+        socketPath = self.workDir + '/daemon.sock'
+        self.assertEquals(daemon.forward(['rbuild', 'help'], socketPath),
+                          None)
+        # a socket nobody listens on is left over from a dead daemon
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(socketPath)
+        sock.close()
+        self.assertEquals(daemon.forward(['rbuild', 'help'], socketPath),
+                          None)
+        self.assertEquals(daemon.stop(socketPath), False)
+
+    def testForward(self):
+        socketPath = self.workDir + '/daemon.sock'
+        thread, received = self._serveOnce(socketPath,
+            [('o', 'out'), ('e', 'err'), ('o', 'put\n'), ('x', '3')])
+        out, err = StringIO.StringIO(), StringIO.StringIO()
+        rc = daemon.forward(['rbuild', 'build', 'packages'], socketPath,
+                            outStream=out, errorStream=err)
+        thread.join()
+        self.assertEquals(rc, 3)
+        self.assertEquals(out.getvalue(), 'output\n')
+        self.assertEquals(err.getvalue(), 'err')
+        kind, data = received[0]
+        self.assertEquals(kind, 'r')
+        request = json.loads(data)
+        self.assertEquals(request['argv'], ['rbuild', 'build', 'packages'])
+        self.assertEquals(request['cwd'], os.getcwd())
+        self.assertEquals(request['env'], dict(os.environ))
+
+        # the daemon command itself is never forwarded
+        self.assertEquals(daemon.forward(['rbuild', 'daemon'], socketPath),
+                          None)
+
+    def testForwardDeclined(self):
+        socketPath = self.workDir + '/daemon.sock'
+        thread, _ = self._serveOnce(socketPath, [('n', '')])
+        out = StringIO.StringIO()
+        self.assertEquals(daemon.forward(['rbuild', 'build', 'packages'],
+            socketPath, outStream=out), None)
+        thread.join()
+        self.assertEquals(out.getvalue(), '')
+
+    def testMayPrompt(self):
+        class Quiet(object):
+            promptsUser = False
+        class Chatty(object):
+            pass
+        commands = {'status': Quiet, 'build': Chatty}
+        def getCommandClass(name):
+            return commands[name]
+        warmHandle = mock.MockObject()
+        warmHandle.Commands._mock.set(getCommandClass=getCommandClass)
+        cfg = mock.MockObject(user=('user', 'secret'))
+        warmHandle.getConfig._mock.setDefaultReturn(cfg)
+        warmHandle.Config.isComplete._mock.setDefaultReturn(True)
+
+        self.assertEquals(daemon._mayPrompt(warmHandle,
+            ['rbuild', '--debug-all', 'status', '--all']), False)
+        self.assertEquals(daemon._mayPrompt(warmHandle,
+            ['rbuild', 'build', 'packages']), True)
+        self.assertEquals(daemon._mayPrompt(warmHandle,
+            ['rbuild', 'nosuchcommand']), True)
+        self.assertEquals(daemon._mayPrompt(warmHandle, ['rbuild']), True)
+
+        # the main handler would ask for the password or configuration
+        cfg._mock.set(user=('user', None))
+        self.assertEquals(daemon._mayPrompt(warmHandle,
+            ['rbuild', 'status']), True)
+        cfg._mock.set(user=('user', 'secret'))
+        warmHandle.Config.isComplete._mock.setDefaultReturn(False)
+        self.assertEquals(daemon._mayPrompt(warmHandle,
+            ['rbuild', 'status']), True)
+
+    def testHandleConnection(self):
+        rbuildDaemon = daemon.RbuildDaemon(self.workDir + '/daemon.sock')
+        left, right = socket.socketpair()
+        try:
+            request = dict(argv=['rbuild', 'status'], cwd='/', env={})
+            daemon._sendFrame(right, 'r', json.dumps(request))
+            self.assertEquals(rbuildDaemon._handleConnection(left), True)
+            self.assertEquals(rbuildDaemon._requests.get_nowait(),
+                              (left, request))
+
+            # commands sent while another one runs are declined
+            daemon._sendFrame(right, 'r', json.dumps(request))
+            self.assertEquals(rbuildDaemon._handleConnection(left), False)
+            self.assertEquals(daemon._recvFrame(right), ('n', ''))
+            self.assertEquals(rbuildDaemon._requests.empty(), True)
+
+            daemon._sendFrame(right, 's')
+            self.assertEquals(rbuildDaemon._handleConnection(left), False)
+            self.assertEquals(daemon._recvFrame(right), ('x', '0'))
+            self.assertEquals(rbuildDaemon._requests.get_nowait(), None)
+        finally:
+            left.close()
+            right.close()
+
+    def testForwardDaemonExits(self):
+        socketPath = self.workDir + '/daemon.sock'
+        thread, _ = self._serveOnce(socketPath, [('o', 'partial')])
+        err = self.assertRaises(errors.RbuildError, daemon.forward,
+            ['rbuild', 'help'], socketPath, outStream=StringIO.StringIO())
+        thread.join()
+        self.assertEquals(str(err),
+            'The rbuild daemon exited before the command finished')
+
+    def testStop(self):
+        socketPath = self.workDir + '/daemon.sock'
+        thread, received = self._serveOnce(socketPath, [('x', '0')])
+        self.assertEquals(daemon.stop(socketPath), True)
+        thread.join()
+        self.assertEquals(received, [('s', '')])
+
+    def testDaemonCommand(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        mock.mock(handle.ui, 'info')
+        mock.mock(handle.ui, 'warning')
+        cmd = daemon.DaemonCommand()
+        mock.mock(daemon, 'stop')
+        daemon.stop._mock.setDefaultReturn(False)
+        cmd.runCommand(handle, {'stop': True, 'socket': '/tmp/sock'},
+                       ['rbuild', 'daemon'])
+        daemon.stop._mock.assertCalled('/tmp/sock')
+        handle.ui.warning._mock.assertCalled(
+            'No rbuild daemon is running on %s', '/tmp/sock')
+
+        mock.mock(daemon, 'RbuildDaemon')
+        cmd.runCommand(handle, {'socket': '/tmp/sock'}, ['rbuild', 'daemon'])
+        daemon.RbuildDaemon._mock.assertCalled('/tmp/sock')
+        daemon.RbuildDaemon().serve._mock.assertCalled()
+
+        self.assertRaises(errors.ParseError, cmd.runCommand, handle, {},
+                          ['rbuild', 'daemon', 'extra'])
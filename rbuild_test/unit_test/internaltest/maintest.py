@@ -96,6 +96,31 @@ class MainTest(rbuildhelp.RbuildHelper):
         finally:
             sys.argv = oldargv
 
+        # --profile-startup is consumed and reports import times
+        from rbuild.lib import importprofile
+        def checkArgv(slf, argv, *args, **kw):
+            self.assertEquals(argv, ['rbuild', 'help'])
+            self.assertNotEquals(importprofile._profiler, None)
+        self.mock(main.RbuildMain, 'main', checkArgv)
+        report = mock.MockObject()
+        self.mock(importprofile.ImportProfiler, 'report', report)
+        self.assertEquals(
+            main.main(['rbuild', '--profile-startup', 'help']), 0)
+        report._mock.assertCalled(sys.stderr)
+        self.assertEquals(importprofile._profiler, None)
+
+        # a running daemon executes the command instead
+        from rbuild.internal import daemon
+        self.mock(daemon, 'forward', lambda argv: 7)
+        self.assertEquals(main.main(['rbuild', 'help']), 7)
+        def forward(argv):
+            raise errors.RbuildError('gone')
+        self.mock(daemon, 'forward', forward)
+        self.logFilter.add()
+        self.assertEquals(main.main(['rbuild', 'help']), 1)
+        self.assertEquals(self.logFilter.records, ['error: gone'])
+        self.logFilter.remove()
+
     def testGetCommand(self):
         mainHandler = main.RbuildMain()
         cmd = mainHandler.getCommand(['rbuild', 'build'], self.rbuildCfg)
@@ -129,6 +154,26 @@ class MainTest(rbuildhelp.RbuildHelper):
                        [cmd, handle.RbuildHandle, {}, []])
         productStore.setActiveStageName._mock.assertCalled('foo')
 
+        rb = mainHandler.handle.facade.rbuilder
+        mock.mockMethod(rb.setUseCache)
+        self.checkCall(mainHandler.runCommand,
+                       [cmd, self.rbuildCfg, {'no-cache' : True}, [] ],
+                       {},
+                       'rbuild_plugins.build.BuildCommand.runCommand',
+                       [cmd, handle.RbuildHandle, {}, []])
+        rb.setUseCache._mock.assertCalled(False)
+
+        # the daemon keeps the handle's sessions open between commands
+        mock.mockMethod(mainHandler.handle.close)
+        mainHandler.closeHandle = False
+        self.checkCall(mainHandler.runCommand,
+                       [cmd, self.rbuildCfg, {}, [] ],
+                       {},
+                       'rbuild_plugins.build.BuildCommand.runCommand',
+                       [cmd, handle.RbuildHandle, {}, []])
+        mainHandler.handle.close._mock.assertNotCalled()
+        mainHandler.closeHandle = True
+
         class FakeCommand:
             def runCommand(self, handle, argSet, args):
                 raise errors.PluginError('eek')
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+
+from rbuild_test import rbuildhelp
+from testutils import mock
+
+from rbuild.internal import pluginloader
+from rbuild.lib import diskcache
+
+
+class PluginIndexTest(rbuildhelp.RbuildHelper):
+    def _getIndex(self):
+        return pluginloader.PluginIndex(
+            plugins=dict(
+                List=('/plugins', 'list.py', 'list'),
+                Show=('/plugins', 'show.py', 'show'),
+                Images=('/plugins', 'images.py', 'images'),
+                Targets=('/plugins', 'targets.py', 'targets'),
+                Hooks=('/plugins', 'hooks.py', 'hooks'),
+                ),
+            provides=dict(list=set(['List']), show=set(['Show'])),
+            uses=dict(
+                Images=set(['list', 'show']),
+                Targets=set(['list']),
+                ),
+            subCommands={
+                ('list', 'images'): set(['Images']),
+                ('show', 'images'): set(['Images']),
+                ('list', 'targets'): set(['Targets']),
+                },
+            eager=set(['Hooks']),
+            )
+
+    def testGetPluginsForCommand(self):
+        index = self._getIndex()
+        self.assertEquals(index.getPluginsForCommand('list', 'targets'),
+            set(['List', 'Targets', 'Hooks']))
+        # images extends show too, so that command is needed as well
+        self.assertEquals(index.getPluginsForCommand('show', 'images'),
+            set(['List', 'Show', 'Images', 'Hooks']))
+        # without a known subcommand, everything extending list is needed
+        self.assertEquals(index.getPluginsForCommand('list', 'bogus'),
+            set(['List', 'Show', 'Images', 'Targets', 'Hooks']))
+        self.assertEquals(index.getPluginsForCommand('bogus'), None)
+
+    def testGetClassName(self):
+        index = self._getIndex()
+        self.assertEquals(index.getClassName('images'), 'Images')
+        self.assertEquals(index.getClassName('bogus'), None)
+
+    def testGetCommandNames(self):
+        self.assertEquals(pluginloader._getCommandNames(['rbuild']),
+            (None, None))
+        self.assertEquals(pluginloader._getCommandNames(['rbuild', 'help']),
+            (None, None))
+        self.assertEquals(pluginloader._getCommandNames(
+            ['rbuild', 'list', 'images', '--limit', '5']), ('list', 'images'))
+        self.assertEquals(pluginloader._getCommandNames(
+            ['rbuild', 'help', 'list', 'images']), ('list', 'images'))
+        self.assertEquals(pluginloader._getCommandNames(
+            ['rbuild', 'config', '--ask']), ('config', None))
+
+
+class GetPluginsTest(rbuildhelp.RbuildHelper):
+    def testGetPlugins(self):
+        pluginDir = self.workDir + '/plugins'
+        self.writeFile(pluginDir + '/list.py', '')
+        self.writeFile(pluginDir + '/images.py', '')
+        cache = diskcache.DiskCache(self.workDir + '/cache')
+        mock.mock(pluginloader, '_getIndexCache', lambda: cache)
+        mock.mock(pluginloader.PluginManager, 'loadPlugins')
+        mock.mock(pluginloader.PluginManager, 'loadIndexedPlugins')
+
+        # the first run loads everything and records an index
+        mgr = pluginloader.getPlugins(['rbuild', 'list', 'images'],
+                                      [pluginDir])
+        mgr.loadPlugins._mock.assertCalled()
+        self.assertEquals(mgr.index, None)
+        mgr._recording.plugins['List'] = (pluginDir, 'list.py', 'list')
+        mgr._recording.provides['list'] = set(['List'])
+        mgr.saveIndex()
+
+        # later runs load only what the command needs
+        mgr = pluginloader.getPlugins(['rbuild', 'list', 'images'],
+                                      [pluginDir])
+        mgr.loadPlugins._mock.assertNotCalled()
+        mgr.loadIndexedPlugins._mock.assertCalled(set(['List']))
+        self.assertEquals(mgr.index.plugins.keys(), ['List'])
+
+        # commands missing from the index load everything
+        mgr = pluginloader.getPlugins(['rbuild', 'bogus'], [pluginDir])
+        mgr.loadPlugins._mock.assertCalled()
+
+        # no command, as for the python API, loads everything without
+        # recording
+        mgr = pluginloader.getPlugins([], [pluginDir])
+        mgr.loadPlugins._mock.assertCalled()
+        self.assertEquals(mgr._recording, None)
+
+        # changing the plugin directory invalidates the index
+        self.writeFile(pluginDir + '/targets.py', '')
+        os.utime(pluginDir, (0, 0))
+        mgr = pluginloader.getPlugins(['rbuild', 'list', 'images'],
+                                      [pluginDir])
+        mgr.loadPlugins._mock.assertCalled()
+        mgr.loadIndexedPlugins._mock.assertNotCalled()
@@ -48,19 +48,24 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
 
         handle.productStore._mock.set(_currentStage='stage')
 
+        mock.mockMethod(handle.BuildPackages.recordBuiltPackages)
         cmd.runCommand(handle, {}, ['rbuild', 'build', 'packages'])
-        handle.BuildPackages.buildAllPackages._mock.assertCalled()
+        handle.BuildPackages.buildAllPackages._mock.assertCalled(
+            changedOnly=True)
         handle.Build.watchAndCommitJob._mock.assertCalled(1, None)
+        handle.BuildPackages.recordBuiltPackages._mock.assertCalled(1)
         handle.BuildPackages.refreshAllPackages._mock.assertNotCalled()
 
         cmd.runCommand(handle, {}, ['rbuild', 'build', 'package'])
-        handle.BuildPackages.buildAllPackages._mock.assertCalled()
+        handle.BuildPackages.buildAllPackages._mock.assertCalled(
+            changedOnly=True)
         handle.Build.watchAndCommitJob._mock.assertCalled(1, None)
         handle.BuildPackages.refreshAllPackages._mock.assertNotCalled()
 
         cmd.runCommand(handle, {'message': 'message from unit tests'},
                        ['rbuild', 'build', 'packages'])
-        handle.BuildPackages.buildAllPackages._mock.assertCalled()
+        handle.BuildPackages.buildAllPackages._mock.assertCalled(
+            changedOnly=True)
         handle.Build.watchAndCommitJob._mock.assertCalled(1,
             'message from unit tests')
         handle.BuildPackages.refreshAllPackages._mock.assertNotCalled()
@@ -91,22 +96,94 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         handle.BuildPackages.refreshAllPackages._mock.assertNotCalled()
         handle.BuildPackages.refreshPackages._mock.assertCalled(['foo'])
 
+        cmd.runCommand(handle, {'all': True},
+                       ['rbuild', 'build', 'packages'])
+        handle.BuildPackages.buildAllPackages._mock.assertCalled(
+            changedOnly=False)
+
+        # nothing changed since the last build
+        mock.mock(handle.ui, 'info')
+        handle.BuildPackages.buildAllPackages._mock.setDefaultReturn(None)
+        del handle.Build.watchAndCommitJob._mock.calls[:]
+        cmd.runCommand(handle, {}, ['rbuild', 'build', 'packages'])
+        handle.Build.watchAndCommitJob._mock.assertNotCalled()
+        handle.ui.info._mock.assertCalled('No packages have changed since'
+            ' they were last built; use --all to build them anyway')
+        handle.BuildPackages.buildAllPackages._mock.setDefaultReturn(1)
+
+        # only rebuild what requires the named packages
+        mock.mockMethod(handle.BuildPackages.getRebuildSet, ['foo', 'bar'])
+        cmd.runCommand(handle, {'recurse': True, 'no-commit': True},
+                       ['rbuild', 'build', 'packages', 'foo'])
+        handle.BuildPackages.getRebuildSet._mock.assertCalled(['foo'])
+        handle.BuildPackages.buildPackages._mock.assertCalled(
+            ['foo', 'bar'], False)
+
+        # show the plan without building anything
+        mock.mockMethod(handle.BuildPackages.getBuildPlan,
+                        (['bar', 'foo'], 4))
+        mock.mock(handle.ui, 'write')
+        cmd.runCommand(handle, {'plan': True, 'recurse': True},
+                       ['rbuild', 'build', 'packages', 'foo'])
+        handle.BuildPackages.getBuildPlan._mock.assertCalled(['foo'],
+            recurse=True, changedOnly=True)
+        self.assertEquals([x[0][0] for x in handle.ui.write._mock.calls],
+            ['bar', 'foo', '2 packages, about 4 troves to build'])
+        handle.BuildPackages.buildPackages._mock.assertNotCalled()
+
+        del handle.BuildPackages.recordBuiltPackages._mock.calls[:]
         handle.Build.watchAndCommitJob._mock.setDefaultReturn(False)
         self.assertRaises(errors.PluginError,
             cmd.runCommand, handle, {}, ['rbuild', 'build', 'packages'])
+        handle.BuildPackages.recordBuiltPackages._mock.assertNotCalled()
 
     def testBuildAllPackages(self):
         handle = self.getRbuildHandle()
         from rbuild_plugins.build import packages
         mock.mock(packages, 'createRmakeJobForAllPackages', 'foo')
-        mock.mockMethod(handle.facade.rmake.buildJob)
+        mock.mock(packages, 'getChangedPackages', (['pkg1'], {'pkg1': 'a'}))
+        mock.mockMethod(handle.facade.rmake.buildJob, 11)
         mock.mockMethod(handle.Build.warnIfOldProductDefinition)
         handle.productStore = mock.MockObject()
-        handle.BuildPackages.buildAllPackages()
+        self.assertEquals(handle.BuildPackages.buildAllPackages(), 11)
         packages.createRmakeJobForAllPackages._mock.assertCalled(handle)
         handle.facade.rmake.buildJob._mock.assertCalled('foo')
         handle.Build.warnIfOldProductDefinition._mock.assertCalled(
             'building all packages')
+        # everything built is recorded once the job is committed
+        packages.getChangedPackages._mock.assertCalled(handle)
+        self.assertEquals(handle.BuildPackages._pendingJob,
+                          (11, {'pkg1': 'a'}))
+
+    def testBuildChangedPackages(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        mock.mock(packages, 'createRmakeJobForPackages', 'foo')
+        mock.mock(packages, 'getChangedPackages',
+                  (['pkg1'], {'pkg1': 'a', 'pkg2': 'b'}))
+        mock.mock(packages, 'recordBuiltPackages')
+        mock.mockMethod(handle.facade.rmake.buildJob, 12)
+        mock.mockMethod(handle.Build.warnIfOldProductDefinition)
+        handle.productStore = mock.MockObject()
+        self.assertEquals(
+            handle.BuildPackages.buildAllPackages(changedOnly=True), 12)
+        packages.createRmakeJobForPackages._mock.assertCalled(handle,
+            ['pkg1'], False)
+        handle.productStore.setPackageJobId._mock.assertCalled(12)
+
+        # only the committed job is recorded
+        handle.BuildPackages.recordBuiltPackages(11)
+        packages.recordBuiltPackages._mock.assertNotCalled()
+        handle.BuildPackages.recordBuiltPackages(12)
+        packages.recordBuiltPackages._mock.assertCalled(handle,
+            {'pkg1': 'a'}, 12)
+
+        # nothing to do
+        packages.getChangedPackages._mock.setDefaultReturn(
+            ([], {'pkg1': 'a'}))
+        self.assertEquals(
+            handle.BuildPackages.buildAllPackages(changedOnly=True), None)
+        packages.createRmakeJobForPackages._mock.assertNotCalled()
 
     def testBuildPackages(self):
         handle = self.getRbuildHandle()
@@ -122,6 +199,38 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         handle.Build.warnIfOldProductDefinition._mock.assertCalled(
             'building packages')
 
+    def testGetRebuildSet(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        mock.mock(packages, 'getBuildRequirementGraph',
+                  {'bar': set(['foo']), 'baz': set(['bar']), 'foo': set()})
+        self.assertEquals(handle.BuildPackages.getRebuildSet(['bar']),
+                          ['bar', 'baz'])
+        packages.getBuildRequirementGraph._mock.assertCalled(handle)
+
+    def testGetBuildPlan(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        handle.productStore = mock.MockObject()
+        handle.productStore.getGroupFlavors._mock.setReturn(
+            [('group-dist', 'is: x86'), ('group-dist', 'is: x86_64')])
+        handle.productStore.getEditedRecipeDicts._mock.setReturn(
+            ({'pkg1': '/pkg1/pkg1.recipe', 'pkg2': '/pkg2/pkg2.recipe'}, {}))
+        mock.mock(packages, 'getChangedPackages',
+                  (['pkg1'], {'pkg1': 'a', 'pkg2': 'b'}))
+        mock.mockMethod(handle.BuildPackages.getRebuildSet, ['pkg1', 'pkg2'])
+        self.assertEquals(handle.BuildPackages.getBuildPlan(),
+                          (['pkg1'], 2))
+        packages.getChangedPackages._mock.assertCalled(handle)
+        self.assertEquals(handle.BuildPackages.getBuildPlan(
+                          changedOnly=False), (['pkg1', 'pkg2'], 4))
+        packages.getChangedPackages._mock.assertNotCalled()
+        self.assertEquals(handle.BuildPackages.getBuildPlan(['pkg1']),
+                          (['pkg1'], 2))
+        self.assertEquals(handle.BuildPackages.getBuildPlan(['pkg1'],
+                          recurse=True), (['pkg1', 'pkg2'], 4))
+        handle.BuildPackages.getRebuildSet._mock.assertCalled(['pkg1'])
+
     def testBuildPackagesRefresh(self):
         handle = self.getRbuildHandle()
         from rbuild_plugins.build import refresh
@@ -166,5 +275,12 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
             [None, None, {'no-watch': True, 'no-commit': True,
                           'recurse': True},
              ['build', 'packages']])
+        self.checkRbuild('build packages --all',
+            'rbuild_plugins.buildpackages.BuildPackagesCommand.runCommand',
+            [None, None, {'all': True}, ['build', 'packages']])
+        self.checkRbuild('build packages --plan --recurse foo',
+            'rbuild_plugins.buildpackages.BuildPackagesCommand.runCommand',
+            [None, None, {'plan': True, 'recurse': True},
+             ['build', 'packages', 'foo']])
 
 
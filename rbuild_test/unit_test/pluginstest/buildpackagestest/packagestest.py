@@ -44,6 +44,157 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         assert(str(err) == ('no packages are currently being edited'
                             ' - nothing to build'))
 
+    def testGetChangedPackages(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        handle.productStore = mock.MockObject()
+        handle.product = mock.MockObject(_sourceTrove='proddef=/a@b:c/1-1')
+        handle.productStore.getGroupFlavors._mock.setReturn(
+            [('group-dist', 'is: x86'), ('group-dist', 'is: x86_64')])
+        self.writeFile(self.workDir + '/foo/foo.recipe', 'foo recipe')
+        self.writeFile(self.workDir + '/foo/CONARY', 'foo state')
+        self.writeFile(self.workDir + '/bar/bar.recipe', 'bar recipe')
+        packageRecipes = {'foo' : self.workDir + '/foo/foo.recipe',
+                          'bar' : self.workDir + '/bar/bar.recipe'}
+        handle.productStore.getEditedRecipeDicts._mock.setReturn(
+                                                        (packageRecipes, {}))
+        manifest = {}
+        handle.productStore.getPackageManifest._mock.setReturn(manifest)
+
+        # nothing was built yet
+        changed, fingerprints = packages.getChangedPackages(handle)
+        self.assertEquals(changed, ['bar', 'foo'])
+        self.assertEquals(fingerprints['foo'],
+            packages.getSourceFingerprint(self.workDir + '/foo'))
+
+        # the versions committed are looked up on the stage label
+        handle.productStore.getActiveStageLabel._mock.setReturn('a@b:c')
+        mock.mockMethod(handle.facade.conary._findTroves)
+        handle.facade.conary._findTroves._mock.setReturn(
+            {('bar', None, None): [('bar', '/a@b:c/1-1-1', 'is: x86'),
+                                   ('bar', '/a@b:c/1-1-2', 'is: x86')],
+             ('foo', None, None): []},
+            [('bar', None, None), ('foo', None, None)], 'a@b:c',
+            allowMissing=True)
+        packages.recordBuiltPackages(handle, fingerprints, 42)
+        manifest = handle.productStore.setPackageManifest._mock.popCall()[0][0]
+        self.assertEquals(manifest, {'jobId': 42, 'packages': fingerprints,
+            'versions': {'bar': '/a@b:c/1-1-2'},
+            'context': ['proddef=/a@b:c/1-1', ['is: x86', 'is: x86_64']]})
+        handle.productStore.getPackageManifest._mock.setReturn(manifest)
+        self.assertEquals(packages.getChangedPackages(handle)[0], [])
+
+        # editing any file in the checkout changes its fingerprint
+        self.writeFile(self.workDir + '/foo/sources.tar', 'new source')
+        self.assertEquals(packages.getChangedPackages(handle)[0], ['foo'])
+
+        # and everything is rebuilt for a new product definition
+        handle.product._mock.set(_sourceTrove='proddef=/a@b:c/1-2')
+        self.assertEquals(packages.getChangedPackages(handle)[0],
+                          ['bar', 'foo'])
+
+    def testGetBuildRequirementGraph(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        from rbuild.lib import diskcache
+        handle.productStore = mock.MockObject()
+        handle.productStore.getActiveStageName._mock.setReturn('devel')
+        handle.productStore.getCache._mock.setReturn(
+            diskcache.DiskCache(self.workDir + '/cache'))
+        self.writeFile(self.workDir + '/foo/foo.recipe', 'foo recipe')
+        self.writeFile(self.workDir + '/bar/bar.recipe', 'bar recipe')
+        packageRecipes = {'foo' : self.workDir + '/foo/foo.recipe',
+                          'bar' : self.workDir + '/bar/bar.recipe'}
+        handle.productStore.getEditedRecipeDicts._mock.setReturn(
+                                                        (packageRecipes, {}))
+        requires = {
+            self.workDir + '/foo/foo.recipe':
+                {'name': 'foo',
+                 'buildRequires': ['foo:devel', 'glibc:devel']},
+            self.workDir + '/bar/bar.recipe':
+                {'name': 'bar',
+                 'buildRequires': ['foo:devel=1.0[is: x86]', 'foo:runtime']},
+        }
+        loaded = []
+        def loadRecipeAttributes(recipePaths, attributes):
+            self.assertEquals(attributes, ['name', 'buildRequires'])
+            loaded.append(sorted(recipePaths))
+            return dict((x, requires[x]) for x in recipePaths)
+        self.mock(handle.facade.conary, 'loadRecipeAttributesFromCheckouts',
+                  loadRecipeAttributes)
+        # packages in the image groups are part of the graph, but the
+        # checked-out recipes replace them
+        mock.mock(packages, 'getGroupBuildRequirementGraph',
+                  {'baz': set(['bar']), 'foo': set(['zlib'])})
+
+        graph = packages.getBuildRequirementGraph(handle)
+        self.assertEquals(graph, {'foo': set(['glibc']),
+                                  'bar': set(['foo']),
+                                  'baz': set(['bar'])})
+        self.assertEquals(packages.getRebuildSet(graph, ['glibc']),
+                          ['bar', 'baz', 'foo'])
+        self.assertEquals(packages.getRebuildSet(graph, ['bar']),
+                          ['bar', 'baz'])
+        self.assertEquals(packages.getRebuildSet(graph, ['zlib']), ['zlib'])
+
+        self.assertEquals(loaded, [[self.workDir + '/bar/bar.recipe',
+                                    self.workDir + '/foo/foo.recipe']])
+        # the attributes are kept for building the job too
+        self.assertEquals(packages.loadEditedRecipes(handle,
+            {'foo': self.workDir + '/foo/foo.recipe'}),
+            {self.workDir + '/foo/foo.recipe':
+                requires[self.workDir + '/foo/foo.recipe']})
+        self.assertEquals(len(loaded), 1)
+
+        # recipes are only loaded again when their sources change
+        del loaded[:]
+        self.assertEquals(packages.getBuildRequirementGraph(handle), graph)
+        self.assertEquals(loaded, [])
+        self.writeFile(self.workDir + '/bar/bar.recipe', 'new bar recipe')
+        packages.getBuildRequirementGraph(handle)
+        self.assertEquals(loaded, [[self.workDir + '/bar/bar.recipe']])
+
+    def testGetGroupBuildRequirementGraph(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins.build import packages
+        from rbuild.lib import diskcache
+        handle.productStore = mock.MockObject()
+        handle.productStore.getActiveStageLabel._mock.setReturn(
+            'localhost@rpl:devel')
+        handle.productStore.getCache._mock.setReturn(
+            diskcache.DiskCache(self.workDir + '/cache'))
+        handle.productStore.getGroupFlavors._mock.setReturn(
+            [('group-dist', 'is: x86'), ('group-dist', 'is: x86_64')])
+        groupTups = [('group-dist', '/localhost@rpl:devel/1-1-1', 'is: x86'),
+                     ('group-dist', '/localhost@rpl:devel/1-1-1',
+                      'is: x86_64')]
+        mock.mockMethod(handle.facade.conary._findTrovesFlattened, groupTups)
+        mock.mockMethod(handle.facade.conary.getGroupBuildRequirements,
+                        {'foo': set(['foo', 'glibc']), 'bar': set(['foo'])})
+
+        graph = packages.getGroupBuildRequirementGraph(handle)
+        self.assertEquals(graph, {'foo': set(['glibc']),
+                                  'bar': set(['foo'])})
+        handle.facade.conary._findTrovesFlattened._mock.assertCalled(
+            ['group-dist[is: x86]', 'group-dist[is: x86_64]'],
+            'localhost@rpl:devel', allowMissing=True)
+        handle.facade.conary.getGroupBuildRequirements._mock.assertCalled(
+            groupTups)
+
+        # the packages are only read again for new group versions
+        self.assertEquals(packages.getGroupBuildRequirementGraph(handle),
+                          graph)
+        handle.facade.conary.getGroupBuildRequirements._mock.assertNotCalled()
+        groupTups[0] = ('group-dist', '/localhost@rpl:devel/2-1-1', 'is: x86')
+        packages.getGroupBuildRequirementGraph(handle)
+        handle.facade.conary.getGroupBuildRequirements._mock.assertCalled(
+            sorted(groupTups))
+
+        # nothing built yet
+        handle.facade.conary._findTrovesFlattened._mock.setDefaultReturn([])
+        self.assertEquals(packages.getGroupBuildRequirementGraph(handle), {})
+        handle.facade.conary.getGroupBuildRequirements._mock.assertNotCalled()
+
     def testCreateRmakeJobForPackages(self):
         handle = self.getRbuildHandle()
         from rbuild_plugins.build import packages
@@ -77,15 +228,19 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         handle.productStore.getEditedRecipeDicts._mock.setReturn(
             (packageRecipes, groupRecipes))
         mock.mockMethod(handle.facade.rmake.createBuildJobForStage)
+        mock.mock(packages, 'loadEditedRecipes', 'recipeAttributes')
 
         # normal
         packages.createRmakeJobForPackages(handle,
                 ['foo', 'bar', 'group-baz'], False)
 
+        # the edited recipes are loaded beforehand and handed to the job
+        packages.loadEditedRecipes._mock.assertCalled(handle, packageRecipes)
         handle.facade.rmake.createBuildJobForStage._mock.assertCalled(
             [self.workDir + '/foo/foo.recipe{ACTX}', 'bar{ACTX}',
                 self.workDir + '/group-baz/group-baz.recipe{ACTX}'],
-            recurse=False, rebuild=False, useLocal=True)
+            recurse=False, rebuild=False, useLocal=True,
+            recipeAttributes='recipeAttributes')
 
         # no group flavors
         handle.productStore.getGroupFlavors._mock.setReturn([])
@@ -103,9 +258,10 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         mock.mock(packages, '_removePackagesWithEditedReplacements',
                   (replacementRecipes, newRecipes))
         mock.mockMethod(handle.facade.rmake.createBuildJobForStage)
+        mock.mock(packages, 'loadEditedRecipes', 'recipeAttributes')
         mock.mock(handle, 'ui')
         handle.facade.rmake.createBuildJobForStage._mock.setReturn('recipeJob',
-                                                            replacementRecipes)
+            replacementRecipes, recipeAttributes='recipeAttributes')
         mock.mock(handle.facade.rmake, 'overlayJob')
         handle.facade.rmake.overlayJob._mock.setReturn('mainJob+recipeJob',
                                                        'mainJob', 'recipeJob')
@@ -125,7 +281,7 @@ class BuildPackagesTest(rbuildhelp.RbuildHelper):
         allRecipes.extend([self.workDir + '/bar.recipe{x86}',
                            self.workDir + '/bar.recipe{x86_64}'])
         handle.facade.rmake.createBuildJobForStage._mock.setReturn('recipeJob2',
-                                                                   allRecipes)
+            allRecipes, recipeAttributes='recipeAttributes')
         handle.facade.rmake.overlayJob._mock.setReturn('mainJob+recipeJob2',
                                                        'mainJob', 'recipeJob2')
         newJob = packages._addInEditedPackages(handle, 'mainJob',
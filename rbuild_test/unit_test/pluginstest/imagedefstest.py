@@ -51,12 +51,12 @@ class CreateImageDefTest(AbstractImageDefsTest):
         mock.mockMethod(handle.DescriptorConfig.readConfig)
         mock.mockMethod(handle.DescriptorConfig.writeConfig)
         mock.mockMethod(handle.ImageDefs.create)
-        mock.mockMethod(handle.facade.rbuilder.getImageTypes)
+        mock.mockMethod(handle.facade.rbuilder.getImageType)
 
         _amiImage = mock.MockObject(name="amiImage")
-        _vmwareImage = mock.MockObject(name="vmwareImage")
-        handle.facade.rbuilder.getImageTypes._mock.setReturn(
-            [_amiImage, _vmwareImage])
+        handle.facade.rbuilder.getImageType._mock.setReturn(None, 'foo')
+        handle.facade.rbuilder.getImageType._mock.setReturn(
+            _amiImage, 'amiImage')
 
         cmd = handle.Commands.getCommandClass('create')()
 
@@ -16,6 +16,7 @@
 
 from rbuild import errors
 from testutils import mock
+import robj
 
 from rbuild_test import rbuildhelp
 
@@ -97,9 +98,8 @@ class CancelImagesTest(AbstractImagesTest):
     def testCommandParsing(self):
         handle = self.handle
 
-        mock.mockMethod(handle.Images.cancel)
-        mock.mockMethod(handle.ui.warning)
-        mock.mockMethod(handle.facade.rbuilder.getImages, ['image'])
+        mock.mockMethod(handle.Images.cancelImages, [('10', 'Cancelled')])
+        mock.mockMethod(handle.ui.writeTable)
 
         err = self.assertRaises(
             errors.ParseError, self.cmd.runCommand, handle, {},
@@ -107,12 +107,15 @@ class CancelImagesTest(AbstractImagesTest):
         self.assertIn(': id', str(err))
 
         self.cmd.runCommand(handle, {}, ['rbuild', 'cancel', 'images', '10'])
-        handle.Images.cancel._mock.assertCalled('image')
+        handle.Images.cancelImages._mock.assertCalled(['10'])
+        handle.ui.writeTable._mock.assertCalled([('10', 'Cancelled')],
+            headers=('ID', 'RESULT'))
 
         err = self.assertRaises(errors.BadParameterError,
             self.cmd.runCommand, handle, {},
-            ['rbuild', 'cancel', 'images', '&^%&*%$^&$'])
+            ['rbuild', 'cancel', 'images', '10', '&^%&*%$^&$'])
         self.assertIn('Cannot parse', str(err))
+        handle.Images.cancelImages._mock.assertNotCalled()
 
     def testLaunchArgParse(self):
         self.checkRbuild('cancel images 10',
@@ -120,19 +123,16 @@ class CancelImagesTest(AbstractImagesTest):
             [None, None, {}, ['cancel', 'images', '10']])
 
     def testNoImage(self):
-        from rbuild_plugins import images
-
         mock.mockMethod(self.handle.Images.cancel)
         mock.mockMethod(self.handle.Images._getProductStage,
             ('project', 'branch', 'stage'))
-        mock.mockMethod(self.handle.ui.warning)
-        mock.mockMethod(self.handle.ui.getYn, True)
+        mock.mockMethod(self.handle.ui.writeTable)
         mock.mockMethod(self.handle.facade.rbuilder.getImages, None)
 
         self.cmd.runCommand(self.handle, {},
             ['rbuild', 'cancel', 'images', '10'])
-        self.handle.ui.warning._mock.assertCalled("Unable to find image with"
-            " id '10' on stage stage of project project")
+        self.handle.ui.writeTable._mock.assertCalled([('10', 'Not found')],
+            headers=('ID', 'RESULT'))
         self.handle.Images.cancel._mock.assertNotCalled()
 
 
@@ -141,8 +141,9 @@ class DeleteImagesTest(AbstractImagesTest):
         handle = self.handle
         cmd = handle.Commands.getCommandClass('delete')()
 
-        mock.mockMethod(handle.Images.delete)
+        mock.mockMethod(handle.Images.deleteImages, [('10', 'Deleted')])
         mock.mockMethod(handle.ui.warning)
+        mock.mockMethod(handle.ui.writeTable)
 
         err = self.assertRaises(
             errors.ParseError, cmd.runCommand, handle, {},
@@ -150,16 +151,19 @@ class DeleteImagesTest(AbstractImagesTest):
         self.assertIn('IMAGEID', str(err))
 
         cmd.runCommand(handle, {}, ['rbuild', 'delete', 'images', '10', '11'])
-        handle.Images.delete._mock.assertCalled('10', False)
-        handle.Images.delete._mock.assertCalled('11', False)
+        handle.Images.deleteImages._mock.assertCalled(['10', '11'], False)
+        handle.ui.writeTable._mock.assertCalled([('10', 'Deleted')],
+            headers=('ID', 'RESULT'))
 
         cmd.runCommand(handle, {"force": True},
                        ['rbuild', 'delete', 'images', '10'])
-        handle.Images.delete._mock.assertCalled('10', True)
+        handle.Images.deleteImages._mock.assertCalled(['10'], True)
+        handle.ui.writeTable._mock.popCall()
 
         cmd.runCommand(handle, {},
             ['rbuild', 'delete', 'images', '&^%&*%$^&$'])
-        handle.Images.delete._mock.assertNotCalled()
+        handle.Images.deleteImages._mock.assertNotCalled()
+        handle.ui.writeTable._mock.assertNotCalled()
         handle.ui.warning._mock.assertCalled(
             "Cannot parse image id '&^%&*%$^&$'")
 
@@ -306,7 +310,116 @@ class ShowImagesTest(AbstractImagesTest):
             [None, None, {}, ['show', 'images', '1', '2']])
 
 
+    def testGetShowResources(self):
+        from rbuild_plugins import images
+        handle = self.handle
+        cmd = images.ListImagesCommand()
+        mock.mockMethod(handle.Images.getImagesById, {'2': 'image2'})
+        self.assertEqual(cmd._getShowResources(handle, ['1', '2']),
+            [('1', None), ('2', 'image2')])
+        handle.Images.getImagesById._mock.assertCalled(['1', '2'])
+
+
 class ImagesPluginTest(AbstractImagesTest):
+    def _mockImages(self, *imageIds):
+        handle = self.handle
+        images = [mock.MockObject(image_id=x, name='image%s' % x)
+                  for x in imageIds]
+        mock.mockMethod(handle.Images._getProductStage,
+            ('project', 'branch', 'stage'))
+        mock.mockMethod(handle.facade.rbuilder.getImages, images)
+        return images
+
+    def testGetImagesById(self):
+        handle = self.handle
+        image10, image11 = self._mockImages('10', '11')
+
+        self.assertEqual(handle.Images.getImagesById(['10', '11', '12']),
+            {'10': image10, '11': image11})
+        handle.facade.rbuilder.getImages._mock.assertCalled(
+            image_id=['10', '11', '12'], project='project', branch='branch',
+            stage='stage')
+
+        # ids are compared as numbers, and returned as they were given
+        self.assertEqual(handle.Images.getImagesById(['010', '11', 'x']),
+            {'010': image10, '11': image11})
+        handle.facade.rbuilder.getImages._mock.assertCalled(
+            image_id=['10', '11'], project='project', branch='branch',
+            stage='stage')
+
+    def testGetImagesByIdWithoutInFilter(self):
+        handle = self.handle
+        image10, image11 = self._mockImages('10', '11')
+        queries = []
+        def getImages(image_id, **kwargs):
+            queries.append(image_id)
+            if isinstance(image_id, list):
+                raise robj.errors.HTTPBadRequestError(uri=None, status=400,
+                    reason='Bad Request', response=None)
+            return [x for x in (image10, image11) if x.image_id == image_id]
+        self.mock(handle.facade.rbuilder, 'getImages', getImages)
+
+        # older rBuilders are asked for each image on its own
+        self.assertEqual(handle.Images.getImagesById(['10', '11', '12']),
+            {'10': image10, '11': image11})
+        self.assertEqual(queries, [['10', '11', '12'], '10', '11', '12'])
+
+    def testCancelImages(self):
+        from rbuild_plugins import images
+        handle = self.handle
+        image10, image11 = self._mockImages('10', '11')
+
+        jobs = []
+        def createCancelJob(image):
+            # descriptors are filled in before any job is started
+            self.assertEqual(jobs, [])
+            if image is image11:
+                raise images.CancelImageError(msg='not building')
+            return 'job%s' % image.image_id
+        mock.mock(handle.Images, '_createCancelJob', createCancelJob)
+        image10.jobs._mock.set(append=jobs.append)
+
+        self.assertEqual(
+            handle.Images.cancelImages(['10', '11', '12', '010']),
+            [('10', 'Cancelled'), ('11', 'not building'),
+             ('12', 'Not found')])
+        self.assertEqual(jobs, ['job10'])
+        self.assertEqual(len(handle.facade.rbuilder.getImages._mock.calls),
+            1)
+
+        # failed requests are reported with the image
+        del jobs[:]
+        err = robj.errors.HTTPUnauthorizedError(uri=None, status='401',
+            reason='Unauthorized', response=None)
+        def append(job):
+            raise err
+        image10.jobs._mock.set(append=append)
+        self.assertEqual(handle.Images.cancelImages(['010']),
+            [('010', str(err))])
+
+    def testDeleteImages(self):
+        handle = self.handle
+        image10, image11 = self._mockImages('10', '11')
+
+        mock.mockMethod(handle.ui.getYn, False)
+        handle.ui.getYn._mock.appendReturn(True, "Delete image10?",
+            default=False)
+
+        self.assertEqual(
+            handle.Images.deleteImages(['10', '11', '12', '10', '011']),
+            [('10', 'Deleted'), ('11', 'Skipped'), ('12', 'Not found')])
+        image10.delete._mock.assertCalled()
+        image11.delete._mock.assertNotCalled()
+
+        # each image is confirmed once
+        handle.ui.getYn._mock.popCall()
+        handle.ui.getYn._mock.popCall()
+        handle.ui.getYn._mock.assertNotCalled()
+        self.assertEqual(handle.Images.deleteImages(['11'], force=True),
+            [('11', 'Deleted')])
+        handle.ui.getYn._mock.assertNotCalled()
+        image11.delete._mock.assertCalled()
+
     def testCancel(self):
         from rbuild_plugins import images
 
@@ -694,7 +807,7 @@ class ImagesPluginTest(AbstractImagesTest):
         handle.facade.rbuilder.getImages._mock.assertNotCalled()
 
     def testWatchJob(self):
-        from rbuild_plugins.images import time
+        from rbuild.lib.util import time
         handle = self.handle
 
         mock.mock(handle.ui, 'outStream')
@@ -45,7 +45,7 @@ class ImageTypesTest(AbstractImageTypesTest):
         _imageType1 = mock.MockObject(name="imagetype1")
         _imageType2 = mock.MockObject(name="")
         _imageType3 = mock.MockObject(name="imagetype2")
-        mock.mockMethod(handle.facade.rbuilder.getImageTypes,
+        mock.mockMethod(handle.facade.rbuilder.listImageTypes,
             [_imageType3, _imageType1, _imageType2])
 
         self.assertEqual([_imageType1, _imageType3], handle.ImageTypes.list())
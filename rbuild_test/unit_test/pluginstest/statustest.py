@@ -104,6 +104,13 @@ class StatusTest(rbuildhelp.RbuildHelper):
             verbosity=status.DEFAULT, product=False,
             local=False, repository=True)
 
+        cmd.runCommand(handle, {'jobs': '4'}, ['rbuild', 'status'])
+        handle.Status.printDirectoryStatus._mock.assertCalled(cwd,
+            verbosity=status.DEFAULT, product=False,
+            local=True, repository=True, jobs=4)
+        self.assertRaises(errors.BadParameterError, cmd.runCommand, handle,
+            {'jobs': 'many'}, ['rbuild', 'status'])
+
     def testPrintDirectoryStatus(self):
         handle = self.getRbuildHandle()
         from rbuild_plugins import status
@@ -141,6 +148,51 @@ class StatusTest(rbuildhelp.RbuildHelper):
         self.assertRaises(ValueError, handle.Status.printDirectoryStatus,
             'bogus', product=True, local=False, repository=False)
 
+    def testPrintDirectoryStatusBatched(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins import status
+        mock.mockMethod(handle.Status._printOneDirectoryStatus)
+        mock.mock(dirstore, 'CheckoutProductStore')
+        dirstore.CheckoutProductStore().getProductDefinitionDirectory._mock.setDefaultReturn('/full/path/.rbuild/product-definition')
+        dirstore.CheckoutProductStore().getBaseDirectory._mock.setDefaultReturn('/full/path')
+        handle.Status._printOneDirectoryStatus._mock.setDefaultReturn(None)
+
+        conaryFacade = handle.facade.conary
+        mock.mock(conaryFacade, 'isConaryCheckoutDirectory')
+        conaryFacade.isConaryCheckoutDirectory._mock.setDefaultReturn(False)
+        conaryFacade.isConaryCheckoutDirectory._mock.setReturn(True,
+            '/full/path/devel/foo')
+        conaryFacade.isConaryCheckoutDirectory._mock.setReturn(True,
+            '/full/path/devel/bar')
+        mock.mockMethod(conaryFacade.getNewerRepositoryVersionsForDirectories)
+        conaryFacade.getNewerRepositoryVersionsForDirectories._mock.setReturn(
+            {'/full/path/devel/bar': ['1'], '/full/path/devel/foo': []},
+            ['/full/path/devel/bar', '/full/path/devel/foo'])
+        mock.mockMethod(conaryFacade.getCheckoutStatus)
+        conaryFacade.getCheckoutStatus._mock.setReturn(
+            [('M', 'foo.recipe')], '/full/path/devel/foo')
+        conaryFacade.getCheckoutStatus._mock.setReturn(
+            [], '/full/path/devel/bar')
+
+        self.mock(os, 'walk', lambda x: [
+            ('/full/path', ['devel', '.rbuild'], False),
+            ('/full/path/devel', ['foo', 'bar'], False)])
+        handle.Status.printDirectoryStatus('/full/path', jobs=4)
+        self.unmock()
+        # printed in the same order as the serial walk
+        self.assertEquals(
+            [(x[0][0], x[1]) for x in
+             handle.Status._printOneDirectoryStatus._mock.calls],
+            [('/full/path', (('local', True), ('repository', True))),
+             ('/full/path/devel', (('local', True), ('repository', True))),
+             ('/full/path/devel/bar', (
+                ('local', True), ('prefetched', (['1'], [])),
+                ('repository', True))),
+             ('/full/path/devel/foo', (
+                ('local', True), ('prefetched', ([], [('M', 'foo.recipe')])),
+                ('repository', True))),
+             ])
+
     def testPrintOneDirectoryStatus(self):
         self.initProductDirectory(self.workDir)
         os.chdir(self.workDir)
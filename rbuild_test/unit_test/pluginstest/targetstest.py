@@ -53,7 +53,7 @@ class CreateTargetTest(AbstractTargetTest):
 
         mock.mockMethod(handle.DescriptorConfig.readConfig)
         mock.mockMethod(handle.DescriptorConfig.writeConfig)
-        mock.mockMethod(handle.facade.rbuilder.getTargetTypes)
+        mock.mockMethod(handle.facade.rbuilder.getTargetType)
         mock.mockMethod(handle.Targets.createTarget)
         mock.mockMethod(handle.Targets.configureTargetCredentials)
 
@@ -243,7 +243,7 @@ class TargetsPluginTest(AbstractTargetTest):
             )
 
         rb.getTargets._mock.setReturn([_target], name='foo')
-        rb.getTargetTypes._mock.setReturn([_ttype])
+        rb.getTargetType._mock.setReturn(_ttype, 'type')
         h.DescriptorConfig.createDescriptorData._mock.setReturn(_ddata,
             fromStream="descriptor xml", defaults={})
         rb.configureTarget._mock.setReturn(_target, _target, _ddata)
@@ -293,7 +293,8 @@ class TargetsPluginTest(AbstractTargetTest):
             _ddata, fromStream="descriptor", defaults=dict())
 
         mock.mock(handle.facade, "rbuilder")
-        handle.facade.rbuilder.getTargetTypes._mock.setReturn([_ttype])
+        handle.facade.rbuilder.getTargetType._mock.setReturn(_ttype, 'type')
+        handle.facade.rbuilder.getTargetType._mock.setReturn(None, 'notype')
         handle.facade.rbuilder.createTarget._mock.setReturn(
             "target", _ttype.name, _ddata)
 
@@ -325,7 +326,8 @@ class TargetsPluginTest(AbstractTargetTest):
             _ddata, fromStream="descriptor", defaults=dict())
 
         mock.mock(handle.facade, "rbuilder")
-        handle.facade.rbuilder.getTargetTypes._mock.setReturn([_ttype])
+        handle.facade.rbuilder.getTargetType._mock.setReturn(_ttype, 'type')
+        handle.facade.rbuilder.getTargetType._mock.setReturn(None, 'notype')
         handle.facade.rbuilder.createTarget._mock.setReturn(
             _target, _ttype.name, _ddata)
         def raisesRbuildError(self, target):
@@ -364,6 +366,8 @@ class TargetsPluginTest(AbstractTargetTest):
             [_target1], target_id="1")
         handle.facade.rbuilder.getTargets._mock.appendReturn(
             [], target_id="bar")
+        handle.facade.rbuilder.getTargets._mock.appendReturn(
+            [_target2], name="bar")
 
         mock.mock(handle, "ui")
         handle.ui.getYn._mock.setDefaultReturn(False)
@@ -383,6 +387,16 @@ class TargetsPluginTest(AbstractTargetTest):
 
         handle.Targets.delete("bar")
         handle.facade.rbuilder.getTargets._mock.assertCalled(target_id="bar")
-        handle.facade.rbuilder.getTargets._mock.assertCalled()
+        handle.facade.rbuilder.getTargets._mock.assertCalled(name="bar")
         handle.ui.getYn._mock.assertCalled("Delete bar?", default=False)
         _target2.delete._mock.assertCalled()
+
+        # an rBuilder that ignores the name filter returns every target,
+        # and only the one named is deleted
+        handle.facade.rbuilder.getTargets._mock.appendReturn(
+            [], target_id="foo")
+        handle.facade.rbuilder.getTargets._mock.appendReturn(
+            [_target1, _target2], name="foo")
+        handle.Targets.delete("foo", force=True)
+        _target1.delete._mock.assertCalled()
+        _target2.delete._mock.assertNotCalled()
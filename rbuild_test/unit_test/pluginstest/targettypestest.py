@@ -43,7 +43,7 @@ class TargetTypesTest(AbstractTargetTypesTest):
 
         _targetType1 = mock.MockObject(name="targettype1")
         _targetType2 = mock.MockObject(name="targettype2")
-        mock.mockMethod(handle.facade.rbuilder.getTargetTypes,
+        mock.mockMethod(handle.facade.rbuilder.listTargetTypes,
             [_targetType1, _targetType2])
 
         self.assertEqual([_targetType1, _targetType2],
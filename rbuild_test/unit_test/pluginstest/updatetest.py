@@ -67,6 +67,23 @@ class UpdateTest(rbuildhelp.RbuildHelper):
         cmd.runCommand(handle, {}, ['rbuild', 'update', 'stage', 'foo', 'bar'])
         handle.Update.updateStages._mock.assertCalled(['foo', 'bar'])
 
+        cmd.runCommand(handle, {'jobs': '4'}, ['rbuild', 'update', 'packages'])
+        handle.Update.updateAllStages._mock.assertCalled(jobs=4)
+
+        cmd.runCommand(handle, {'jobs': '4'}, ['rbuild', 'update', 'all'])
+        handle.productStore.update._mock.assertCalled()
+        handle.Update.updateAllStages._mock.assertCalled(jobs=4)
+
+        cmd.runCommand(handle, {'jobs': '4'}, ['rbuild', 'update', 'stage'])
+        handle.Update.updateCurrentStage._mock.assertCalled(jobs=4)
+
+        cmd.runCommand(handle, {'jobs': '1'},
+                       ['rbuild', 'update', 'stage', 'foo'])
+        handle.Update.updateStages._mock.assertCalled(['foo'])
+
+        self.assertRaises(errors.BadParameterError, cmd.runCommand, handle,
+                          {'jobs': 'x'}, ['rbuild', 'update', 'stage', 'foo'])
+
         # unknown arguments
         cmd.runCommand(handle, {}, ['rbuild', 'update', 'unknown'])
         update.UpdateCommand.usage._mock.assertCalled()
@@ -187,6 +204,41 @@ class UpdateTest(rbuildhelp.RbuildHelper):
         self.assertRaises(errors.MissingProductStoreError,
             handle.Update.updateStages)
 
+    def testUpdateStagesConcurrently(self):
+        handle = self._getHandle()
+        from rbuild_plugins import update
+        maps = ({'bar': './bar/bar.recipe', 'baz': './baz/baz.recipe'},
+                {'group-foo': './group-foo/group-foo.recipe'})
+        handle.productStore.getEditedRecipeDicts._mock.setDefaultReturn(maps)
+        # updates run in worker processes, so record them on disk
+        os.mkdir(self.workDir + '/updated')
+        def updateCheckout(packageDir):
+            self.writeFile(self.workDir + '/updated/%s-%d' % (
+                os.path.basename(packageDir), os.getpid()), '')
+        self.mock(handle.facade.conary, 'updateCheckout', updateCheckout)
+        handle.Update.updateStages(['foo'], jobs=4)
+        updated = os.listdir(self.workDir + '/updated')
+        self.assertEquals(sorted(x.rsplit('-', 1)[0] for x in updated),
+                          ['bar', 'baz', 'group-foo'])
+        self.failIf('%d' % os.getpid() in [x.rsplit('-', 1)[1]
+                                          for x in updated])
+
+        # failures of any kind are collected and reported together
+        def updateCheckout(packageDir):
+            if packageDir == './bar':
+                raise errors.RbuildError('%s is broken' % packageDir)
+            elif packageDir == './group-foo':
+                raise OSError(2, 'No such file or directory')
+        self.mock(handle.facade.conary, 'updateCheckout', updateCheckout)
+        err = self.assertRaises(update.UpdateFailedError,
+            handle.Update.updateStages, ['foo'], jobs=4)
+        self.assertEquals(str(err), '2 package checkout(s) failed to update')
+        handle.ui.errorStream.write._mock.assertCalled(
+            'warning: ./bar: ./bar is broken\n')
+        handle.ui.errorStream.write._mock.assertCalled(
+            'warning: ./group-foo: OSError: [Errno 2] No such file or'
+            ' directory\n')
+
     def testUpdateCurrentDirectory(self):
         handle = self._getHandle()
         mock.mockMethod(handle.facade.conary.updateCheckout)
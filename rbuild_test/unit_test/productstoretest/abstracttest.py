@@ -112,6 +112,34 @@ class AbstractProductTest(rbuildhelp.RbuildHelper):
         assert(results == [ ('group-foo', x86Flavor), 
                             ('group-bar', x8664Flavor)])
 
+        # the results are kept until the product is edited
+        overrideFlavors = handle.facade.conary._overrideFlavors
+        calls = []
+        def countingOverride(*args):
+            calls.append(args)
+            return overrideFlavors(*args)
+        self.mock(handle.facade.conary, '_overrideFlavors', countingOverride)
+        self.assertEquals(productStore.getGroupFlavors(), results)
+        self.assertEquals(calls, [])
+        product.addBuildDefinition(imageGroup='group-baz',
+                                   flavor='is: x86')
+        self.assertEquals(productStore.getGroupFlavors(), results)
+        productStore.save(product)
+        self.assertEquals(productStore.getGroupFlavors(), results
+                          + [('group-baz', x86Flavor)])
+        # each flavor is only parsed once
+        self.assertEquals(calls, [])
+        product.setBaseFlavor('ssl')
+        productStore.invalidateProductIndex()
+        self.assertEquals(productStore.getGroupFlavors()[0],
+                          ('group-foo', 'ssl is: x86'))
+        self.assertEquals(len(calls), 1)
+
+        # the rMake configs built from the old product are dropped too
+        mock.mockMethod(handle.facade.rmake.clearCachedConfig)
+        productStore.invalidateProductIndex()
+        handle.facade.rmake.clearCachedConfig._mock.assertCalled()
+
 
     def testGetBuildDefinitionGroupToBuild(self):
         handle = self.getRbuildHandle()
@@ -213,6 +241,7 @@ class AbstractProductTest(rbuildhelp.RbuildHelper):
 
         productStore = mock.MockInstance(abstract.ProductStore)
         productStore._mock.enableMethod('getPlatformAutoLoadRecipes')
+        productStore._mock.enableMethod('_getSearchPathCacheKey')
         productStore._mock.set(_handle=handle)
 
         facade = conaryfacade.ConaryFacade(handle)
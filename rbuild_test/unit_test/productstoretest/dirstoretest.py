@@ -271,6 +271,7 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
 
         productStore = mock.MockInstance(dirstore.CheckoutProductStore)
         productStore._mock.enableMethod('getPlatformAutoLoadRecipes')
+        productStore._mock.enableMethod('_getSearchPathCacheKey')
         productStore._mock.set(_handle=handle)
 
         facade = conaryfacade.ConaryFacade(handle)
@@ -296,6 +297,27 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
         alr = productStore.getPlatformAutoLoadRecipes()
         self.assertEquals(alr, ['foo=/foo.rpath.com@foo:2/2-2-2'])
 
+        # with a known product definition version, the answer is cached
+        productStore._mock.enableMethod('getCache')
+        productStore._mock.set(_baseDirectory=self.workDir)
+        pd._sourceTrove = 'product-definition:source=/localhost@rpl:1/1-1'
+        alr = productStore.getPlatformAutoLoadRecipes()
+        self.assertEquals(alr, ['foo=/foo.rpath.com@foo:2/2-2-2'])
+        del repos.recordFindTroveArgs[:]
+        alr = productStore.getPlatformAutoLoadRecipes()
+        self.assertEquals(alr, ['foo=/foo.rpath.com@foo:2/2-2-2'])
+        self.assertEquals(repos.recordFindTroveArgs, [])
+
+        # a new product definition version resolves again
+        pd._sourceTrove = 'product-definition:source=/localhost@rpl:1/1-2'
+        alr = productStore.getPlatformAutoLoadRecipes()
+        self.assertEquals(alr, ['foo=/foo.rpath.com@foo:2/2-2-2'])
+        self.assertNotEquals(repos.recordFindTroveArgs, [])
+
+        # search paths on a label are never cached
+        self.assertEquals(productStore._getSearchPathCacheKey('x',
+            [('group-bar', 'bar.rpath.com@bar:1', None)], ['foo']), None)
+
     def testGetStageDirectory(self):
         productStore = mock.MockInstance(dirstore.CheckoutProductStore)
         productStore._mock.enableMethod('getStageDirectory')
@@ -397,3 +419,48 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
         productStore.save(prodDef)
         prodDef = productStore.getProduct()
         self.assertEqual(prodDef.getProductDescription(), 'Even more foo')
+
+    def testPackageManifest(self):
+        self._prepProductStore()
+        os.chdir('foo/stable')
+        handle = self.getRbuildHandle(productStore=mock.MockObject())
+        productStore = dirstore.CheckoutProductStore(handle)
+        self.assertEquals(productStore.getPackageManifest(), {})
+        productStore.setPackageManifest({'jobId': 1, 'packages': {'a': 'b'}})
+        self.assertEquals(productStore.getPackageManifest(),
+                          {'jobId': 1, 'packages': {'a': 'b'}})
+        self.assertEquals(productStore.getPackageManifest('devel'), {})
+        assert(os.path.exists(self.workDir + '/foo/.rbuild/manifests/stable'))
+
+        # a damaged manifest is treated as empty
+        self.writeFile(self.workDir + '/foo/.rbuild/manifests/stable', '{')
+        self.assertEquals(productStore.getPackageManifest(), {})
+
+    def testGetProductCached(self):
+        self._prepProductStore()
+        os.chdir('foo/stable')
+        handle = self.getRbuildHandle(productStore=mock.MockObject())
+        productStore = dirstore.CheckoutProductStore(handle)
+        mock.mockMethod(productStore._getSourceTroveVersion,
+            returnValue='cny.tv@ns:1/2-3')
+        prodDef = productStore.getProduct()
+        self.assertEquals(prodDef._sourceTrove, 'cny.tv@ns:1/2-3')
+        self.assertEquals(productStore.getProductVersion(), '1.0')
+        assert(productStore.getProduct() is prodDef)
+        productStore._getSourceTroveVersion._mock.assertCalled()
+        productStore._getSourceTroveVersion._mock.assertNotCalled()
+
+        # changes to the checkout are noticed
+        self.writeFile(self.workDir + '/foo/.rbuild/product-definition/CONARY',
+                       'stage\n')
+        assert(productStore.getProduct() is not prodDef)
+        prodDef = productStore.getProduct()
+
+        # and saving or updating always reads the definition again
+        productStore.save(prodDef)
+        assert(productStore.getProduct() is not prodDef)
+        prodDef = productStore.getProduct()
+        mock.mockMethod(handle.facade.conary.updateCheckout, returnValue=True)
+        productStore.update()
+        assert(handle.product is not prodDef)
+        assert(productStore.getProduct() is handle.product)
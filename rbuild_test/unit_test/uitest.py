@@ -102,6 +102,23 @@ class UserInterfaceTest(rbuildhelp.RbuildHelper):
         h.ui._log._mock.assertCalled(('  data5  '))
         h.ui._log._mock.assertCalled(('    data6'))
 
+    def testWriteTableLookahead(self):
+        h = self.getRbuildHandle()
+        h.ui._log = mock.MockObject()
+
+        # rows are written a batch at a time, and columns only grow
+        rows = iter([('a', 'x'), ('bbb', 'y'), ('cccccc', 'z')])
+        h.ui.writeTable(rows, headers=('H1', 'H2'), lookahead=2)
+        self.assertEquals(
+            [x[0][0] for x in h.ui.outStream.write._mock.calls],
+            ['H1   H2\n', 'a    x\n', 'bbb  y\n', 'cccccc  z\n'])
+
+        h.ui.outStream.write._mock.calls = []
+        h.ui.writeTable(iter([]), headers=('H1', 'H2'), lookahead=2)
+        self.assertEquals(
+            [x[0][0] for x in h.ui.outStream.write._mock.calls],
+            ['H1  H2\n'])
+
     def testUserInterface(self):
         h = self.getRbuildHandle()
         h.ui._log = mock.MockObject()
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+
+import os
+import threading
+
+from rbuild_test import rbuildhelp
+from testutils import mock
+
+from rbuild import errors
+from rbuild.lib import util
+
+
+class UtilTest(rbuildhelp.RbuildHelper):
+
+    def testThreadedMap(self):
+        self.assertEquals(util.threadedMap(lambda x: x * 2, [1, 2, 3]),
+                          [2, 4, 6])
+        self.assertEquals(util.threadedMap(lambda x: x * 2, [], 4), [])
+
+        seen = set()
+        def func(x):
+            seen.add(threading.currentThread().getName())
+            return x * 2
+        self.assertEquals(util.threadedMap(func, range(20), 4),
+                          [x * 2 for x in range(20)])
+        self.failIf(threading.currentThread().getName() in seen)
+
+        def fail(x):
+            if x in (3, 7):
+                raise errors.RbuildError('failed %d' % x)
+            return x
+        err = self.assertRaises(errors.RbuildError, util.threadedMap, fail,
+                                range(10), 4)
+        self.assertEquals(str(err), 'failed 3')
+
+    def testForkedMap(self):
+        self.assertEquals(util.forkedMap(lambda x: x * 2, [1, 2, 3]),
+                          [2, 4, 6])
+        self.assertEquals(util.forkedMap(lambda x: x * 2, [], 4), [])
+
+        # workers are separate processes, set up by the initializer
+        state = {'ready': False}
+        def init():
+            state['ready'] = True
+        def func(x):
+            return os.getpid(), state['ready'], x * 2
+        results = util.forkedMap(func, range(20), 4, initializer=init)
+        self.assertEquals([x[2] for x in results], [x * 2 for x in range(20)])
+        self.failIf(os.getpid() in [x[0] for x in results])
+        self.failUnless(all(x[1] for x in results))
+        self.failIf(state['ready'])
+
+        def fail(x):
+            if x in (3, 7):
+                raise errors.RbuildError('failed %d' % x)
+            if x == 5:
+                raise KeyError(x)
+            return x
+        err = self.assertRaises(errors.RbuildError, util.forkedMap, fail,
+                                range(10), 4)
+        self.assertEquals(str(err), 'failed 3')
+        err = self.assertRaises(errors.RbuildError, util.forkedMap, fail,
+                                range(4, 10), 4)
+        self.assertEquals(str(err), 'KeyError: 5')
+
+    def testWaitForJob(self):
+        clock = [0]
+        sleeps = []
+        def _sleep(secs):
+            sleeps.append(secs)
+            clock[0] += secs
+        mock.mock(util.time, 'sleep', _sleep)
+        mock.mock(util.time, 'time', lambda: clock[0])
+
+        states = ['Completed', 'Running', 'Running', 'Running', 'Running']
+        job = mock.MockObject(status_text='working')
+        job.job_state._mock.set(name='Queued')
+        def _refresh():
+            job.job_state._mock.set(name=states.pop())
+        job._mock.set(refresh=_refresh)
+        seen = []
+        self.assertEquals(util.waitForJob(job, interval=1, maxInterval=3,
+                                          callback=seen.append), job)
+        # backs off while nothing changes, capped at maxInterval
+        self.assertEquals(sleeps, [1, 1, 2, 3, 3])
+        self.assertEquals(len(seen), 5)
+        self.assertEquals(job.job_state.name, 'Completed')
+
+        # status changes reset the delay
+        del sleeps[:]
+        texts = ['c', 'b', 'b', 'a']
+        job.job_state._mock.set(name='Running')
+        def _refresh():
+            if texts:
+                job._mock.set(status_text=texts.pop())
+            else:
+                job.job_state._mock.set(name='Completed')
+        job._mock.set(refresh=_refresh)
+        util.waitForJob(job, interval=1, maxInterval=8)
+        self.assertEquals(sleeps, [1, 1, 1, 2, 1])
+
+        # gives up once the timeout expires
+        del sleeps[:]
+        clock[0] = 0
+        job.job_state._mock.set(name='Running')
+        job._mock.set(refresh=lambda: None)
+        err = self.assertRaises(errors.JobTimeoutError, util.waitForJob, job,
+                                interval=2, maxInterval=4, timeout=5)
+        self.assertEquals(sleeps, [2, 3])
+        self.assertEquals(str(err),
+                          'Timed out after 5 seconds waiting for job')